@@ -0,0 +1,213 @@
+"""Throughput and memory benchmarks for the environments, agents and training loop.
+
+    python benchmarks/bench.py --save benchmarks/baseline.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json --threshold 0.2
+
+Results are written as JSON, name -> {"value", "unit", "higher_is_better"}. With --compare the
+script exits with status 1 when any result is worse than the baseline by more than threshold.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import platform
+import random
+import resource
+import sys
+import time
+
+import numpy as np
+
+from time_travel.envs.door import Action as DoorAction, DoorEnv
+from time_travel.envs.maze import Action, MazeEnv
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.parallel_trainer import epsilon_schedule
+from time_travel.replay_buffer import ReplayBuffer
+from time_travel.rollout import play_episode
+
+
+def calls_per_sec(fn, number: int, repeat: int = 3):
+    """Best of repeat runs of number calls, to keep scheduler noise out of the result."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(number)
+        best = min(best, time.perf_counter() - start)
+    return number / best
+
+
+def bench_maze_step(number):
+    env = MazeEnv(trap_position_observed=True)
+    actions = [Action(a) for a in np.random.randint(len(Action), size=number)]
+    env.reset()
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step((action, None if env.is_original_timeline else Action.DO_NOTHING))
+        if terminated or truncated:
+            env.reset()
+
+
+def bench_maze_reset(number):
+    env = MazeEnv(trap_position_observed=True)
+    for _ in range(number):
+        env.reset()
+
+
+def bench_maze_set_state(number):
+    env = MazeEnv(trap_position_observed=True)
+    env.reset()
+    state = env.get_state()
+    for _ in range(number):
+        env.set_state(state)
+
+
+def bench_door_step(number):
+    env = DoorEnv()
+    episode = [DoorAction.DO_NOTHING, DoorAction.OPEN_DOOR_0, DoorAction.DO_NOTHING]
+    env.reset()
+    for i in range(number):
+        _, _, terminated, truncated, _ = env.step((episode[i % 3], None))
+        if terminated or truncated:
+            env.reset()
+
+
+def bench_door_reset(number):
+    env = DoorEnv()
+    for _ in range(number):
+        env.reset()
+
+
+def _sample_maze_observations(num_obs: int = 1000):
+    env = MazeEnv(trap_position_observed=True)
+    obs = env.reset()
+    observations = []
+    while len(observations) < num_obs:
+        observations.append(obs[0])
+        obs, _, terminated, truncated, _ = env.step((Action(random.randrange(4)), None))
+        if terminated or truncated:
+            obs = env.reset()
+    return observations
+
+
+def bench_to_idx(number):
+    observations = _sample_maze_observations()
+    for i in range(number):
+        observations[i % len(observations)].to_idx()
+
+
+def _trained_agent():
+    env = MazeEnv(trap_position_observed=True)
+    agent = MazeAgent(env)
+    agent.q_values[:] = np.random.default_rng(0).normal(size=agent.q_values.shape)
+    return agent
+
+
+def bench_act_deterministic(number):
+    agent = _trained_agent()
+    observations = _sample_maze_observations()
+    for i in range(number):
+        agent.act(observations[i % len(observations)], deterministic=True)
+
+
+def bench_act_softmax(number):
+    agent = _trained_agent()
+    observations = _sample_maze_observations()
+    for i in range(number):
+        agent.act(observations[i % len(observations)], epsilon=0.5, deterministic=False)
+
+
+def bench_update(number):
+    agent = _trained_agent()
+    observations = _sample_maze_observations()
+    for i in range(number):
+        agent.update(observations[i % len(observations)], Action.RIGHT,
+                     observations[(i + 1) % len(observations)], -1.0)
+
+
+def train(max_episodes: int):
+    """The training loop of run_maze.py without evaluation."""
+    env = MazeEnv(trap_position_observed=True)
+    agent = MazeAgent(env)
+    replay_buffer = ReplayBuffer(capacity=100000)
+    for episode_idx in range(max_episodes):
+        episode = play_episode(env, agent, epsilon=epsilon_schedule(episode_idx, max_episodes))
+        agent.update_batch(episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx)
+        replay_buffer.add_episode(episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx,
+                                  episode.is_original_timeline, episode.t)
+
+
+def train_peak_rss_mib(max_episodes: int):
+    """Peak resident set size of a child process running the training loop."""
+    process = mp.get_context("spawn").Process(target=train, args=(max_episodes,))
+    process.start()
+    process.join()
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def run(args):
+    random.seed(0)
+    np.random.seed(0)
+
+    results = {}
+    def record(name, value, unit, higher_is_better=True):
+        results[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+        print(f"{name}: {value:.1f} {unit}")
+
+    record("maze_env_step", calls_per_sec(bench_maze_step, 20000), "steps/s")
+    record("maze_env_reset", calls_per_sec(bench_maze_reset, 5000), "resets/s")
+    record("maze_env_set_state", calls_per_sec(bench_maze_set_state, 20000), "calls/s")
+    record("door_env_step", calls_per_sec(bench_door_step, 20000), "steps/s")
+    record("door_env_reset", calls_per_sec(bench_door_reset, 20000), "resets/s")
+    record("observation_to_idx", calls_per_sec(bench_to_idx, 50000), "calls/s")
+    record("maze_agent_act_deterministic", calls_per_sec(bench_act_deterministic, 20000), "calls/s")
+    record("maze_agent_act_softmax", calls_per_sec(bench_act_softmax, 20000), "calls/s")
+    record("maze_agent_update", calls_per_sec(bench_update, 20000), "calls/s")
+    record("train_episodes", calls_per_sec(train, args.train_episodes, repeat=1), "episodes/s")
+    if args.rss_episodes > 0:
+        record("train_peak_rss", train_peak_rss_mib(args.rss_episodes), "MiB", higher_is_better=False)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Returns the names of results that are worse than the baseline by more than threshold."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["value"]
+        change = (result["value"] - base) / base
+        worse = -change if result["higher_is_better"] else change
+        status = "REGRESSION" if worse > threshold else "ok"
+        print(f"{name}: {result['value']:.1f} vs {base:.1f} {result['unit']} ({change:+.1%}) {status}")
+        if worse > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results against this baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown before failing")
+    parser.add_argument("--train-episodes", type=int, default=2000)
+    parser.add_argument("--rss-episodes", type=int, default=100000, help="episodes of the peak RSS run, 0 to skip")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Throughput regressed past {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
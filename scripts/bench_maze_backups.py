@@ -0,0 +1,59 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from time_travel.envs.maze import MazeEnv
+from time_travel.envs.maze_model import compile_maze_model, evaluate_q_values, optimal_return
+from time_travel.agents.backups import BACKWARD, LAMBDA, N_STEP, ONE_STEP
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.parallel_trainer import epsilon_schedule
+from time_travel.rollout import play_episode
+
+CONFIGS = [
+    ("one-step (current)", dict(backup=ONE_STEP)),
+    ("one-step backward", dict(backup=BACKWARD)),
+    ("3-step", dict(backup=N_STEP, n_steps=3)),
+    ("10-step", dict(backup=N_STEP, n_steps=10)),
+    ("Q(0.9)", dict(backup=LAMBDA, trace_decay=0.9)),
+    ("Q(1.0)", dict(backup=LAMBDA, trace_decay=1.0)),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Episodes each backup needs to reach the optimal exact eval reward")
+    parser.add_argument("--episodes", type=int, default=20000, help="episode budget per run")
+    parser.add_argument("--schedule-episodes", type=int, default=100000, help="length of the epsilon schedule, as in run_maze.py")
+    parser.add_argument("--eval-every", type=int, default=250)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    args = parser.parse_args()
+
+    model = compile_maze_model(trap_position_observed=True)
+    target = optimal_return(model)
+    print(f"optimal return {target}")
+
+    for name, config in CONFIGS:
+        for seed in args.seeds:
+            random.seed(seed)
+            np.random.seed(seed)
+            env = MazeEnv(trap_position_observed=True)
+            agent = MazeAgent(env, **config)
+
+            start = time.perf_counter()
+            best, reached = -np.inf, None
+            for episode_idx in range(args.episodes):
+                episode = play_episode(env, agent, epsilon=epsilon_schedule(episode_idx, args.schedule_episodes))
+                agent.update_episode(episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx)
+                if (episode_idx + 1) % args.eval_every == 0:
+                    best = max(best, evaluate_q_values(model, agent.q_values))
+                    if best >= target:
+                        reached = episode_idx + 1
+                        break
+            elapsed = time.perf_counter() - start
+
+            result = f"optimal after {reached} episodes" if reached else f"not optimal after {args.episodes} episodes"
+            print(f"{name}, seed {seed}: {result}, best eval {best:.1f}, {(episode_idx + 1) / elapsed:.0f} episodes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import random
+import time
+
+import numpy as np
+
+from time_travel.envs.maze import MazeEnv
+from time_travel.envs.fast_maze import FastMazeEnv
+from time_travel.agents.maze_agent import MazeAgent
+
+def main():
+    num_episodes = 3000
+    for name, train in [("dataclass", train_dataclass), ("fast", train_fast)]:
+        random.seed(0)
+        np.random.seed(0)
+        start = time.perf_counter()
+        num_steps = train(num_episodes)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {num_episodes / elapsed:.0f} episodes/s, {num_steps / elapsed:.0f} steps/s")
+
+
+def train_dataclass(num_episodes: int):
+    """The training loop of run_maze.py."""
+    env = MazeEnv(trap_position_observed=True)
+    agent = MazeAgent(env)
+    num_steps = 0
+
+    for episode_idx in range(num_episodes):
+        obs = env.reset()
+        env_running = True
+        rollout = []
+        epsilon = 0.8 * (1 - np.sqrt(episode_idx / num_episodes))
+
+        while env_running:
+            if env.is_original_timeline:
+                normal_action = agent.act(obs[0], epsilon=epsilon, deterministic=False)
+                time_travel_action = None
+                primary_agent_action = normal_action
+                prev_obs = obs[0]
+            else:
+                if obs[0] == rollout[env.t][0]:
+                    normal_action = rollout[env.t][1]
+                else:
+                    normal_action = agent.act(obs[0], deterministic=True)
+                time_travel_action = agent.act(obs[1], epsilon=epsilon, deterministic=False)
+                primary_agent_action = time_travel_action
+                prev_obs = obs[1]
+
+            obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
+            env_running = not (terminated or truncated)
+            curr_obs = obs[0] if env.is_original_timeline else obs[1]
+            rollout.append((prev_obs, primary_agent_action, reward, curr_obs))
+
+        for s, a, r, sp in rollout:
+            agent.update(s, a, sp, r)
+        num_steps += len(rollout)
+
+    return num_steps
+
+
+def train_fast(num_episodes: int):
+    """The training loop of run_maze.py on FastMazeEnv with integer observations and actions."""
+    env = FastMazeEnv(trap_position_observed=True)
+    agent = MazeAgent(env)
+    num_steps = 0
+
+    for episode_idx in range(num_episodes):
+        obs = env.reset()
+        env_running = True
+        rollout = []
+        epsilon = 0.8 * (1 - np.sqrt(episode_idx / num_episodes))
+
+        while env_running:
+            if env.is_original_timeline:
+                normal_action = agent.act_idx(obs[0], epsilon=epsilon, deterministic=False)
+                time_travel_action = None
+                primary_agent_action = normal_action
+                prev_obs = obs[0]
+            else:
+                if obs[0] == rollout[env.t][0]:
+                    normal_action = rollout[env.t][1]
+                else:
+                    normal_action = agent.act_idx(obs[0], deterministic=True)
+                time_travel_action = agent.act_idx(obs[1], epsilon=epsilon, deterministic=False)
+                primary_agent_action = time_travel_action
+                prev_obs = obs[1]
+
+            obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
+            env_running = not (terminated or truncated)
+            curr_obs = obs[0] if env.is_original_timeline else obs[1]
+            rollout.append((prev_obs, primary_agent_action, reward, curr_obs))
+
+        for s, a, r, sp in rollout:
+            agent.update_idx(s, a, sp, r)
+        num_steps += len(rollout)
+
+    return num_steps
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import functools
+import time
+
+import numpy as np
+
+from time_travel.envs.maze import MazeEnv
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.agents.q_table import HashedQTable
+from time_travel.evaluator import evaluate
+from time_travel.parallel_trainer import epsilon_schedule
+from time_travel.rollout import play_episode
+
+# dense tables above this size are reported but not trained
+MAX_DENSE_BYTES = 2 * 1024 ** 3
+
+def main():
+    parser = argparse.ArgumentParser(description="Q-table memory and training throughput by maze size")
+    parser.add_argument("--grid-sizes", type=int, nargs="+", default=[5, 9, 15, 25])
+    parser.add_argument("--visibility", type=int, default=1)
+    parser.add_argument("--episodes", type=int, default=2000)
+    args = parser.parse_args()
+
+    for grid_size in args.grid_sizes:
+        env_fn = functools.partial(MazeEnv, trap_position_observed=True, grid_size=grid_size, visibility=args.visibility)
+        env = env_fn()
+        num_obs = int(np.prod(env.observation_space.nvec)) + 1
+        dense_bytes = num_obs * env.action_space.n * np.dtype(np.float64).itemsize
+        print(f"grid {grid_size}, visibility {args.visibility}: {num_obs} observations, "
+              f"dense float64 table {dense_bytes / 1024 ** 2:.1f} MiB")
+
+        configs = [("hashed float32", dict(sparse=True, dtype=np.float32)),
+                   ("hashed float64", dict(sparse=True, dtype=np.float64))]
+        if dense_bytes <= MAX_DENSE_BYTES:
+            configs.insert(0, ("dense float64", dict(sparse=False, dtype=np.float64)))
+
+        for name, config in configs:
+            agent = MazeAgent(env, **config)
+            start = time.perf_counter()
+            num_steps = 0
+            for episode_idx in range(args.episodes):
+                episode = play_episode(env, agent, epsilon=epsilon_schedule(episode_idx, args.episodes))
+                agent.update_batch(episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx)
+                num_steps += len(episode)
+            elapsed = time.perf_counter() - start
+
+            if isinstance(agent.q_values, HashedQTable):
+                table_bytes = agent.q_values.nbytes
+                touched = f", {agent.q_values.num_rows - 1} rows touched ({(agent.q_values.num_rows - 1) / num_obs:.2e} of all)"
+            else:
+                table_bytes = agent.q_values.nbytes
+                touched = ""
+            print(f"  {name}: {args.episodes / elapsed:.0f} episodes/s, {num_steps / elapsed:.0f} steps/s, "
+                  f"table {table_bytes / 1024 ** 2:.2f} MiB{touched}, "
+                  f"eval {evaluate(env_fn, agent.q_values).mean_reward:.1f}")
+
+
+if __name__ == "__main__":
+    main()
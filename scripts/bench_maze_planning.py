@@ -0,0 +1,59 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from time_travel.envs.maze import MazeEnv
+from time_travel.envs.maze_model import compile_maze_model, evaluate_q_values, optimal_return
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.agents.planning import PLANNING_LR, PrioritizedSweeping
+from time_travel.parallel_trainer import epsilon_schedule
+from time_travel.rollout import play_episode
+
+def main():
+    parser = argparse.ArgumentParser(description="Environment steps MazeAgent needs to reach an exact eval reward, "
+                                                 "with and without prioritized sweeping")
+    parser.add_argument("--planning-steps", type=int, nargs="+", default=[0, 100, 1000],
+                        help="planning updates per episode to compare, 0 is the plain learner")
+    parser.add_argument("--planning-lr", type=float, default=PLANNING_LR)
+    parser.add_argument("--target", type=float, help="eval reward to reach, the optimal return by default")
+    parser.add_argument("--episodes", type=int, default=20000, help="episode budget per run")
+    parser.add_argument("--schedule-episodes", type=int, default=100000, help="length of the epsilon schedule, as in run_maze.py")
+    parser.add_argument("--eval-every", type=int, default=100)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    args = parser.parse_args()
+
+    model = compile_maze_model(trap_position_observed=True)
+    target = optimal_return(model) if args.target is None else args.target
+    print(f"target eval reward {target}")
+
+    for planning_steps in args.planning_steps:
+        for seed in args.seeds:
+            random.seed(seed)
+            np.random.seed(seed)
+            env = MazeEnv(trap_position_observed=True)
+            planning = PrioritizedSweeping(env.action_space.n, planning_steps, lr=args.planning_lr) if planning_steps else None
+            agent = MazeAgent(env, planning=planning)
+
+            start = time.perf_counter()
+            env_steps, best, reached = 0, -np.inf, None
+            for episode_idx in range(args.episodes):
+                episode = play_episode(env, agent, epsilon=epsilon_schedule(episode_idx, args.schedule_episodes))
+                agent.update_episode(episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx)
+                env_steps += len(episode)
+                if (episode_idx + 1) % args.eval_every == 0:
+                    best = max(best, evaluate_q_values(model, agent.q_values))
+                    if best >= target:
+                        reached = episode_idx + 1
+                        break
+            elapsed = time.perf_counter() - start
+
+            result = (f"reached after {reached} episodes, {env_steps} env steps" if reached
+                      else f"not reached after {args.episodes} episodes, {env_steps} env steps")
+            print(f"{planning_steps} planning steps, seed {seed}: {result}, best eval {best:.1f}, "
+                  f"{elapsed:.0f}s wall clock")
+
+
+if __name__ == "__main__":
+    main()
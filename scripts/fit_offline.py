@@ -0,0 +1,88 @@
+import argparse
+import functools
+import time
+
+from tqdm import tqdm
+
+from time_travel.envs import DOOR, ENVS, MAZE
+from time_travel.envs.door import DoorEnv
+from time_travel.envs.maze import MazeEnv
+from time_travel.agents.door_agent import DoorAgent
+from time_travel.agents.fitted_q import fitted_q_iteration, group_episode_log
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.episode_log import EpisodeLog, EpisodeLogWriter
+from time_travel.evaluator import evaluate
+from time_travel.rollout import play_door_episode, play_maze_episode
+
+
+def collect(env, agent, path: str, num_episodes: int, epsilon: float):
+    """Logs num_episodes epsilon-greedy episodes of agent, with epsilon 1 a uniform random policy.
+
+    Door observations are indexed the way the agent acts on them, not like run_door.py, which
+    indexes a finished episode with its final clock.
+    """
+    play = play_maze_episode if isinstance(env, MazeEnv) else functools.partial(play_door_episode, live_indices=True)
+    writer = EpisodeLogWriter(path)
+    for episode_idx in tqdm(range(num_episodes), desc="collect", mininterval=5):
+        episode = play(env, agent, epsilon=epsilon)
+        writer.add_episode(episode_idx, episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx,
+                           episode.is_original_timeline, episode.t)
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline fitted Q-iteration over an episode log")
+    parser.add_argument("--env", choices=ENVS, default=MAZE)
+    parser.add_argument("--episode-log", required=True, help="log written by run_maze.py --episode-log or --collect")
+    parser.add_argument("--collect", type=int, metavar="EPISODES",
+                        help="first replace the log with this many episodes of an epsilon-greedy agent")
+    parser.add_argument("--behavior", help="Q-table saved by agent.save() to collect with instead of an untrained agent")
+    parser.add_argument("--epsilon", type=float, default=1.0, help="exploration of the collected episodes")
+    parser.add_argument("--discount", type=float, default=1.0)
+    parser.add_argument("--tol", type=float, default=1e-6, help="max Q-value change of a sweep that counts as converged")
+    parser.add_argument("--max-sweeps", type=int, default=100000)
+    parser.add_argument("--keep-unseen", action="store_true",
+                        help="keep the initial Q-values of actions the log never tried instead of ranking them last")
+    parser.add_argument("--exact", action="store_true",
+                        help="also score the maze table on the exact model, which takes about a minute to compile")
+    parser.add_argument("--out", help="save the fitted Q-table here, agent.load() reads it back")
+    args = parser.parse_args()
+
+    env_fn = functools.partial(MazeEnv, trap_position_observed=True) if args.env == MAZE else DoorEnv
+    env = env_fn()
+    agent = MazeAgent(env) if args.env == MAZE else DoorAgent(env)
+    if args.collect:
+        # shares env with agent, the door agent indexes observations with its env's clock
+        behavior = MazeAgent(env) if args.env == MAZE else DoorAgent(env)
+        if args.behavior:
+            behavior.load(args.behavior)
+        collect(env, behavior, args.episode_log, args.collect, args.epsilon)
+
+    start = time.perf_counter()
+    log = EpisodeLog(args.episode_log)
+    groups = group_episode_log(log, *agent.q_values.shape)
+    grouped = time.perf_counter()
+    print(f"{len(log)} transitions of {log.num_episodes} episodes, {len(groups.pair_obs_idx)} (obs, action) pairs, "
+          f"{len(groups.outcome_pair)} outcomes, grouped in {grouped - start:.2f}s")
+
+    result = fitted_q_iteration(groups, agent.q_values, discount=args.discount, tol=args.tol,
+                                max_sweeps=args.max_sweeps, pessimistic=not args.keep_unseen)
+    print(f"Fitted Q-iteration {result} in {time.perf_counter() - grouped:.2f}s")
+
+    if args.env == DOOR:
+        from time_travel.envs.door_model import compile_door_model, evaluate_q_values, optimal_return
+        model = compile_door_model()
+        print(f"Exact greedy return {evaluate_q_values(model, agent.q_values)}, optimal {optimal_return(model)}")
+    else:
+        print(f"Eval: {evaluate(env_fn, agent.q_values, seed=0)}")
+        if args.exact:
+            from time_travel.envs.maze_model import compile_maze_model, evaluate_q_values, optimal_return
+            model = compile_maze_model(trap_position_observed=True)
+            print(f"Exact greedy return {evaluate_q_values(model, agent.q_values)}, optimal {optimal_return(model)}")
+
+    if args.out:
+        agent.save(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import argparse
+
+from time_travel.metrics import plot_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot a metric from a metrics file, also while the run is still going")
+    parser.add_argument("path", help="JSON lines file written by MetricsSink")
+    parser.add_argument("--out", default="eval_rew.png")
+    parser.add_argument("--kind", default="eval")
+    parser.add_argument("--name", default="mean_reward")
+    args = parser.parse_args()
+
+    plot_metrics(args.path, args.out, kind=args.kind, name=args.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,82 @@
+import argparse
+
 from time_travel.envs.door import Action, DoorEnv
 from time_travel.agents.door_agent import DoorAgent
+from time_travel.envs.door_model import compile_door_model, evaluate_q_values, optimal_return
+from time_travel.convergence import CONVERGED, ON_CONVERGE, STOPPED, ConvergenceMonitor
+from time_travel.checkpoint import CheckpointWriter, load_checkpoint, set_rng_state
+from time_travel.metrics import MetricsSink, plot_metrics
+from time_travel.replay_buffer import ReplayBuffer
 from tqdm import tqdm
-import matplotlib.pyplot as plt
 import numpy as np
 
 def main():
+    parser = argparse.ArgumentParser(description="Tabular Q-learning on the door env")
+    parser.add_argument("--on-converge", choices=ON_CONVERGE,
+                        help="stop, or anneal epsilon to 0 and then stop, once training has converged; off by default")
+    parser.add_argument("--converge-window", type=int, default=100, help="episodes between convergence checks")
+    parser.add_argument("--q-tol", type=float, help="max absolute Q-value change per window, not checked by default")
+    parser.add_argument("--churn-tol", type=float, default=0.01,
+                        help="fraction of updated observations whose greedy action may change per window")
+    parser.add_argument("--eval-patience", type=int,
+                        help="episodes without a better eval reward before it counts as plateaued, off by default "
+                             "because the eval reward can sit on a plateau for most of the run")
+    parser.add_argument("--anneal-episodes", type=int, default=500, help="episodes of the epsilon anneal")
+    parser.add_argument("--metrics", default="metrics_door.jsonl", help="JSON lines file of episode and eval records")
+    parser.add_argument("--checkpoint-dir", default="checkpoints/door")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="episodes between checkpoints, 0 to disable")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint in --checkpoint-dir")
+    args = parser.parse_args()
+
     env = DoorEnv()
     agent = DoorAgent(env)
+    # exact greedy eval reward, cheap enough to compute after every episode
+    model = compile_door_model()
+    print(f"Optimal return: {optimal_return(model)}")
 
-    total_rewards = []
-    rollouts = []
-
-    eval_rewards = []
+    metrics = MetricsSink(args.metrics, append=args.resume)
+    replay_buffer = ReplayBuffer(capacity=10000)
 
     max_epsilon = 0.8
     max_episodes = 10000
 
-    for episode_idx in tqdm(range(max_episodes)):
+    monitor = None
+    if args.on_converge is not None:
+        # the exact eval makes the optimal return a safe target
+        monitor = ConvergenceMonitor(window=args.converge_window, q_tol=args.q_tol, churn_tol=args.churn_tol,
+                                     eval_patience=args.eval_patience, eval_target=optimal_return(model),
+                                     on_converge=args.on_converge, anneal_episodes=args.anneal_episodes)
+
+    start_episode = 0
+    if args.resume:
+        # the replay buffer is not checkpointed and starts empty, metrics are appended to the same file
+        agent.q_values, state = load_checkpoint(args.checkpoint_dir)
+        set_rng_state(state)
+        agent.exploration.set_state(state["exploration"])
+        if monitor is not None and "monitor" in state:
+            monitor.set_state(state["monitor"])
+        start_episode = state["episode_idx"] + 1
+    checkpoint_writer = CheckpointWriter(args.checkpoint_dir) if args.checkpoint_every > 0 else None
+
+    def checkpoint_state(episode_idx):
+        state = {"episode_idx": episode_idx, "exploration": agent.exploration.get_state()}
+        if monitor is not None:
+            # a resumed run keeps its convergence checks and a running anneal
+            state["monitor"] = monitor.get_state()
+        return state
+
+    for episode_idx in tqdm(range(start_episode, max_episodes), initial=start_episode, total=max_episodes):
         obs = env.reset()
         env_running = True
 
         rollout = []
+        timelines = []
+        ts = []
         total_reward = 0
 
         epsilon = max_epsilon * (1 - np.sqrt(episode_idx / max_episodes))
+        if monitor is not None:
+            epsilon = monitor.epsilon(episode_idx, epsilon)
 
         while env_running:
             primary_agent_action = None
@@ -40,8 +93,10 @@ def main():
                 primary_agent_action = time_travel_action
                 prev_obs = obs[1]
 
+            timelines.append(env.is_original_timeline)
             obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
             env_running = not (terminated or truncated)
+            ts.append(info["t"])
 
             curr_obs = obs[0] if env.is_original_timeline else obs[1]
             
@@ -52,67 +107,49 @@ def main():
             #     print(f"success: {reward > 0}, time travel: {not env.is_original_timeline}")
             # print(f"t={info['t']} ({env_running=}): {rollout[-1]}")
         
-        for s, a, r, sp in rollout:
-            agent.update(s, a, sp, r)
+        obs_idx, actions, rewards, next_obs_idx = zip(*[(agent.obs_to_idx(s), a.value, r, agent.obs_to_idx(sp))
+                                                        for s, a, r, sp in rollout])
+        agent.update_batch(obs_idx, actions, rewards, next_obs_idx)
         
-        total_rewards.append(total_reward)
-        rollouts.append(rollout)
-
-        if episode_idx % 100 == 0:
-            eval_rewards.append(eval(env, agent))
-            print(f"Eval at {episode_idx=}: {eval_rewards[-1]}")
-
-    for i in range(len(rollouts) - 5, len(rollouts)):
+        metrics.log("episode", episode_idx, total_reward=total_reward, length=len(rollout))
+        replay_buffer.add_episode(obs_idx, actions, rewards, next_obs_idx, timelines, ts)
+
+        eval_reward = evaluate_q_values(model, agent.q_values)
+        metrics.log("eval", episode_idx, mean_reward=eval_reward)
+        if episode_idx % 1000 == 0:
+            print(f"Eval at {episode_idx=}: {metrics.ema('eval', 'mean_reward'):.2f} EMA, "
+                  f"train reward {metrics.window_mean('episode', 'total_reward'):.2f} over the last 100 episodes")
+
+        # before the checkpoint, which then holds the monitor after this episode
+        events = []
+        if monitor is not None:
+            monitor.add_eval(episode_idx, eval_reward)
+            events = monitor.step(episode_idx, agent.q_values, epsilon, metrics)
+            if CONVERGED in events:
+                print(f"Converged at {episode_idx=}: {monitor.reason}")
+
+        if checkpoint_writer is not None and (episode_idx + 1) % args.checkpoint_every == 0:
+            checkpoint_writer.save(agent.q_values, checkpoint_state(episode_idx))
+
+        if STOPPED in events:
+            print(f"Stopped at {episode_idx=} of {max_episodes}")
+            break
+
+    if checkpoint_writer is not None:
+        if monitor is not None and monitor.converged:
+            # keep the table training stopped with, not only the last periodic checkpoint
+            checkpoint_writer.save(agent.q_values, checkpoint_state(episode_idx))
+        checkpoint_writer.close()
+
+    for episode in replay_buffer.last_episodes(5):
         print("\nNEW EPISODE")
-        for step in rollouts[i]:
+        for step in zip(*(episode[name].tolist() for name in ["obs_idx", "action", "reward", "next_obs_idx"])):
             print(step)
-    # print(total_rewards)
 
-    plt.xlabel("Episode")
-    plt.ylabel("Evaluation reward")
-    plt.plot(range(0, max_episodes, 100), eval_rewards)
-    plt.savefig('eval_rew.png')
+    metrics.close()
+    plot_metrics(args.metrics, "eval_rew.png")
     
 
 
-def eval(env, agent):
-    total_reward = 0
-    num_eval_episodes = 100
-    for _ in tqdm(range(num_eval_episodes)):
-        obs = env.reset()
-        env_running = True
-
-        episode_reward = 0
-
-        while env_running:
-
-            if env.is_original_timeline:
-                normal_action = agent.act(obs[0], deterministic=True)
-                time_travel_action = None
-                primary_agent_action = normal_action
-            else:
-                normal_action = agent.act(obs[0], deterministic=True)
-                time_travel_action = agent.act(obs[1], deterministic=True)
-                primary_agent_action = time_travel_action
-
-            if env.t == 0 and not env.is_original_timeline:
-                print(f"lock action: {time_travel_action}")
-            if env.t == 1:
-                print(f"reward door: {env.reward_door}")
-                print(f"normal agent action: {normal_action}")
-
-            obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
-            env_running = not (terminated or truncated)
-            total_reward += reward
-            episode_reward += reward
-
-            
-            if not env_running:
-                print(f"success: {episode_reward > 0}, time travel: {not env.is_original_timeline}")
-                print()
-
-    return total_reward / num_eval_episodes
-
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
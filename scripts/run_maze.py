@@ -1,51 +1,155 @@
+import argparse
+import functools
+
 from time_travel.envs.maze import Action, MazeEnv
+from time_travel.agents.backups import BACKUPS, ONE_STEP
 from time_travel.agents.maze_agent import MazeAgent
+from time_travel.agents.planning import PLANNING_LR, PrioritizedSweeping
+from time_travel.evaluator import AsyncEvaluator
+from time_travel.instrumentation import make_instrumentation
+from time_travel.convergence import CONVERGED, ON_CONVERGE, STOPPED, ConvergenceMonitor
+from time_travel.checkpoint import CheckpointWriter, load_checkpoint, set_rng_state
+from time_travel.episode_log import EpisodeLogWriter
+from time_travel.metrics import MetricsSink, plot_metrics
+from time_travel.replay_buffer import ReplayBuffer
 from tqdm import tqdm
-import matplotlib.pyplot as plt
 import numpy as np
 
 def main():
-    env = MazeEnv(trap_position_observed=True)
-    agent = MazeAgent(env)
-
-    total_rewards = []
-    rollouts = []
+    parser = argparse.ArgumentParser(description="Tabular Q-learning on the maze")
+    parser.add_argument("--backup", choices=BACKUPS, default=ONE_STEP, help="how episodes update the Q-table")
+    parser.add_argument("--n-steps", type=int, default=10, help="return length of the n_step backup")
+    parser.add_argument("--trace-decay", type=float, default=0.9, help="lambda of the lambda backup")
+    parser.add_argument("--planning-steps", type=int, default=0,
+                        help="prioritized sweeping updates on a learned model after every episode, 0 to disable")
+    parser.add_argument("--planning-lr", type=float, default=PLANNING_LR, help="step size of the planning updates")
+    parser.add_argument("--on-converge", choices=ON_CONVERGE,
+                        help="stop, or anneal epsilon to 0 and then stop, once training has converged; off by default")
+    parser.add_argument("--converge-window", type=int, default=1000, help="episodes between convergence checks")
+    parser.add_argument("--q-tol", type=float, help="max absolute Q-value change per window, not checked by default")
+    parser.add_argument("--churn-tol", type=float,
+                        help="fraction of updated observations whose greedy action may change per window, not checked "
+                             "by default because exploration keeps flipping near-ties in rarely visited observations")
+    parser.add_argument("--eval-patience", type=int, default=20000,
+                        help="episodes without a better eval reward before it counts as plateaued")
+    parser.add_argument("--eval-tol", type=float, default=10.0,
+                        help="smallest eval improvement that counts, above the noise of the sampled eval")
+    parser.add_argument("--eval-target", type=float, help="eval reward that counts as converged")
+    parser.add_argument("--anneal-episodes", type=int, default=5000, help="episodes of the epsilon anneal")
+    parser.add_argument("--instrument", metavar="PATH", help="append per-phase timing summaries to this JSON lines file")
+    parser.add_argument("--summary-every", type=int, default=1000, help="episodes per timing summary")
+    parser.add_argument("--profile", type=int, nargs=2, metavar=("START", "STOP"),
+                        help="run cProfile over episodes [START, STOP) and write the stats to train.prof")
+    parser.add_argument("--eval-workers", type=int, default=1,
+                        help="processes scoring Q-table snapshots while training continues, 0 to evaluate in the loop")
+    parser.add_argument("--episode-log", metavar="DIR", help="keep every episode in a columnar log in this directory")
+    parser.add_argument("--metrics", default="metrics_maze.jsonl", help="JSON lines file of episode and eval records")
+    parser.add_argument("--checkpoint-dir", default="checkpoints/maze")
+    parser.add_argument("--checkpoint-every", type=int, default=10000, help="episodes between checkpoints, 0 to disable")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint in --checkpoint-dir")
+    args = parser.parse_args()
+
+    instrumentation = make_instrumentation(args.instrument, summary_every=args.summary_every,
+                                           profile_window=args.profile)
+    timer = instrumentation.timer
 
-    eval_rewards = []
+    env = MazeEnv(trap_position_observed=True)
+    planning = PrioritizedSweeping(env.action_space.n, args.planning_steps, lr=args.planning_lr) if args.planning_steps > 0 else None
+    agent = MazeAgent(env, backup=args.backup, n_steps=args.n_steps, trace_decay=args.trace_decay, planning=planning)
+    eval_env_fn = functools.partial(MazeEnv, trap_position_observed=True)
+
+    metrics = MetricsSink(args.metrics, append=args.resume)
+    replay_buffer = ReplayBuffer(capacity=100000)
+
+    evaluator = AsyncEvaluator(eval_env_fn, num_workers=args.eval_workers)
+
+    monitor = None
+    if args.on_converge is not None:
+        monitor = ConvergenceMonitor(window=args.converge_window, q_tol=args.q_tol, churn_tol=args.churn_tol,
+                                     eval_patience=args.eval_patience, eval_tol=args.eval_tol,
+                                     eval_target=args.eval_target,
+                                     on_converge=args.on_converge, anneal_episodes=args.anneal_episodes)
+
+    def record_evals(finished):
+        for eval_episode_idx, eval_result in finished:
+            metrics.log("eval", eval_episode_idx, **vars(eval_result))
+            if monitor is not None:
+                monitor.add_eval(eval_episode_idx, eval_result.mean_reward)
+            print(f"Eval at episode_idx={eval_episode_idx}: {eval_result}, "
+                  f"train reward EMA {metrics.ema('episode', 'total_reward'):.2f}")
 
     max_epsilon = 0.8
     max_episodes = 100000
     eval_every = 1000
 
-    for episode_idx in tqdm(range(max_episodes)):
-        obs = env.reset()
+    start_episode = 0
+    if args.resume:
+        # the replay buffer and the planning model are not checkpointed and start empty, metrics are appended to the same file
+        agent.q_values, state = load_checkpoint(args.checkpoint_dir)
+        set_rng_state(state)
+        agent.exploration.set_state(state["exploration"])
+        if monitor is not None and "monitor" in state:
+            monitor.set_state(state["monitor"])
+        start_episode = state["episode_idx"] + 1
+    checkpoint_writer = CheckpointWriter(args.checkpoint_dir) if args.checkpoint_every > 0 else None
+
+    def checkpoint_state(episode_idx):
+        state = {"episode_idx": episode_idx, "exploration": agent.exploration.get_state()}
+        if monitor is not None:
+            # a resumed run keeps its convergence checks and a running anneal
+            state["monitor"] = monitor.get_state()
+        return state
+
+    episode_log = None
+    if args.episode_log is not None:
+        episode_log = EpisodeLogWriter(args.episode_log, append=args.resume)
+        if args.resume:
+            # the episodes logged after the checkpoint are played again
+            episode_log.truncate(start_episode)
+
+    for episode_idx in tqdm(range(start_episode, max_episodes), initial=start_episode, total=max_episodes):
+        instrumentation.start_episode(episode_idx)
+        with timer("env_reset"):
+            obs = env.reset()
         env_running = True
 
         rollout = []
+        timelines = []
+        ts = []
         total_reward = 0
 
         epsilon = max_epsilon * (1 - np.sqrt(episode_idx / max_episodes))
+        if monitor is not None:
+            epsilon = monitor.epsilon(episode_idx, epsilon)
 
         while env_running:
             primary_agent_action = None
             prev_obs = None
 
-            if env.is_original_timeline:
-                normal_action = agent.act(obs[0], epsilon=epsilon, deterministic=False)
-                time_travel_action = None
-                primary_agent_action = normal_action
-                prev_obs = obs[0]
-            else:
-                if obs[0] == rollout[env.t][0]:
-                    normal_action = rollout[env.t][1]
+            with timer("agent_act"):
+                if env.is_original_timeline:
+                    normal_action = agent.act(obs[0], epsilon=epsilon, deterministic=False)
+                    time_travel_action = None
+                    primary_agent_action = normal_action
+                    prev_obs = obs[0]
                 else:
-                    normal_action = agent.act(obs[0], deterministic=True)
-                time_travel_action = agent.act(obs[1], epsilon=epsilon, deterministic=False)
-                primary_agent_action = time_travel_action
-                prev_obs = obs[1]
-
-            obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
+                    if obs[0] == rollout[env.t][0]:
+                        normal_action = rollout[env.t][1]
+                    else:
+                        normal_action = agent.act(obs[0], deterministic=True)
+                    time_travel_action = agent.act(obs[1], epsilon=epsilon, deterministic=False)
+                    primary_agent_action = time_travel_action
+                    prev_obs = obs[1]
+
+            timelines.append(env.is_original_timeline)
+            with timer("env_step"):
+                obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
             env_running = not (terminated or truncated)
+            ts.append(info["t"])
+            if info["invalid_action"]:
+                instrumentation.count("invalid_actions")
+            if timelines[-1] and not env.is_original_timeline:
+                instrumentation.count("time_travels")
 
             curr_obs = obs[0] if env.is_original_timeline else obs[1]
             
@@ -56,61 +160,63 @@ def main():
             #     print(f"success: {reward > 0}, time travel: {not env.is_original_timeline}")
             # print(f"t={info['t']} ({env_running=}): {rollout[-1]}")
         
-        for s, a, r, sp in rollout:
-            agent.update(s, a, sp, r)
+        with timer("agent_update"):
+            obs_idx, actions, rewards, next_obs_idx = zip(*[(agent.obs_to_idx(s), a.value, r, agent.obs_to_idx(sp))
+                                                            for s, a, r, sp in rollout])
+            agent.update_episode(obs_idx, actions, rewards, next_obs_idx)
         
-        total_rewards.append(total_reward)
-        rollouts.append(rollout)
+        metrics.log("episode", episode_idx, total_reward=total_reward, length=len(rollout))
+        with timer("replay_buffer_add"):
+            replay_buffer.add_episode(obs_idx, actions, rewards, next_obs_idx, timelines, ts)
+        if episode_log is not None:
+            with timer("episode_log"):
+                episode_log.add_episode(episode_idx, obs_idx, actions, rewards, next_obs_idx, timelines, ts)
 
         if episode_idx % eval_every == 0:
-            eval_rewards.append(eval(env, agent))
-            print(f"Eval at {episode_idx=}: {eval_rewards[-1]}")
-
-    for i in range(len(rollouts) - 5, len(rollouts)):
+            with timer("eval"):
+                evaluator.submit(episode_idx, agent.q_values)
+        record_evals(evaluator.poll())
+
+        # before the checkpoint, which then holds the monitor after this episode
+        events = monitor.step(episode_idx, agent.q_values, epsilon, metrics) if monitor is not None else []
+        if CONVERGED in events:
+            print(f"Converged at {episode_idx=}: {monitor.reason}")
+
+        if checkpoint_writer is not None and (episode_idx + 1) % args.checkpoint_every == 0:
+            with timer("checkpoint"):
+                # the log has to reach the checkpoint, truncate() on resume only drops episodes
+                if episode_log is not None:
+                    episode_log.flush()
+                checkpoint_writer.save(agent.q_values, checkpoint_state(episode_idx))
+
+        instrumentation.end_episode(episode_idx, len(rollout))
+
+        if STOPPED in events:
+            print(f"Stopped at {episode_idx=} of {max_episodes}")
+            break
+
+    instrumentation.close()
+    record_evals(evaluator.close())
+
+    if checkpoint_writer is not None:
+        if monitor is not None and monitor.converged:
+            # keep the table training stopped with, not only the last periodic checkpoint
+            if episode_log is not None:
+                episode_log.flush()
+            checkpoint_writer.save(agent.q_values, checkpoint_state(episode_idx))
+        checkpoint_writer.close()
+    if episode_log is not None:
+        episode_log.close()
+
+    for episode in replay_buffer.last_episodes(5):
         print("\nNEW EPISODE")
-        for step in rollouts[i]:
+        for step in zip(*(episode[name].tolist() for name in ["obs_idx", "action", "reward", "next_obs_idx"])):
             print(step)
-    # print(total_rewards)
 
-    plt.xlabel("Episode")
-    plt.ylabel("Evaluation reward")
-    plt.plot(range(0, max_episodes, eval_every), eval_rewards)
-    plt.savefig('eval_rew.png')
+    metrics.close()
+    plot_metrics(args.metrics, "eval_rew.png")
     
 
 
-def eval(env, agent):
-    total_reward = 0
-    num_eval_episodes = 100
-    for _ in range(num_eval_episodes):
-        obs = env.reset()
-        env_running = True
-
-        episode_reward = 0
-
-        while env_running:
-
-            if env.is_original_timeline:
-                normal_action = agent.act(obs[0], deterministic=True)
-                time_travel_action = None
-                primary_agent_action = normal_action
-            else:
-                normal_action = agent.act(obs[0], deterministic=True)
-                time_travel_action = agent.act(obs[1], deterministic=True)
-                primary_agent_action = time_travel_action
-
-            obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
-            env_running = not (terminated or truncated)
-            total_reward += reward
-            episode_reward += reward
-
-            
-            # if not env_running:
-            #     print(f"success: {episode_reward > 0}, time travel: {not env.is_original_timeline}")
-            #     print()
-
-    return total_reward / num_eval_episodes
-
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
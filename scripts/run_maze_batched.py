@@ -0,0 +1,99 @@
+import functools
+
+from time_travel.envs.maze import MAX_EPISODE_LEN, MazeEnv
+from time_travel.envs.batched_maze import BatchedMazeEnv, NO_ACTION
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.evaluator import evaluate
+from tqdm import tqdm
+import matplotlib.pyplot as plt
+import numpy as np
+
+def main():
+    """Standalone Q-learning runner over a BatchedMazeEnv, without the metrics, checkpoints and
+    convergence handling of run_maze.py.
+    """
+    num_envs = 256
+    env = BatchedMazeEnv(num_envs, trap_position_observed=True, seed=0)
+    agent = MazeAgent(env)
+    eval_env_fn = functools.partial(MazeEnv, trap_position_observed=True)
+
+    eval_rewards = []
+
+    max_epsilon = 0.8
+    max_episodes = 100000
+    eval_every = 1000
+
+    rows = np.arange(num_envs)
+    # per slot recording of the current episode, replayed in the second timeline
+    first_timeline_obs = np.full((num_envs, MAX_EPISODE_LEN), -1, dtype=np.int64)
+    first_timeline_actions = np.zeros((num_envs, MAX_EPISODE_LEN), dtype=np.int64)
+    # per slot transitions of the current episode, indexed by its step count rather than env.t,
+    # which restarts on time travel, so an episode takes up to two clock runs
+    max_len = 2 * MAX_EPISODE_LEN
+    episode_obs = np.zeros((num_envs, max_len), dtype=np.int64)
+    episode_actions = np.zeros((num_envs, max_len), dtype=np.int64)
+    episode_rewards = np.zeros((num_envs, max_len))
+    episode_next_obs = np.zeros((num_envs, max_len), dtype=np.int64)
+    episode_len = np.zeros(num_envs, dtype=np.int64)
+
+    obs = env.reset()
+    episode_idx = 0
+    progress = tqdm(total=max_episodes)
+
+    while episode_idx < max_episodes:
+        epsilon = max_epsilon * (1 - np.sqrt(episode_idx / max_episodes))
+        is_original_timeline = env.is_original_timeline.copy()
+        t = env.t.copy()
+
+        sampled_actions = agent.act_batch(np.where(is_original_timeline, obs[:, 0], obs[:, 1]), epsilon=epsilon, deterministic=False)
+        greedy_normal_actions = agent.act_batch(obs[:, 0])
+        replay = obs[:, 0] == first_timeline_obs[rows, t]
+        joint_action = np.where(
+            is_original_timeline[:, None],
+            np.stack([sampled_actions, np.full(num_envs, NO_ACTION)], axis=1),
+            np.stack([np.where(replay, first_timeline_actions[rows, t], greedy_normal_actions), sampled_actions], axis=1),
+        )
+
+        prev_obs = np.where(is_original_timeline, obs[:, 0], obs[:, 1])
+        first_timeline_obs[is_original_timeline, t[is_original_timeline]] = obs[is_original_timeline, 0]
+        first_timeline_actions[is_original_timeline, t[is_original_timeline]] = sampled_actions[is_original_timeline]
+
+        obs, reward, terminated, truncated, info = env.step(joint_action)
+        final_obs = info["final_obs"]
+        curr_obs = np.where(info["final_is_original_timeline"], final_obs[:, 0], final_obs[:, 1])
+
+        episode_obs[rows, episode_len] = prev_obs
+        episode_actions[rows, episode_len] = sampled_actions
+        episode_rewards[rows, episode_len] = reward
+        episode_next_obs[rows, episode_len] = curr_obs
+        episode_len += 1
+
+        done = terminated | truncated
+        first_timeline_obs[done] = -1
+
+        finished = np.flatnonzero(done)[:max_episodes - episode_idx]
+        if len(finished):
+            # row-major order keeps the transitions of each finished episode together and in order
+            steps = np.arange(max_len) < episode_len[finished, None]
+            agent.update_batch(episode_obs[finished][steps], episode_actions[finished][steps],
+                               episode_rewards[finished][steps], episode_next_obs[finished][steps])
+        episode_len[done] = 0
+
+        for eval_episode_idx in range(episode_idx, episode_idx + len(finished)):
+            if eval_episode_idx % eval_every == 0:
+                eval_result = evaluate(eval_env_fn, agent.q_values)
+                eval_rewards.append(eval_result.mean_reward)
+                print(f"Eval at episode_idx={eval_episode_idx}: {eval_result}")
+        episode_idx += len(finished)
+        progress.update(len(finished))
+
+    progress.close()
+
+    plt.xlabel("Episode")
+    plt.ylabel("Evaluation reward")
+    plt.plot(range(0, max_episodes, eval_every), eval_rewards)
+    plt.savefig('eval_rew.png')
+
+
+if __name__ == "__main__":
+    main()
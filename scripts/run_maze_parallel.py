@@ -0,0 +1,50 @@
+import argparse
+import functools
+import time
+
+from tqdm import tqdm
+
+from time_travel.envs.maze import MazeEnv
+from time_travel.envs.maze_model import compile_maze_model, evaluate_q_values
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.parallel_trainer import ASYNC, SYNC, ParallelTrainer, epsilon_schedule
+from time_travel.rollout import play_episode
+
+def main():
+    parser = argparse.ArgumentParser(description="Episodes/sec scaling of the parallel maze trainer")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--mode", choices=[SYNC, ASYNC], default=SYNC)
+    parser.add_argument("--episodes", type=int, default=100000)
+    parser.add_argument("--episodes-per-round", type=int, default=1)
+    args = parser.parse_args()
+
+    # exact expected eval reward of the greedy policy, so runs can be compared without sampling noise
+    model = compile_maze_model(trap_position_observed=True)
+
+    start = time.perf_counter()
+    agent = train_serial(args.episodes)
+    print(f"serial: {args.episodes / (time.perf_counter() - start):.0f} episodes/s, "
+          f"eval reward {evaluate_q_values(model, agent.q_values)}")
+
+    env_fn = functools.partial(MazeEnv, trap_position_observed=True)
+    for num_workers in args.workers:
+        trainer = ParallelTrainer(env_fn, MazeAgent, num_workers=num_workers, mode=args.mode,
+                                  episodes_per_round=args.episodes_per_round)
+        _, episodes_per_sec = trainer.train(args.episodes)
+        print(f"{args.mode} {num_workers} workers: {episodes_per_sec:.0f} episodes/s, "
+              f"eval reward {evaluate_q_values(model, trainer.agent.q_values)}")
+        trainer.close()
+
+
+def train_serial(max_episodes: int):
+    """The single process training loop of run_maze.py."""
+    env = MazeEnv(trap_position_observed=True)
+    agent = MazeAgent(env)
+    for episode_idx in tqdm(range(max_episodes)):
+        episode = play_episode(env, agent, epsilon=epsilon_schedule(episode_idx, max_episodes))
+        agent.update_batch(episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx)
+    return agent
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,83 @@
-import gymnasium as gym
-from gymnasium import spaces
+import argparse
+import functools
 
 from sb3_contrib.ppo_recurrent import RecurrentPPO
 from stable_baselines3 import PPO
-from stable_baselines3.common.callbacks import EvalCallback
-from time_travel.envs.maze import Action, MazeEnv, Observation
-
-class MazeWrapper(gym.Wrapper):
-
-    def __init__(self, env: MazeEnv, render_steps: bool = False):
-        super().__init__(env)
-        self.rollout = []
-        self.agent = None
-        self.render_steps = render_steps
-
-        
-        
-    def set_agent(self, agent: RecurrentPPO | PPO):
-        self.agent = agent
-
-    def obs_to_array(self, obs: Observation):
-        active_obs = obs[0] if self.env.is_original_timeline else obs[1]
-        if active_obs is None:
-            return [0, 0, 2, 2, 2, 2, 2, 0]
-        return active_obs.to_array()
-
-    def reset(self, seed=None, options=None):
-        obs = self.env.reset(is_original_timeline=True)
-        self.obs = self.obs_to_array(obs)
-        return self.obs, None
-
-    def step(self, action):
-        # convert single action into joint action
-        if self.render_steps:
-            self.render()
-            print(Action(value=action))
-
-        if self.env.is_original_timeline:
-            normal_action = action
-            time_travel_action = None
+from stable_baselines3.common.callbacks import BaseCallback, EvalCallback
+from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from time_travel.envs.maze import MazeEnv
+from time_travel.envs.maze_wrapper import MazeWrapper, PredictPolicy, distill_policy
+from time_travel.envs.recorder import EpisodeRecorder
+
+
+TABLE = "table"
+PREDICT = "predict"
+
+
+class SyncReplayPolicy(BaseCallback):
+    """Copies the current policy into every env as the normal agent's replay policy.
+
+    With replay TABLE the policy is distilled into a lookup table over all observations first,
+    so replay steps in the envs cost an array index instead of a forward pass.
+    """
+
+    def __init__(self, envs, sync_every: int, replay: str = TABLE):
+        super().__init__()
+        self.envs = envs
+        self.sync_every = sync_every
+        self.replay = replay
+
+    def sync(self):
+        if self.replay == TABLE:
+            replay_policy = distill_policy(self.model.policy, self.model.observation_space.nvec)
         else:
-            if self.obs == self.rollout[self.env.t][0]:
-                normal_action = self.rollout[self.env.t][1]
-            else:
-                normal_action = self.agent.predict(self.obs, deterministic=True)
-            time_travel_action = action
-
-        prev_obs = self.obs
-        joint_action = Action(value=normal_action), Action(value=time_travel_action) if time_travel_action is not None else None
-        obs, reward, terminated, truncated, info = self.env.step(joint_action)
-        self.obs = self.obs_to_array(obs)
-        self.rollout.append((prev_obs, action, reward, self.obs))
-
-        return self.obs, reward, terminated, truncated, info
-
-maze_env = MazeEnv(trap_position_observed=False)
-maze_wrapper = MazeWrapper(env=maze_env)
-
-eval_env = MazeEnv(trap_position_observed=False)
-eval_wrapper = MazeWrapper(env=eval_env, render_steps=True)
-eval_callback = EvalCallback(eval_wrapper, best_model_save_path="./logs/",
-                             log_path="./logs/", eval_freq=1000,
-                             deterministic=True, render=True)
-
-rppo = RecurrentPPO("MlpLstmPolicy", maze_wrapper, verbose=1, ent_coef=0.05)
-# rppo = PPO("MlpPolicy", maze_wrapper, verbose=1, ent_coef=0.75)
-maze_wrapper.set_agent(rppo)
-eval_wrapper.set_agent(rppo)
-rppo.learn(int(1e5), callback=eval_callback)
\ No newline at end of file
+            replay_policy = PredictPolicy(self.model.policy)
+        for env in self.envs:
+            env.env_method("set_replay_policy", replay_policy)
+
+    def _on_training_start(self):
+        self.sync()
+
+    def _on_step(self):
+        if self.n_calls % self.sync_every == 0:
+            self.sync()
+        return True
+
+
+def make_maze_wrapper(record_dir: str | None = None, record_every: int = 1):
+    if record_dir is None:
+        return MazeWrapper(MazeEnv(trap_position_observed=False))
+    env = MazeWrapper(MazeEnv(trap_position_observed=False, render_mode="ansi"))
+    return EpisodeRecorder(env, record_dir, record_every=record_every)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recurrent PPO on the maze")
+    parser.add_argument("--n-envs", type=int, default=8, help="parallel SubprocVecEnv workers")
+    parser.add_argument("--sync-every", type=int, default=1000, help="vec env steps between replay policy syncs")
+    parser.add_argument("--replay", choices=[TABLE, PREDICT], default=TABLE,
+                        help="replay the normal agent from a distilled lookup table or with a forward pass per step")
+    parser.add_argument("--timesteps", type=int, default=int(1e5))
+    parser.add_argument("--record-dir", default="./logs/episodes", help="text logs of the recorded eval episodes")
+    parser.add_argument("--record-every", type=int, default=5,
+                        help="record every n-th eval episode, the default the first of each eval")
+    args = parser.parse_args()
+
+    vec_env_cls = SubprocVecEnv if args.n_envs > 1 else None
+    maze_envs = make_vec_env(make_maze_wrapper, n_envs=args.n_envs, vec_env_cls=vec_env_cls)
+    eval_envs = make_vec_env(functools.partial(make_maze_wrapper, args.record_dir, args.record_every), n_envs=1)
+
+    eval_callback = EvalCallback(eval_envs, best_model_save_path="./logs/",
+                                 log_path="./logs/", eval_freq=max(1000 // args.n_envs, 1),
+                                 deterministic=True)
+    sync_callback = SyncReplayPolicy([maze_envs, eval_envs], args.sync_every, replay=args.replay)
+
+    rppo = RecurrentPPO("MlpLstmPolicy", maze_envs, verbose=1, ent_coef=0.05, device="cpu")
+    # rppo = PPO("MlpPolicy", maze_envs, verbose=1, ent_coef=0.75)
+    rppo.learn(args.timesteps, callback=[sync_callback, eval_callback])
+    maze_envs.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import csv
+import json
+import os
+
+from time_travel.envs import ENVS
+from time_travel.sweep import LogUniform, Uniform, format_summary, grid_configs, random_configs, run_sweep, summarize_sweep
+
+GRID = "grid"
+RANDOM = "random"
+
+
+def parse_value(text: str):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return {"True": True, "False": False}.get(text, text)
+
+
+def parse_param(text: str):
+    """name=v1,v2,... for a list of values, name=uniform:low:high or name=loguniform:low:high for a range."""
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"expected name=values, got {text}")
+    kind, *bounds = values.split(":")
+    if kind in ("uniform", "loguniform") and len(bounds) == 2:
+        low, high = map(float, bounds)
+        return name, Uniform(low, high) if kind == "uniform" else LogUniform(low, high)
+    return name, [parse_value(value) for value in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep over the tabular experiments",
+                                     epilog="example: --env maze --param lr=1e-3,1e-2,1e-1 --param decay=sqrt,linear "
+                                            "--seeds 0 1 2")
+    parser.add_argument("--env", choices=ENVS, default="door")
+    parser.add_argument("--param", type=parse_param, action="append", default=[], metavar="NAME=VALUES",
+                        help="a parameter to vary, repeat for several")
+    parser.add_argument("--search", choices=[GRID, RANDOM], default=GRID)
+    parser.add_argument("--num-samples", type=int, default=20, help="configs drawn by a random search")
+    parser.add_argument("--search-seed", type=int, default=0, help="seed of the random search, keep it to resume")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--episodes", type=int, default=10000)
+    parser.add_argument("--eval-every", type=int, default=100)
+    parser.add_argument("--workers", type=int, help="worker processes, all cores by default")
+    parser.add_argument("--out", default="sweeps/sweep", help="directory of the run files and the summary")
+    parser.add_argument("--summary-only", action="store_true", help="rank the runs finished so far without training")
+    args = parser.parse_args()
+
+    if not args.summary_only:
+        space = dict(args.param)
+        if args.search == GRID:
+            ranges = [name for name, values in space.items() if not isinstance(values, list)]
+            if ranges:
+                parser.error(f"a grid search needs lists of values, {ranges} are ranges")
+            configs = grid_configs(space)
+        else:
+            configs = random_configs(space, args.num_samples, seed=args.search_seed)
+        run_sweep(args.out, args.env, configs, args.seeds, args.episodes, args.eval_every, num_workers=args.workers)
+
+    rows = summarize_sweep(args.out)
+    print(format_summary(rows))
+    with open(os.path.join(args.out, "summary.csv"), "w", newline="") as f:
+        names = list(dict.fromkeys(name for row in rows for name in row["config"]))
+        writer = csv.writer(f)
+        writer.writerow(["rank", *names, "seeds", "final_mean", "final_std", "auc_mean", "auc_std"])
+        for rank, row in enumerate(rows, 1):
+            writer.writerow([rank, *(row["config"].get(name, "") for name in names), row["seeds"],
+                             row["final_mean"], row["final_std"], row["auc_mean"], row["auc_std"]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from time_travel.envs.maze import Action, CellState, GRID_SIZE, MazeEnv
+from time_travel.envs.fast_maze import GOAL_CELL, FastMazeEnv, to_flat
+
+NUM_STEPS = 20000
+
+
+def reset_both(env: MazeEnv, fast_env: FastMazeEnv, seed: int):
+    random.seed(seed)
+    obs = env.reset()
+    random.seed(seed)
+    return obs, fast_env.reset()
+
+
+@pytest.mark.parametrize("trap_position_observed", [True, False])
+def test_fast_maze_matches_maze(trap_position_observed):
+    """Steps MazeEnv and FastMazeEnv with the same random actions and seeds and compares every output."""
+    rng = np.random.default_rng(0)
+    env = MazeEnv(trap_position_observed=trap_position_observed)
+    fast_env = FastMazeEnv(trap_position_observed=trap_position_observed)
+    to_idx = lambda o: fast_env.truncated_obs_idx if o is None else o.to_idx()
+
+    obs, fast_obs = reset_both(env, fast_env, seed=0)
+    num_time_travels = 0
+    for i in range(NUM_STEPS):
+        assert tuple(to_idx(o) for o in obs) == fast_obs, f"observation mismatch at step {i}"
+        assert env.get_state() == fast_env.get_state(), f"state mismatch at step {i}"
+
+        # states are interchangeable, hand each env the other's state now and then
+        if i % 97 == 0:
+            state = env.get_state()
+            env.set_state(fast_env.get_state())
+            fast_env.set_state(state)
+
+        # time travel is only reachable by starting a step at the goal, so put the agent there now and then
+        if env.is_original_timeline and rng.random() < 0.01:
+            env.normal_agent_pos = (GRID_SIZE-1, GRID_SIZE-1)
+            fast_env.normal_cell = GOAL_CELL
+
+        normal_action = int(rng.integers(len(Action)))
+        time_travel_action = None if env.is_original_timeline else int(rng.integers(len(Action)))
+        was_original_timeline = env.is_original_timeline
+        obs, reward, terminated, truncated, info = env.step(
+            (Action(normal_action), None if time_travel_action is None else Action(time_travel_action)))
+        fast_obs, fast_reward, fast_terminated, fast_truncated, fast_info = fast_env.step(
+            (normal_action, time_travel_action))
+
+        assert (reward, terminated, truncated, info) == (fast_reward, fast_terminated, fast_truncated, fast_info), \
+            f"step mismatch at step {i}"
+        assert env.grid == {pos: CellState(fast_env.grid[to_flat(*pos)]) for pos in env.grid}, \
+            f"grid mismatch at step {i}"
+        assert env.is_original_timeline == fast_env.is_original_timeline
+        num_time_travels += was_original_timeline and not env.is_original_timeline
+
+        if terminated or truncated:
+            obs, fast_obs = reset_both(env, fast_env, seed=i)
+
+    assert num_time_travels > 0, "no time travel reset was exercised"
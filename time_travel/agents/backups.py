@@ -0,0 +1,60 @@
+import numpy as np
+
+from time_travel.agents.q_table import HashedQTable, add_at
+
+# how an agent turns a finished episode into Q-value updates
+ONE_STEP = "one_step"    # one-step Q-learning targets, all from the Q-values before the episode
+BACKWARD = "backward"    # one-step Q-learning applied from the last transition to the first
+N_STEP = "n_step"        # n-step returns bootstrapped from the max Q-value n steps later
+LAMBDA = "lambda"        # Peng's Q(lambda) returns, mixing all n-step returns with weights lambda^(n-1)
+BACKUPS = (ONE_STEP, BACKWARD, N_STEP, LAMBDA)
+
+
+def one_step_targets(q_values: np.ndarray | HashedQTable, rewards: np.ndarray, next_obs_idx: np.ndarray):
+    """Targets r_t + max_a Q(s_{t+1}, a) for a batch of transitions."""
+    return np.asarray(rewards, dtype=np.float64) + np.max(q_values[np.asarray(next_obs_idx)], axis=1)
+
+
+def n_step_targets(q_values: np.ndarray | HashedQTable, rewards: np.ndarray, next_obs_idx: np.ndarray, n: int):
+    """Targets sum_{k<n} r_{t+k} + max_a Q(s_{t+n}, a) for one episode, cut off at its end.
+
+    Rewards are undiscounted, like in the one-step update.
+    """
+    rewards = np.asarray(rewards, dtype=np.float64)
+    length = len(rewards)
+    next_values = np.max(q_values[np.asarray(next_obs_idx)], axis=1)
+    reward_sums = np.concatenate([[0.0], np.cumsum(rewards)])
+
+    last = np.minimum(np.arange(length) + n, length) - 1
+    return reward_sums[last + 1] - reward_sums[:-1] + next_values[last]
+
+
+def lambda_targets(q_values: np.ndarray | HashedQTable, rewards: np.ndarray, next_obs_idx: np.ndarray,
+                   trace_decay: float):
+    """Targets G_t = r_t + (1 - lambda) max_a Q(s_{t+1}, a) + lambda G_{t+1} for one episode, with
+    G_{T-1} the one-step target of the last transition.
+    """
+    next_values = np.max(q_values[np.asarray(next_obs_idx)], axis=1).tolist()
+    targets = [0.0] * len(next_values)
+    ret = next_values[-1]
+    for t in reversed(range(len(targets))):
+        ret = rewards[t] + (1 - trace_decay) * next_values[t] + trace_decay * ret
+        targets[t] = ret
+    return np.array(targets)
+
+
+def apply_targets(q_values: np.ndarray | HashedQTable, obs_idx: np.ndarray, actions: np.ndarray,
+                  targets: np.ndarray, lr: float):
+    """Moves Q(s, a) towards the targets, all computed before the update.
+
+    A pair repeated k times moves by 1 - (1 - lr)^k towards the mean of its targets, as far as k
+    updates in a row towards that mean would move it, instead of k * lr steps from the same
+    stale value, which overshoot the target once k * lr > 1.
+    """
+    num_actions = q_values.shape[1]
+    keys = np.asarray(obs_idx, dtype=np.int64) * num_actions + np.asarray(actions, dtype=np.int64)
+    keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    mean_targets = np.bincount(inverse.ravel(), weights=np.asarray(targets, dtype=np.float64)) / counts
+    obs_idx, actions = keys // num_actions, keys % num_actions
+    # pairs are unique now, add_at only to allocate rows of a sparse table
+    add_at(q_values, (obs_idx, actions), (1 - (1 - lr) ** counts) * (mean_targets - q_values[obs_idx, actions]))
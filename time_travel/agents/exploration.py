@@ -0,0 +1,98 @@
+import math
+
+import numpy as np
+
+SOFTMAX = "softmax"
+EPSILON_GREEDY = "epsilon_greedy"
+# with probability epsilon a uniform action, otherwise a softmax sample, what the agents always did
+MIXED = "mixed"
+MODES = (SOFTMAX, EPSILON_GREEDY, MIXED)
+
+
+class ExplorationPolicy:
+    """Samples exploratory actions from Q-values with its own np.random.Generator stream.
+
+    Single observations draw from a pre-drawn block of uniforms and sample the softmax by
+    inverse CDF in plain Python, which is much cheaper than np.random.choice for a few actions.
+    Batches use the same sampling vectorized. Softmax logits are Q-values / temperature minus
+    their max, so large rewards cannot overflow. With seed None the stream is seeded from the
+    legacy np.random state, so np.random.seed keeps whole runs reproducible. Use spawn() for
+    independent streams in parallel workers.
+    """
+
+    def __init__(self, num_actions: int, mode: str = MIXED, temperature: float = 1.0,
+                 seed: int | np.random.SeedSequence | None = None, block_size: int = 4096):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode}, expected one of {MODES}")
+
+        self.num_actions = num_actions
+        self.mode = mode
+        self.temperature = temperature
+        self.block_size = block_size + block_size % 2
+
+        if seed is None:
+            seed = int(np.random.randint(2**63 - 1))
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self._refill()
+
+    def _refill(self):
+        # the generator state the block is drawn from, so get_state() does not have to store the block
+        self._block_state = self.rng.bit_generator.state
+        self._block = self.rng.random(self.block_size).tolist()
+        self._pos = 0
+
+    def spawn(self, n: int):
+        """n policies with the same settings and independent streams."""
+        return [ExplorationPolicy(self.num_actions, self.mode, self.temperature, seed=child, block_size=self.block_size)
+                for child in self.seed_sequence.spawn(n)]
+
+    def get_state(self):
+        """A JSON compatible snapshot of the stream that set_state() restores."""
+        return {"block_state": self._block_state, "pos": self._pos, "bit_generator": self.rng.bit_generator.state}
+
+    def set_state(self, state: dict):
+        self.rng.bit_generator.state = state["block_state"]
+        self._refill()
+        self._pos = state["pos"]
+        self.rng.bit_generator.state = state["bit_generator"]
+
+    def sample(self, q_values: np.ndarray, epsilon: float = 0.0):
+        """Samples an action index for one observation's Q-values."""
+        pos = self._pos
+        if pos == self.block_size:
+            self._refill()
+            pos = 0
+        explore_u, action_u = self._block[pos], self._block[pos + 1]
+        self._pos = pos + 2
+
+        if self.mode != SOFTMAX and explore_u < epsilon:
+            return int(action_u * self.num_actions)
+        if self.mode == EPSILON_GREEDY:
+            return int(np.argmax(q_values))
+
+        q = q_values.tolist()
+        q_max = max(q)
+        weights = [math.exp((x - q_max) / self.temperature) for x in q]
+        threshold = action_u * sum(weights)
+        for action, weight in enumerate(weights):
+            threshold -= weight
+            if threshold < 0:
+                return action
+        return len(weights) - 1
+
+    def sample_batch(self, q_values: np.ndarray, epsilon: float = 0.0):
+        """Samples an action index per row of q_values, shaped (..., num_actions)."""
+        shape = q_values.shape[:-1]
+        explore_u = self.rng.random(shape)
+        action_u = self.rng.random(shape)
+
+        if self.mode == EPSILON_GREEDY:
+            exploit = np.argmax(q_values, axis=-1)
+        else:
+            weights = np.exp((q_values - np.max(q_values, axis=-1, keepdims=True)) / self.temperature)
+            cdf = np.cumsum(weights, axis=-1)
+            exploit = np.minimum((action_u[..., None] * cdf[..., -1:] >= cdf).sum(axis=-1), self.num_actions - 1)
+        if self.mode == SOFTMAX:
+            return exploit
+        return np.where(explore_u < epsilon, (action_u * self.num_actions).astype(np.int64), exploit)
@@ -0,0 +1,169 @@
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+
+from time_travel.agents.q_table import HashedQTable
+
+# successor of a terminal transition in TransitionGroups, its value is 0
+TERMINAL = -1
+
+
+@dataclass
+class TransitionGroups:
+    """Logged (obs_idx, action, reward, next_obs_idx) transitions grouped by (obs_idx, action)
+    pair and by (pair, next_obs_idx) outcome, see group_transitions().
+
+    Pairs are sorted by obs_idx and then action, outcome_pair indexes the pair arrays. Outcomes
+    of terminal transitions have outcome_next_obs_idx TERMINAL.
+    """
+    pair_obs_idx: np.ndarray
+    pair_actions: np.ndarray
+    pair_count: np.ndarray
+    pair_reward: np.ndarray
+    outcome_pair: np.ndarray
+    outcome_next_obs_idx: np.ndarray
+    outcome_count: np.ndarray
+
+    @property
+    def num_transitions(self):
+        return int(self.pair_count.sum())
+
+
+@dataclass
+class FittedQResult:
+    num_sweeps: int
+    max_change: float
+    converged: bool
+
+    def __str__(self):
+        state = "converged" if self.converged else "not converged"
+        return f"{state} after {self.num_sweeps} sweeps, last max Q change {self.max_change:.3g}"
+
+
+def _count_batch(obs_idx, actions, rewards, next_obs_idx, dones, num_obs: int, num_actions: int):
+    pair_keys = np.asarray(obs_idx, dtype=np.int64) * num_actions + np.asarray(actions, dtype=np.int64)
+    keys, inverse = np.unique(pair_keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    reward_sums = np.bincount(inverse, weights=np.asarray(rewards, dtype=np.float64))
+    # terminal transitions lead to the extra successor num_obs
+    next_obs_idx = np.where(dones, num_obs, np.asarray(next_obs_idx, dtype=np.int64))
+    outcome_keys, outcome_counts = np.unique(pair_keys * (num_obs + 1) + next_obs_idx, return_counts=True)
+    return keys, counts, reward_sums, outcome_keys, outcome_counts
+
+
+def _merge(keys: list[np.ndarray], *values: list[np.ndarray]):
+    if len(keys) == 1:
+        return keys[0], *(v[0] for v in values)
+    merged, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    return merged, *(np.bincount(inverse, weights=np.concatenate(v)) for v in values)
+
+
+def group_transitions(batches, num_obs: int, num_actions: int):
+    """Groups the transitions of an iterable of (obs_idx, actions, rewards, next_obs_idx, dones) batches.
+
+    dones marks the last transition of each episode. Its successor is stored as TERMINAL, the
+    observation it returned does not matter for the value of the episode.
+    Batches are reduced one at a time, so a log larger than memory can be grouped segment by
+    segment, see group_episode_log().
+    """
+    if num_obs * num_actions * (num_obs + 1) >= 2 ** 63:
+        raise ValueError(f"{num_obs} observations with {num_actions} actions are too many to group with int64 keys")
+
+    counted = [_count_batch(*batch, num_obs=num_obs, num_actions=num_actions) for batch in batches]
+    if not counted:
+        raise ValueError("No transitions to group")
+    keys, counts, reward_sums = _merge(*([c[i] for c in counted] for i in range(3)))
+    outcome_keys, outcome_counts = _merge([c[3] for c in counted], [c[4] for c in counted])
+
+    next_obs_idx = outcome_keys % (num_obs + 1)
+    return TransitionGroups(
+        pair_obs_idx=keys // num_actions,
+        pair_actions=keys % num_actions,
+        pair_count=counts.astype(np.int64),
+        pair_reward=reward_sums / counts,
+        # outcome keys are sorted by pair key first, like the pair keys themselves
+        outcome_pair=np.searchsorted(keys, outcome_keys // (num_obs + 1)),
+        outcome_next_obs_idx=np.where(next_obs_idx == num_obs, TERMINAL, next_obs_idx),
+        outcome_count=outcome_counts.astype(np.int64),
+    )
+
+
+def group_episode_log(log, num_obs: int, num_actions: int):
+    """Groups the transitions of an EpisodeLog segment by segment, without loading it whole.
+    The last transition of every logged episode is terminal.
+    """
+    episode_ends = log.episode_starts + log.episode_lengths - 1
+    columns = ["obs_idx", "action", "reward", "next_obs_idx"]
+
+    def batches():
+        for offset, segment in zip(log.offsets, log.iter_segments(columns)):
+            dones = np.zeros(len(segment["obs_idx"]), dtype=bool)
+            ends = episode_ends[(episode_ends >= offset) & (episode_ends < offset + len(dones))]
+            dones[ends - offset] = True
+            yield *(segment[name] for name in columns), dones
+
+    return group_transitions(batches(), num_obs, num_actions)
+
+
+def fitted_q_iteration(groups: TransitionGroups, q_values: np.ndarray | HashedQTable, discount: float = 1.0,
+                       tol: float = 1e-6, max_sweeps: int = 100000, pessimistic: bool = True):
+    """Tabular Q-iteration on the empirical model of the logged transitions, written into q_values.
+
+    Every sweep sets all logged pairs at once to Q(s, a) = mean r + discount * sum_s' p(s' | s, a) max_a' Q(s', a')
+    with the successor frequencies p of the log, until no Q-value changes by more than tol.
+    Terminal transitions do not bootstrap. The online updates bootstrap from every successor,
+    which on the door env, whose agent indexes a finished episode's observations with the final
+    clock, makes terminal steps look like zero reward self-loops with any value as a fixed point.
+    Rewards are undiscounted by default. q_values is the starting point of the iteration, and
+    successors that are never logged observations keep the max of their row in it.
+
+    Actions the log never tried in a logged observation do not count in the max and end up one
+    below the lowest fitted value of their row, so the greedy policy only takes logged actions
+    while the table stays finite for further online training. Without pessimistic they keep
+    their value in q_values and count like the online updates count them, which on a zero
+    initialized maze table makes every untried action look better than the logged ones.
+
+    Undiscounted iteration need not converge on logged cycles with nonzero net reward, like the
+    maze's time travel loops. A run that stops at max_sweeps above tol warns, pass discount < 1
+    for such logs.
+    """
+    obs_starts = np.flatnonzero(np.diff(groups.pair_obs_idx, prepend=-1))
+    obs_idx = groups.pair_obs_idx[obs_starts]
+    pair_obs = np.repeat(np.arange(len(obs_idx)), np.diff(np.append(obs_starts, len(groups.pair_obs_idx))))
+    rows = np.array(q_values[obs_idx], dtype=np.float64)
+    if pessimistic:
+        rows[:] = -np.inf
+
+    # successor values, the ones of logged observations are refreshed every sweep
+    next_obs_idx, outcome_next = np.unique(groups.outcome_next_obs_idx, return_inverse=True)
+    next_values = np.max(q_values[np.maximum(next_obs_idx, 0)], axis=1).astype(np.float64)
+    next_values[next_obs_idx == TERMINAL] = 0.0
+    next_pos = np.minimum(np.searchsorted(obs_idx, next_obs_idx), len(obs_idx) - 1)
+    next_logged = obs_idx[next_pos] == next_obs_idx
+    next_pos = next_pos[next_logged]
+
+    outcome_weights = discount * groups.outcome_count / groups.pair_count[groups.outcome_pair]
+    num_pairs = len(groups.pair_obs_idx)
+
+    q = np.asarray(q_values[groups.pair_obs_idx, groups.pair_actions], dtype=np.float64)
+    max_change = np.inf
+    sweep = 0
+    while sweep < max_sweeps and max_change > tol:
+        rows[pair_obs, groups.pair_actions] = q
+        next_values[next_logged] = np.max(rows, axis=1)[next_pos]
+        new_q = groups.pair_reward + np.bincount(groups.outcome_pair, weights=outcome_weights * next_values[outcome_next],
+                                                 minlength=num_pairs)
+        max_change = float(np.max(np.abs(new_q - q)))
+        q = new_q
+        sweep += 1
+
+    rows[pair_obs, groups.pair_actions] = q
+    if pessimistic:
+        rows = np.where(np.isneginf(rows), (np.minimum.reduceat(q, obs_starts) - 1)[:, None], rows)
+    q_values[obs_idx] = rows
+    result = FittedQResult(num_sweeps=sweep, max_change=max_change, converged=max_change <= tol)
+    if not result.converged:
+        warnings.warn(f"Fitted Q-iteration {result}, tol {tol}; try discount < 1 if the log has reward cycles",
+                      RuntimeWarning, stacklevel=2)
+    return result
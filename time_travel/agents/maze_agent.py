@@ -1,42 +1,76 @@
 import numpy as np
 
 from time_travel.envs.maze import *
+from time_travel.agents.q_table import make_q_table
+from time_travel.agents.backups import BACKUPS, BACKWARD, N_STEP, ONE_STEP, apply_targets, lambda_targets, n_step_targets
+from time_travel.agents.exploration import ExplorationPolicy
+from time_travel.agents.planning import PrioritizedSweeping
+from time_travel.agents.tabular import TabularAgent
 
-class MazeAgent:
+class MazeAgent(TabularAgent):
 
-    def __init__(self, env: MazeEnv, lr: float = 1e-2):
+    def __init__(self, env: MazeEnv, lr: float = 1e-2, sparse: bool = False, dtype=np.float64,
+                 exploration: ExplorationPolicy | None = None, backup: str = ONE_STEP, n_steps: int = 10,
+                 trace_decay: float = 0.9, planning: PrioritizedSweeping | None = None):
         self.env = env
-        self.q_values = np.zeros((np.prod(self.env.observation_space.nvec) + 1, self.env.action_space.n))
+        # a sparse table allocates rows on first write, for grids whose dense table does not fit in memory
+        self.q_values = make_q_table(int(np.prod(self.env.observation_space.nvec)) + 1, self.env.action_space.n,
+                                     sparse=sparse, dtype=dtype)
         self.lr = lr
+        self.exploration = exploration or ExplorationPolicy(self.env.action_space.n)
+        if backup not in BACKUPS:
+            raise ValueError(f"Unknown backup {backup}, expected one of {BACKUPS}")
+        # used by update_episode, see time_travel/agents/backups.py
+        self.backup = backup
+        self.n_steps = n_steps
+        self.trace_decay = trace_decay
+        # optional model of the observed transitions, planned on after every update_episode
+        self.planning = planning
 
         self.truncated_obs_idx = self.q_values.shape[0] - 1
 
-    def _obs_to_idx(self, obs: Observation | ObservationWithTrapPos):
+    def obs_to_idx(self, obs: Observation | ObservationWithTrapPos):
         if obs is None:
             return self.truncated_obs_idx
         
-        return obs.to_idx()
-    
-    def softmax_stable(self, x):
-        return np.exp(x - np.max(x)) / np.sum(np.exp(x - np.max(x)))
+        return obs.to_idx(self.env.grid_size)
     
     def act(self, obs: Observation | ObservationWithTrapPos, epsilon: float = 0, deterministic: bool = True):
-        obs_idx = self._obs_to_idx(obs)
+        return Action(value=self.act_idx(self.obs_to_idx(obs), epsilon=epsilon, deterministic=deterministic))
+
+    def act_idx(self, obs_idx: int, epsilon: float = 0, deterministic: bool = True):
         obs_qs = self.q_values[obs_idx]
 
         if deterministic:
-            action_idx = np.argmax(obs_qs)
-        elif np.random.rand() > epsilon:
-            action_idx = np.random.choice(np.arange(self.env.action_space.n), p=self.softmax_stable(obs_qs))
-        else:
-            action_idx = np.random.choice(np.arange(self.env.action_space.n))
+            return int(np.argmax(obs_qs))
+        return self.exploration.sample(obs_qs, epsilon)
 
-        return Action(value=action_idx)
-    
     def update(self, obs: Observation | ObservationWithTrapPos, action: Action, next_obs: Observation | ObservationWithTrapPos, reward: float):
-        obs_idx = self._obs_to_idx(obs)
-        next_obs_idx = self._obs_to_idx(next_obs)
+        self.update_idx(self.obs_to_idx(obs), action.value, self.obs_to_idx(next_obs), reward)
 
+    def update_idx(self, obs_idx: int, action: int, next_obs_idx: int, reward: float):
         next_q = np.max(self.q_values[next_obs_idx])
-        this_q = self.q_values[obs_idx][action.value]
-        self.q_values[obs_idx][action.value] += self.lr * (reward + next_q - this_q)
\ No newline at end of file
+        this_q = self.q_values[obs_idx, action]
+        self.q_values[obs_idx, action] += self.lr * (reward + next_q - this_q)
+
+    def update_episode(self, obs_idx: np.ndarray, actions: np.ndarray, rewards: np.ndarray, next_obs_idx: np.ndarray):
+        """Updates the Q-values from the transitions of one whole episode, in order, with self.backup.
+
+        With planning set, the episode is then added to its model and planning_steps modelled
+        updates follow.
+        """
+        if self.backup == ONE_STEP:
+            self.update_batch(obs_idx, actions, rewards, next_obs_idx)
+        elif self.backup == BACKWARD:
+            for transition in reversed(list(zip(obs_idx, actions, next_obs_idx, rewards))):
+                self.update_idx(*transition)
+        else:
+            if self.backup == N_STEP:
+                targets = n_step_targets(self.q_values, rewards, next_obs_idx, self.n_steps)
+            else:
+                targets = lambda_targets(self.q_values, rewards, next_obs_idx, self.trace_decay)
+            apply_targets(self.q_values, obs_idx, actions, targets, self.lr)
+
+        if self.planning is not None:
+            self.planning.observe(self.q_values, obs_idx, actions, rewards, next_obs_idx)
+            self.planning.plan(self.q_values)
@@ -0,0 +1,148 @@
+import heapq
+
+import numpy as np
+
+from time_travel.agents.q_table import HashedQTable
+
+
+class TransitionModel:
+    """Counts of observed (obs_idx, action) -> (next_obs_idx, reward) transitions, stored only for visited pairs.
+
+    Observations are partial and the step reward depends on the clock, so a pair can lead to
+    different successors and rewards. The model keeps the mean reward of each pair and how often
+    each successor followed it, and targets are expectations under these frequencies. Pairs and
+    their outcomes live in growing flat arrays, a pair's slot is its index into the pair arrays.
+    """
+
+    def __init__(self, num_actions: int, initial_capacity: int = 1024):
+        self.num_actions = num_actions
+        self.slots = {}
+        self.obs_idx = np.zeros(initial_capacity, dtype=np.int64)
+        self.actions = np.zeros(initial_capacity, dtype=np.int64)
+        self.reward_sum = np.zeros(initial_capacity, dtype=np.float64)
+        self.count = np.zeros(initial_capacity, dtype=np.int64)
+        self.num_slots = 0
+
+        # one outcome per (slot, next_obs_idx) seen
+        self.outcomes = {}
+        self.outcome_slot = np.zeros(initial_capacity, dtype=np.int64)
+        self.outcome_next_obs_idx = np.zeros(initial_capacity, dtype=np.int64)
+        self.outcome_count = np.zeros(initial_capacity, dtype=np.int64)
+        self.num_outcomes = 0
+        self.slot_outcomes = []
+        # next_obs_idx -> slots of the pairs seen leading there
+        self.predecessors = {}
+
+    def __len__(self):
+        return self.num_slots
+
+    def _grow(self, names: list[str]):
+        for name in names:
+            values = getattr(self, name)
+            setattr(self, name, np.concatenate([values, np.zeros_like(values)]))
+
+    def add(self, obs_idx: int, action: int, reward: float, next_obs_idx: int):
+        """Records one transition and returns its slot."""
+        key = obs_idx * self.num_actions + action
+        slot = self.slots.get(key)
+        if slot is None:
+            if self.num_slots == len(self.obs_idx):
+                self._grow(["obs_idx", "actions", "reward_sum", "count"])
+            slot = self.slots[key] = self.num_slots
+            self.obs_idx[slot], self.actions[slot] = obs_idx, action
+            self.slot_outcomes.append([])
+            self.num_slots += 1
+
+        outcome = self.outcomes.get((slot, next_obs_idx))
+        if outcome is None:
+            if self.num_outcomes == len(self.outcome_slot):
+                self._grow(["outcome_slot", "outcome_next_obs_idx", "outcome_count"])
+            outcome = self.outcomes[(slot, next_obs_idx)] = self.num_outcomes
+            self.outcome_slot[outcome], self.outcome_next_obs_idx[outcome] = slot, next_obs_idx
+            self.slot_outcomes[slot].append(outcome)
+            self.predecessors.setdefault(next_obs_idx, set()).add(slot)
+            self.num_outcomes += 1
+
+        self.reward_sum[slot] += reward
+        self.count[slot] += 1
+        self.outcome_count[outcome] += 1
+        return slot
+
+    def targets(self, q_values: np.ndarray | HashedQTable, slots: np.ndarray):
+        """Expected one-step targets mean reward + E[max_a Q(next_obs, a)] of the pairs in slots."""
+        outcome_lists = [self.slot_outcomes[slot] for slot in slots.tolist()]
+        outcomes = np.fromiter((outcome for outcome_list in outcome_lists for outcome in outcome_list), dtype=np.int64)
+        groups = np.repeat(np.arange(len(slots)), [len(outcome_list) for outcome_list in outcome_lists])
+
+        next_values = np.max(q_values[self.outcome_next_obs_idx[outcomes]], axis=1)
+        weighted_next_values = np.bincount(groups, self.outcome_count[outcomes] * next_values, minlength=len(slots))
+        return (self.reward_sum[slots] + weighted_next_values) / self.count[slots]
+
+
+# the targets are expectations under the model, so planning can move a Q-value all the way to its target
+PLANNING_LR = 1.0
+
+
+class PrioritizedSweeping:
+    """Dyna-style planning for the tabular agents, ordered by TD error (prioritized sweeping).
+
+    observe() adds real transitions to a TransitionModel and queues them by their absolute
+    TD error. plan() then pops the pair with the largest error, moves its Q-value towards the
+    expected target under the model, and requeues the predecessors of its observation, whose
+    targets just changed. Pairs with errors below threshold are not queued.
+    """
+
+    def __init__(self, num_actions: int, planning_steps: int = 100, lr: float = PLANNING_LR, threshold: float = 1e-3):
+        self.model = TransitionModel(num_actions)
+        self.planning_steps = planning_steps
+        self.lr = lr
+        self.threshold = threshold
+        # max-heap of (-priority, slot) entries, priority[slot] is the live one, older entries are skipped
+        self.queue = []
+        self.priority = {}
+
+    def __len__(self):
+        """Number of queued pairs."""
+        return len(self.priority)
+
+    def _td_errors(self, q_values: np.ndarray | HashedQTable, slots: np.ndarray):
+        model = self.model
+        return model.targets(q_values, slots) - q_values[model.obs_idx[slots], model.actions[slots]]
+
+    def _push(self, slots: np.ndarray, td_errors: np.ndarray):
+        queued = np.abs(td_errors) > self.threshold
+        for slot, priority in zip(slots[queued].tolist(), np.abs(td_errors[queued]).tolist()):
+            if priority > self.priority.get(slot, 0.0):
+                self.priority[slot] = priority
+                heapq.heappush(self.queue, (-priority, slot))
+
+    def observe(self, q_values: np.ndarray | HashedQTable, obs_idx: np.ndarray, actions: np.ndarray,
+                rewards: np.ndarray, next_obs_idx: np.ndarray):
+        """Adds the transitions of an episode to the model and queues them."""
+        slots = np.array([self.model.add(*transition) for transition in zip(
+            np.asarray(obs_idx).tolist(), np.asarray(actions).tolist(),
+            np.asarray(rewards, dtype=np.float64).tolist(), np.asarray(next_obs_idx).tolist())], dtype=np.int64)
+        self._push(slots, self._td_errors(q_values, slots))
+
+    def plan(self, q_values: np.ndarray | HashedQTable, steps: int | None = None):
+        """Applies up to steps (default planning_steps) modelled TD updates, returns how many were applied."""
+        model = self.model
+        steps = self.planning_steps if steps is None else steps
+        for step in range(steps):
+            while self.queue:
+                neg_priority, slot = heapq.heappop(self.queue)
+                if self.priority.get(slot) == -neg_priority:
+                    break
+            else:
+                return step
+            del self.priority[slot]
+
+            obs_idx = int(model.obs_idx[slot])
+            q_values[obs_idx, model.actions[slot]] += self.lr * self._td_errors(q_values, np.array([slot]))[0]
+
+            # only the targets of pairs leading to obs_idx changed
+            predecessors = model.predecessors.get(obs_idx)
+            if predecessors:
+                predecessors = np.fromiter(predecessors, dtype=np.int64, count=len(predecessors))
+                self._push(predecessors, self._td_errors(q_values, predecessors))
+        return steps
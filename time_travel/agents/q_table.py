@@ -0,0 +1,102 @@
+import sys
+
+import numpy as np
+
+
+class HashedQTable:
+    """A Q-table that only stores rows for observations it has been written to.
+
+    Indexing mirrors a dense (num_obs, num_actions) array: table[obs_idx] and
+    table[obs_idx, action] accept integers or integer arrays, reads of rows that were never
+    written return zeros without allocating them, and writes allocate rows on first touch.
+    """
+
+    def __init__(self, num_obs: int, num_actions: int, dtype=np.float64, initial_capacity: int = 1024):
+        self.shape = (num_obs, num_actions)
+        self.dtype = np.dtype(dtype)
+        # row 0 stays zero and stands in for every row that was never written
+        self.values = np.zeros((max(initial_capacity, 2), num_actions), dtype=self.dtype)
+        self.num_rows = 1
+        self.rows = {}
+
+    @property
+    def nbytes(self):
+        """Bytes held by the row storage and the index, not counting unused capacity."""
+        index_bytes = sys.getsizeof(self.rows) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.rows.items())
+        return self.num_rows * self.values.itemsize * self.shape[1] + index_bytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _allocate(self, obs_idx: int):
+        if self.num_rows == len(self.values):
+            grown = np.zeros((2 * len(self.values), self.shape[1]), dtype=self.dtype)
+            grown[:self.num_rows] = self.values[:self.num_rows]
+            self.values = grown
+        row = self.rows[obs_idx] = self.num_rows
+        self.num_rows += 1
+        return row
+
+    def _lookup(self, obs_idx, allocate: bool):
+        if np.ndim(obs_idx) == 0:
+            row = self.rows.get(int(obs_idx), 0)
+            return self._allocate(int(obs_idx)) if allocate and row == 0 else row
+
+        obs_idx = np.asarray(obs_idx)
+        unique, inverse = np.unique(obs_idx, return_inverse=True)
+        if allocate:
+            rows = [self.rows.get(i) or self._allocate(i) for i in unique.tolist()]
+        else:
+            rows = [self.rows.get(i, 0) for i in unique.tolist()]
+        return np.array(rows, dtype=np.int64)[inverse].reshape(obs_idx.shape)
+
+    def _split_key(self, key):
+        if isinstance(key, tuple):
+            return key[0], key[1:]
+        return key, ()
+
+    def __getitem__(self, key):
+        obs_idx, rest = self._split_key(key)
+        return self.values[(self._lookup(obs_idx, allocate=False), *rest)]
+
+    def __setitem__(self, key, value):
+        obs_idx, rest = self._split_key(key)
+        self.values[(self._lookup(obs_idx, allocate=True), *rest)] = value
+
+    def add_at(self, key, values):
+        """np.add.at for this table, repeated indices accumulate."""
+        obs_idx, rest = self._split_key(key)
+        np.add.at(self.values, (self._lookup(obs_idx, allocate=True), *rest), values)
+
+    def copy(self):
+        table = HashedQTable(self.shape[0], self.shape[1], dtype=self.dtype, initial_capacity=self.num_rows)
+        table.values[:self.num_rows] = self.values[:self.num_rows]
+        table.num_rows = self.num_rows
+        table.rows = dict(self.rows)
+        return table
+
+    def to_dense(self):
+        dense = np.zeros(self.shape, dtype=self.dtype)
+        for obs_idx, row in self.rows.items():
+            dense[obs_idx] = self.values[row]
+        return dense
+
+
+def make_q_table(num_obs: int, num_actions: int, sparse: bool = False, dtype=np.float64):
+    if sparse:
+        return HashedQTable(num_obs, num_actions, dtype=dtype)
+    return np.zeros((num_obs, num_actions), dtype=dtype)
+
+
+def copy_q_table(q_values: np.ndarray | HashedQTable):
+    """An independent in-memory copy, also of memory-mapped tables."""
+    if isinstance(q_values, HashedQTable):
+        return q_values.copy()
+    return np.array(q_values)
+
+
+def add_at(q_values: np.ndarray | HashedQTable, key, values):
+    if isinstance(q_values, HashedQTable):
+        q_values.add_at(key, values)
+    else:
+        np.add.at(q_values, key, values)
@@ -0,0 +1,43 @@
+import abc
+
+import numpy as np
+
+from time_travel.agents.backups import apply_targets, one_step_targets
+from time_travel.agents.exploration import ExplorationPolicy
+from time_travel.checkpoint import load_q_values, save_q_values
+
+
+class TabularAgent(abc.ABC):
+    """What MazeAgent and DoorAgent share: a Q-table indexed by obs_to_idx(), its exploration
+    policy and the batched acting and updating on observation indices.
+    """
+
+    q_values: np.ndarray
+    lr: float
+    exploration: ExplorationPolicy
+
+    @abc.abstractmethod
+    def obs_to_idx(self, obs):
+        """The Q-table row of an observation, None for the truncated episode end."""
+
+    def save(self, path: str):
+        save_q_values(path, self.q_values)
+
+    def load(self, path: str, mmap_mode: str | None = "c"):
+        """Replaces the Q-table with one saved by save(), memory-mapped copy-on-write by default."""
+        self.q_values = load_q_values(path, mmap_mode=mmap_mode, num_obs=self.q_values.shape[0])
+
+    def act_batch(self, obs_idx: np.ndarray, epsilon: float = 0, deterministic: bool = True):
+        obs_qs = self.q_values[obs_idx]
+
+        if deterministic:
+            return np.argmax(obs_qs, axis=-1)
+        return self.exploration.sample_batch(obs_qs, epsilon)
+
+    def update_batch(self, obs_idx: np.ndarray, actions: np.ndarray, rewards: np.ndarray, next_obs_idx: np.ndarray):
+        """Applies the TD updates of a batch of transitions at once, see apply_targets().
+
+        Targets use the Q-values from before the batch.
+        """
+        targets = one_step_targets(self.q_values, rewards, next_obs_idx)
+        apply_targets(self.q_values, obs_idx, actions, targets, self.lr)
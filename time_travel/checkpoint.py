@@ -0,0 +1,149 @@
+import copy
+import json
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+
+from time_travel.agents.q_table import HashedQTable, copy_q_table
+
+STATE_FILE = "state.json"
+
+
+def get_rng_state():
+    """States of the random module and the legacy np.random generator, as JSON compatible lists."""
+    version, internal_state, gauss_next = random.getstate()
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        "python_random": [version, list(internal_state), gauss_next],
+        "numpy_random": [name, keys.tolist(), pos, has_gauss, cached_gaussian],
+    }
+
+
+def set_rng_state(rng_state: dict):
+    version, internal_state, gauss_next = rng_state["python_random"]
+    random.setstate((version, tuple(internal_state), gauss_next))
+    name, keys, pos, has_gauss, cached_gaussian = rng_state["numpy_random"]
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+
+
+def _write_atomic(path: str, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_q_values(path: str, q_values: np.ndarray | HashedQTable):
+    """Saves a Q-table as .npy. A HashedQTable is saved as its written rows, with their
+    observation indices in a second file next to it.
+    """
+    if isinstance(q_values, HashedQTable):
+        obs_idx = np.full(q_values.num_rows, -1, dtype=np.int64)
+        obs_idx[list(q_values.rows.values())] = list(q_values.rows.keys())
+        _write_atomic(_rows_path(path), lambda f: np.save(f, obs_idx))
+        q_values = q_values.values[:q_values.num_rows]
+    _write_atomic(path, lambda f: np.save(f, q_values))
+
+
+def load_q_values(path: str, mmap_mode: str | None = "c", num_obs: int | None = None):
+    """Loads a Q-table saved by save_q_values.
+
+    Dense tables are memory-mapped, so loading is lazy and pages are read as they are touched.
+    With the default copy-on-write mode the table can be trained further without changing the
+    file. Sparse tables need num_obs, the number of observations of the full table.
+    """
+    values = np.load(path, mmap_mode=mmap_mode)
+    if not os.path.exists(_rows_path(path)):
+        return values
+
+    if num_obs is None:
+        raise ValueError(f"{path} holds a sparse Q-table, pass num_obs to load it")
+    obs_idx = np.load(_rows_path(path))
+    q_values = HashedQTable(num_obs, values.shape[1], dtype=values.dtype, initial_capacity=len(values))
+    q_values.values[:len(values)] = values
+    q_values.num_rows = len(values)
+    q_values.rows = {int(i): row for row, i in enumerate(obs_idx.tolist()) if i >= 0}
+    return q_values
+
+
+def _rows_path(path: str):
+    return path[:-len(".npy")] + ".rows.npy"
+
+
+def save_checkpoint(directory: str, q_values: np.ndarray | HashedQTable, state: dict):
+    """Writes the Q-table and a JSON state (episode index, RNG states, ...) to directory.
+
+    The Q-table goes to a new file named after state["episode_idx"] and state.json, which names
+    it, is replaced last, so a crash mid-write leaves the previous checkpoint intact.
+    """
+    os.makedirs(directory, exist_ok=True)
+    q_file = f"q_values_{state['episode_idx']}.npy"
+    save_q_values(os.path.join(directory, q_file), q_values)
+
+    state = dict(state, q_values=q_file)
+    state_path = os.path.join(directory, STATE_FILE)
+    _write_atomic(state_path, lambda f: f.write(json.dumps(state).encode()))
+
+    for name in os.listdir(directory):
+        if name.startswith("q_values_") and not name.startswith(q_file[:-len(".npy")] + "."):
+            os.remove(os.path.join(directory, name))
+
+
+def load_checkpoint(directory: str, mmap_mode: str | None = "c", num_obs: int | None = None):
+    """Returns (q_values, state) of the last checkpoint written to directory."""
+    with open(os.path.join(directory, STATE_FILE)) as f:
+        state = json.load(f)
+    q_values = load_q_values(os.path.join(directory, state["q_values"]), mmap_mode=mmap_mode, num_obs=num_obs)
+    return q_values, state
+
+
+def has_checkpoint(directory: str):
+    return os.path.exists(os.path.join(directory, STATE_FILE))
+
+
+class CheckpointWriter:
+    """Writes checkpoints from a background thread.
+
+    save() snapshots the Q-table, the state and the RNG states in the calling thread and returns
+    while the snapshot is written. It only blocks when the previous snapshot is still being written.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.queue = queue.Queue(maxsize=1)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                save_checkpoint(self.directory, *item)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def save(self, q_values: np.ndarray | HashedQTable, state: dict):
+        self._raise_error()
+        # deep copies, the caller keeps changing its lists and dicts while the thread writes
+        self.queue.put((copy_q_table(q_values), copy.deepcopy(dict(state, **get_rng_state()))))
+
+    def close(self):
+        """Waits for pending writes and stops the thread."""
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
@@ -0,0 +1,186 @@
+import numpy as np
+
+from time_travel.agents.q_table import HashedQTable, copy_q_table
+from time_travel.metrics import MetricsSink
+
+# what a training script does once the run has converged
+STOP = "stop"        # stop training right away
+ANNEAL = "anneal"    # decay epsilon linearly to 0 over a fixed number of episodes, then stop
+ON_CONVERGE = (STOP, ANNEAL)
+
+# events ConvergenceMonitor.step() returns, also the kinds of their metrics records
+CONVERGED = "converged"
+STOPPED = "stopped"
+
+
+def _rows(q_values: np.ndarray | HashedQTable, obs_idx: np.ndarray | None):
+    return q_values[obs_idx] if obs_idx is not None else np.asarray(q_values)
+
+
+def compare_q_tables(old: np.ndarray | HashedQTable, new: np.ndarray | HashedQTable):
+    """The largest absolute Q-value change between two tables of the same shape, and the fraction
+    of observations with changed Q-values whose greedy action changed (policy churn).
+    """
+    # a sparse table only needs the rows either table has written
+    obs_idx = None
+    if isinstance(new, HashedQTable):
+        obs_idx = np.fromiter(set(new.rows) | set(old.rows), dtype=np.int64)
+    old_rows, new_rows = _rows(old, obs_idx), _rows(new, obs_idx)
+
+    row_change = np.max(np.abs(new_rows - old_rows), axis=1, initial=0.0)
+    changed = row_change > 0
+    num_changed = int(np.count_nonzero(changed))
+    if num_changed == 0:
+        return 0.0, 0.0
+    churned = np.argmax(old_rows[changed], axis=1) != np.argmax(new_rows[changed], axis=1)
+    return float(np.max(row_change)), float(np.count_nonzero(churned) / num_changed)
+
+
+class ConvergenceMonitor:
+    """Decides when a tabular training run has converged.
+
+    Every window episodes, update() compares the Q-table with its copy from the previous window,
+    see compare_q_tables(). add_eval() tracks eval rewards, which are done once the latest one
+    reached eval_target or the best one has not improved by more than eval_tol for eval_patience episodes.
+    The run has converged once the Q-value change and churn stayed within q_tol and churn_tol for
+    patience consecutive windows and the eval rewards are done. A criterion set to None is not
+    checked. Eval plateaus can be long, so the target is the safer criterion when the optimal
+    return is known.
+
+    Training scripts call step() after every episode and take their exploration rate from
+    epsilon(), which run the on_converge state machine: stop right away, or anneal epsilon to 0
+    over anneal_episodes and then stop. get_state() and set_state() carry the monitor across a
+    resume, except for the Q-table snapshot, which the first window after it takes again.
+    """
+
+    def __init__(self, window: int = 1000, q_tol: float | None = None, churn_tol: float | None = 0.01,
+                 eval_patience: int | None = None, eval_tol: float = 0.0, eval_target: float | None = None,
+                 patience: int = 3, on_converge: str = STOP, anneal_episodes: int = 0):
+        if q_tol is None and churn_tol is None and eval_patience is None and eval_target is None:
+            raise ValueError("At least one convergence criterion has to be enabled")
+        if on_converge not in ON_CONVERGE:
+            raise ValueError(f"Unknown on_converge {on_converge}, expected one of {ON_CONVERGE}")
+
+        self.window = window
+        self.q_tol = q_tol
+        self.churn_tol = churn_tol
+        self.eval_patience = eval_patience
+        self.eval_tol = eval_tol
+        self.eval_target = eval_target
+        self.patience = patience
+        self.on_converge = on_converge
+        self.anneal_episodes = anneal_episodes
+
+        self.q_snapshot = None
+        self.windows_met = 0
+        self.best_eval = -np.inf
+        self.best_eval_episode_idx = None
+        self.last_eval = -np.inf
+        self.last_eval_episode_idx = None
+
+        self.converged_episode_idx = None
+        self.reason = None
+        # epsilon of the episode the run converged in, where the anneal starts
+        self.anneal_epsilon = None
+
+    @property
+    def converged(self):
+        return self.converged_episode_idx is not None
+
+    def add_eval(self, episode_idx: int, mean_reward: float):
+        if self.best_eval_episode_idx is None or mean_reward > self.best_eval + self.eval_tol:
+            self.best_eval_episode_idx = episode_idx
+        self.best_eval = max(self.best_eval, mean_reward)
+        self.last_eval, self.last_eval_episode_idx = mean_reward, episode_idx
+
+    def _eval_reached_target(self):
+        return self.eval_target is not None and self.last_eval >= self.eval_target
+
+    def _eval_plateaued(self):
+        return (self.eval_patience is not None and self.best_eval_episode_idx is not None and
+                self.last_eval_episode_idx - self.best_eval_episode_idx >= self.eval_patience)
+
+    def update(self, episode_idx: int, q_values: np.ndarray | HashedQTable):
+        """Call after every episode. Returns the stats of a window that just ended, else None."""
+        if (episode_idx + 1) % self.window != 0:
+            return None
+        if self.q_snapshot is None:
+            # the first window after a start or resume only takes the snapshot
+            self.q_snapshot = copy_q_table(q_values)
+            return None
+
+        q_change, churn = compare_q_tables(self.q_snapshot, q_values)
+        self.q_snapshot = copy_q_table(q_values)
+        stats = {"q_change": q_change, "policy_churn": churn, "last_eval": float(self.last_eval),
+                 "best_eval": float(self.best_eval)}
+
+        within = ((self.q_tol is None or q_change <= self.q_tol) and
+                  (self.churn_tol is None or churn <= self.churn_tol))
+        self.windows_met = self.windows_met + 1 if within else 0
+        evals_done = (self.eval_target is None and self.eval_patience is None or
+                      self._eval_reached_target() or self._eval_plateaued())
+
+        if not self.converged and self.windows_met >= self.patience and evals_done:
+            reasons = []
+            if self.q_tol is not None:
+                reasons.append(f"max Q change <= {self.q_tol}")
+            if self.churn_tol is not None:
+                reasons.append(f"policy churn <= {self.churn_tol}")
+            reasons = [f"{' and '.join(reasons)} for {self.patience} windows of {self.window} episodes"] if reasons else []
+            if self._eval_reached_target():
+                reasons.append(f"eval {self.last_eval:.2f} reached the target {self.eval_target}")
+            elif self._eval_plateaued():
+                reasons.append(f"best eval {self.best_eval:.2f} not improved by more than {self.eval_tol} "
+                               f"for {self.eval_patience} episodes")
+            self.converged_episode_idx = episode_idx
+            self.reason = ", ".join(reasons)
+        return stats
+
+    def epsilon(self, episode_idx: int, epsilon: float):
+        """The exploration rate of an episode, epsilon from the run's schedule until the anneal
+        replaces the rest of it by a linear decay to 0.
+        """
+        if self.anneal_epsilon is None:
+            return epsilon
+        return self.anneal_epsilon * max(0.0, 1 - (episode_idx - self.converged_episode_idx) / self.anneal_episodes)
+
+    def step(self, episode_idx: int, q_values: np.ndarray | HashedQTable, epsilon: float,
+             metrics: MetricsSink | None = None):
+        """update() plus the on_converge handling, call after every episode with its epsilon.
+
+        Logs the window stats and the converged and stopped events to metrics and returns the
+        events of this episode, training stops once STOPPED is among them.
+        """
+        events = []
+        converged = self.converged
+        stats = self.update(episode_idx, q_values)
+        if stats is not None and metrics is not None:
+            metrics.log("convergence", episode_idx, **stats)
+        if self.converged and not converged:
+            events.append(CONVERGED)
+            if metrics is not None:
+                metrics.log(CONVERGED, episode_idx, reason=self.reason, on_converge=self.on_converge)
+            if self.on_converge == ANNEAL:
+                self.anneal_epsilon = epsilon
+
+        if self.converged and (self.on_converge != ANNEAL or
+                               episode_idx - self.converged_episode_idx >= self.anneal_episodes):
+            events.append(STOPPED)
+            if metrics is not None:
+                metrics.log(STOPPED, episode_idx, converged_episode_idx=self.converged_episode_idx, reason=self.reason)
+        return events
+
+    def get_state(self):
+        """A JSON compatible snapshot of the convergence checks that set_state() restores."""
+        return {"windows_met": self.windows_met,
+                "best_eval": float(self.best_eval), "best_eval_episode_idx": self.best_eval_episode_idx,
+                "last_eval": float(self.last_eval), "last_eval_episode_idx": self.last_eval_episode_idx,
+                "converged_episode_idx": self.converged_episode_idx, "reason": self.reason,
+                "anneal_epsilon": self.anneal_epsilon}
+
+    def set_state(self, state: dict):
+        self.windows_met = state["windows_met"]
+        self.best_eval, self.best_eval_episode_idx = state["best_eval"], state["best_eval_episode_idx"]
+        self.last_eval, self.last_eval_episode_idx = state["last_eval"], state["last_eval_episode_idx"]
+        self.converged_episode_idx, self.reason = state["converged_episode_idx"], state["reason"]
+        self.anneal_epsilon = state["anneal_epsilon"]
@@ -0,0 +1,4 @@
+# names of the envs, for scripts and sweeps choosing between them
+MAZE = "maze"
+DOOR = "door"
+ENVS = (MAZE, DOOR)
@@ -0,0 +1,216 @@
+import numpy as np
+
+from gymnasium import spaces
+
+from time_travel.envs.maze import *
+
+# placeholder for a missing time travel action (None in MazeEnv)
+NO_ACTION = -1
+
+# cell offsets in the order MazeEnv._get_obs reads them: center, left, right, down, up
+NEIGHBOR_OFFSETS = np.array([(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)])
+
+# (dx, dy) per Action value, (0, 0) for actions that do not move or place walls
+ACTION_DELTAS = np.array([
+    (-1, 0), (1, 0), (0, 1), (0, -1),
+    (-1, 0), (1, 0), (0, 1), (0, -1),
+    (0, 0), (0, 0),
+])
+
+GOAL_POS = np.array([GRID_SIZE-1, GRID_SIZE-1])
+NORMAL_START_POS = np.array([0, 0])
+TIME_TRAVEL_START_POS = np.array([GRID_SIZE-1, GRID_SIZE-1])
+
+# strides matching Observation.to_idx and ObservationWithTrapPos.to_idx
+CELL_STRIDES = np.array([len(CellState) ** (4-i) * len(AgentType) for i in range(5)])
+Y_STRIDE = len(CellState) ** 5 * len(AgentType)
+X_STRIDE = GRID_SIZE * Y_STRIDE
+TRAP_STRIDE = GRID_SIZE * X_STRIDE
+
+
+def check_default_size(name: str, grid_size: int, visibility: int):
+    """The integer-coded envs and the maze model hard-code the default layout above, MazeEnv runs the rest."""
+    if (grid_size, visibility) != (GRID_SIZE, VISIBILITY):
+        raise ValueError(f"{name} only supports grid_size {GRID_SIZE} with visibility {VISIBILITY}, "
+                         f"use MazeEnv for grid_size {grid_size} with visibility {visibility}")
+
+
+def make_initial_grid():
+    """Builds the padded (GRID_SIZE+2, GRID_SIZE+2) grid from MazeEnv.reset without the trap.
+    Cell (x, y) lives at [x+1, y+1].
+    """
+    grid = np.full((GRID_SIZE + 2, GRID_SIZE + 2), CellState.WALL.value, dtype=np.uint8)
+    grid[1:-1, 1:-1] = CellState.EMPTY.value
+    grid[2:5, 2:5] = CellState.WALL.value
+    grid[GRID_SIZE, GRID_SIZE] = CellState.GOAL.value
+    return grid
+
+
+class BatchedMazeEnv:
+    """Steps N copies of MazeEnv at once with NumPy arrays.
+
+    Actions are an (N, 2) integer array of (normal, time travel) Action values, with NO_ACTION
+    standing in for None. Observations are (N, 2) arrays of observation indices as returned by
+    Observation.to_idx, with (None, None) observations mapped to truncated_obs_idx. Slots that
+    terminate or truncate are reset automatically; their last observation is in info["final_obs"].
+    Only the default grid_size and visibility are supported.
+    """
+
+    def __init__(self, num_envs: int, trap_position_observed: bool = True, seed: int | None = None,
+                 grid_size: int = GRID_SIZE, visibility: int = VISIBILITY):
+        check_default_size("BatchedMazeEnv", grid_size, visibility)
+        self.num_envs = num_envs
+        self.trap_position_observed = trap_position_observed
+        self.rng = np.random.default_rng(seed)
+
+        # single env spaces so tabular agents can be built from this env directly
+        self.action_space = spaces.Discrete(len(Action))
+        if self.trap_position_observed:
+            self.observation_space = spaces.MultiDiscrete([len(ObservedTrapPosition)] + [GRID_SIZE, GRID_SIZE] + [len(CellState) for _ in range(5)] + [len(AgentType)])
+        else:
+            self.observation_space = spaces.MultiDiscrete([GRID_SIZE, GRID_SIZE] + [len(CellState) for _ in range(5)] + [len(AgentType)])
+        self.truncated_obs_idx = int(np.prod(self.observation_space.nvec))
+
+        self._rows = np.arange(num_envs)
+        self._initial_grid = make_initial_grid()
+
+        self.grid = np.empty((num_envs, GRID_SIZE + 2, GRID_SIZE + 2), dtype=np.uint8)
+        self.trap_is_below = np.zeros(num_envs, dtype=bool)
+        self.normal_agent_pos = np.zeros((num_envs, 2), dtype=np.int64)
+        self.time_travel_agent_pos = np.zeros((num_envs, 2), dtype=np.int64)
+        self.t = np.zeros(num_envs, dtype=np.int64)
+        self.is_original_timeline = np.ones(num_envs, dtype=bool)
+        self.has_seen_trap = np.zeros((num_envs, len(AgentType)), dtype=bool)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_slots(np.ones(self.num_envs, dtype=bool), is_original_timeline=True)
+        return self._get_obs()
+
+    def _reset_slots(self, mask: np.ndarray, is_original_timeline: bool):
+        if is_original_timeline:
+            n = int(mask.sum())
+            trap_is_below = self.rng.integers(0, 2, size=n) == 0
+            grids = np.broadcast_to(self._initial_grid, (n, *self._initial_grid.shape)).copy()
+            grids[trap_is_below, GRID_SIZE - 1, GRID_SIZE] = CellState.TRAP.value
+            grids[~trap_is_below, GRID_SIZE, GRID_SIZE - 1] = CellState.TRAP.value
+            self.grid[mask] = grids
+            self.trap_is_below[mask] = trap_is_below
+
+        self.t[mask] = 0
+        self.is_original_timeline[mask] = is_original_timeline
+        self.normal_agent_pos[mask] = NORMAL_START_POS
+        self.time_travel_agent_pos[mask] = TIME_TRAVEL_START_POS
+        self.has_seen_trap[mask] = False
+
+    def _cells_at(self, pos: np.ndarray):
+        return self.grid[self._rows, pos[:, 0] + 1, pos[:, 1] + 1]
+
+    def _move(self, pos: np.ndarray, action: np.ndarray, mask: np.ndarray):
+        proposed = pos + ACTION_DELTAS[action]
+        can_move = mask & (action <= Action.DOWN.value) & (self._cells_at(proposed) != CellState.WALL.value)
+        pos[can_move] = proposed[can_move]
+
+    def _place_wall(self, pos: np.ndarray, action: np.ndarray, mask: np.ndarray):
+        target = pos + ACTION_DELTAS[action]
+        is_wall_action = (action >= Action.LEFT_WALL.value) & (action <= Action.DOWN_WALL.value)
+        place = mask & is_wall_action & (self._cells_at(target) == CellState.EMPTY.value)
+        self.grid[self._rows[place], target[place, 0] + 1, target[place, 1] + 1] = CellState.WALL.value
+
+    def step(self, joint_action: np.ndarray):
+        joint_action = np.asarray(joint_action)
+        normal_action = joint_action[:, 0]
+        time_travel_action = joint_action[:, 1]
+        # None and DO_NOTHING behave the same apart from the validity check
+        time_travel_move = np.where(time_travel_action == NO_ACTION, Action.DO_NOTHING.value, time_travel_action)
+
+        reward = np.zeros(self.num_envs)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        info = {"t": self.t.copy()}
+
+        at_goal = np.all(self.normal_agent_pos == GOAL_POS, axis=1)
+        normal_valid = (normal_action == Action.DO_NOTHING.value) | np.where(
+            at_goal,
+            self.is_original_timeline & (normal_action == Action.TIME_TRAVEL.value),
+            normal_action <= Action.DOWN_WALL.value,
+        )
+        time_travel_valid = time_travel_action != Action.TIME_TRAVEL.value
+        reward[~(normal_valid & time_travel_valid)] += BAD_ACTION_R
+        info["invalid_action"] = ~(normal_valid & time_travel_valid)
+
+        self.t += 1
+        reward += TIME_R
+
+        truncated = self.t >= MAX_EPISODE_LEN
+        # slots that returned (None, None) in MazeEnv
+        no_obs = truncated.copy()
+        active = ~truncated
+
+        # normal agent move and place wall
+        self._move(self.normal_agent_pos, normal_action, active)
+        self._place_wall(self.normal_agent_pos, normal_action, active)
+
+        at_goal = active & np.all(self.normal_agent_pos == GOAL_POS, axis=1)
+        goal_second_timeline = at_goal & ~self.is_original_timeline
+        time_travel = at_goal & self.is_original_timeline & (normal_action == Action.TIME_TRAVEL.value)
+        goal_original_timeline = at_goal & self.is_original_timeline & ~time_travel
+
+        reward[goal_second_timeline] += GOAL_R
+        reward[time_travel] += -1 * TIME_R * self.t[time_travel] - GOAL_R
+        reward[goal_original_timeline] = 0
+        terminated |= goal_second_timeline | goal_original_timeline
+        active &= ~at_goal
+
+        # time travel agent move, closeness check and place wall
+        second_timeline = active & ~self.is_original_timeline
+        self._move(self.time_travel_agent_pos, time_travel_move, second_timeline)
+
+        distance = np.abs(self.normal_agent_pos - self.time_travel_agent_pos).sum(axis=1)
+        close = second_timeline & (distance <= 1)
+        reward[close] += AGENTS_CLOSE_R
+        terminated |= close
+        no_obs |= close
+        active &= ~close
+        second_timeline &= ~close
+
+        self._place_wall(self.time_travel_agent_pos, time_travel_move, second_timeline)
+
+        cell = self._cells_at(self.normal_agent_pos)
+        reward[active & (cell == CellState.GOAL.value)] += GOAL_R
+        trapped = active & (cell == CellState.TRAP.value)
+        reward[trapped] += TRAP_R
+        terminated |= trapped
+
+        # time travel keeps the grid and restarts the clock in the second timeline
+        self._reset_slots(time_travel, is_original_timeline=False)
+
+        obs = self._get_obs()
+        obs[no_obs] = self.truncated_obs_idx
+
+        info["time_traveled"] = time_travel
+        info["reached_goal"] = goal_second_timeline | goal_original_timeline
+        info["final_obs"] = obs.copy()
+        info["final_is_original_timeline"] = self.is_original_timeline.copy()
+
+        done = terminated | truncated
+        if done.any():
+            self._reset_slots(done, is_original_timeline=True)
+            obs[done] = self._get_obs()[done]
+
+        return obs, reward, terminated, truncated, info
+
+    def _get_obs(self):
+        obs = np.empty((self.num_envs, len(AgentType)), dtype=np.int64)
+        trap_obs = np.where(self.trap_is_below, ObservedTrapPosition.LOWER_PATH.value, ObservedTrapPosition.UPPER_PATH.value)
+        for agent_type, pos in zip([AgentType.NORMAL, AgentType.TIME_TRAVELING],
+                                   [self.normal_agent_pos, self.time_travel_agent_pos]):
+            cell_pos = pos[:, None, :] + NEIGHBOR_OFFSETS[None, :, :] + 1
+            cells = self.grid[self._rows[:, None], cell_pos[..., 0], cell_pos[..., 1]].astype(np.int64)
+            self.has_seen_trap[:, agent_type.value] |= np.any(cells[:, 1:] == CellState.TRAP.value, axis=1)
+
+            idx = pos[:, 0] * X_STRIDE + pos[:, 1] * Y_STRIDE + cells @ CELL_STRIDES + agent_type.value
+            if self.trap_position_observed:
+                idx += np.where(self.has_seen_trap[:, agent_type.value], trap_obs, ObservedTrapPosition.NOT_OBSERVED.value) * TRAP_STRIDE
+            obs[:, agent_type.value] = idx
+        return obs
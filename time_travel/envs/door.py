@@ -6,6 +6,8 @@ import random
 import gymnasium as gym
 from gymnasium import spaces
 
+from time_travel.envs.rendering import RENDER_MODES, render_tiles, symbol_codes, tile_atlas
+
 R = 199
 BAD_ACTION_R = int(-200)
 
@@ -27,6 +29,20 @@ class DoorState(Enum):
     OPEN_GOOD = 2
     OPEN_BAD = 3
 
+# (reward door, t, is original timeline, DoorState value per door), see DoorEnv.get_state
+DoorEnvState = tuple[int, int, bool, int, int]
+
+_DOOR_STATES = tuple(DoorState)
+
+_DOOR_SYMBOLS = {DoorState.LOCKED: "L", DoorState.CLOSED: "C", DoorState.OPEN_GOOD: "G", DoorState.OPEN_BAD: "B"}
+
+# (background, disk) per symbol of the rgb_array frames, o and x are the original and second timeline
+_TILE_COLORS = {"L": ((60, 60, 60), None), "C": ((150, 110, 60), None), "G": ((90, 190, 90), None),
+                "B": ((200, 70, 70), None), "o": ((230, 230, 230), (50, 90, 210)),
+                "x": ((230, 230, 230), (230, 150, 40))}
+_TILE_SPECS = tuple(_TILE_COLORS.values())
+_TILE_CODES = symbol_codes("".join(_TILE_COLORS))
+
 @dataclass
 class Door:
     reward: int
@@ -44,9 +60,14 @@ class Observation:
 class DoorEnv(gym.Env):
     """A class for the door environment. (2 doors)
     """
+
+    metadata = {"render_modes": RENDER_MODES, "render_fps": 2}
     
-    def __init__(self):
+    def __init__(self, render_mode=None):
         super().__init__()
+        if render_mode is not None and render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode {render_mode}, expected one of {RENDER_MODES}")
+        self.render_mode = render_mode
         self.action_space = spaces.Discrete(len(Action))
         self.observation_space = spaces.MultiDiscrete([len(DoorState), len(DoorState), len(AgentType)], dtype=int)
 
@@ -63,6 +84,19 @@ class DoorEnv(gym.Env):
         self.is_original_timeline = is_original_timeline
         return self._get_obs()
 
+    def get_state(self) -> DoorEnvState:
+        """Returns a hashable snapshot of the env that set_state() restores.
+        The random module state is not part of it.
+        """
+        return (self.reward_door, self.t, self.is_original_timeline, self.doors[0].state.value, self.doors[1].state.value)
+
+    def set_state(self, state: DoorEnvState):
+        self.reward_door, self.t, self.is_original_timeline, door0, door1 = state
+        self.doors = [
+            Door(reward=R * (1 - self.reward_door), state=_DOOR_STATES[door0]),
+            Door(reward=R * self.reward_door, state=_DOOR_STATES[door1]),
+        ]
+
     def step(self, joint_action: tuple[Action, Action]):
         normal_action, time_travel_action = joint_action
 
@@ -70,13 +104,14 @@ class DoorEnv(gym.Env):
         reward = 0
         terminated = False
         truncated = False
-        info = {"t": self.t}
+        info = {"t": self.t, "invalid_action": False}
 
         if (not self._check_valid_action(normal_action, AgentType.NORMAL) or
             not self._check_valid_action(time_travel_action, AgentType.TIME_TRAVELING)):
             # print("Invalid action")
             truncated = True
             reward = BAD_ACTION_R
+            info["invalid_action"] = True
             return obs, reward, terminated, truncated, info
         
         self.t += 1
@@ -142,16 +177,18 @@ class DoorEnv(gym.Env):
         return action in valid_actions
     
     def render(self):
-        print("-" * 30)
-        print(f"t = {self.t}")
-        print(f"In original timeline: {self.is_original_timeline}")
-
-        door0 = self.doors[0].state.name
-        door1 = self.doors[1].state.name
-        print(f"State: door0: {door0}, door1: {door1}")
+        """Prints the frame for render_mode None or "human", returns it as a string for "ansi".
+        For "rgb_array" the frame is one row of tiles: door0, door1 and the timeline.
+        """
+        if self.render_mode == "rgb_array":
+            timeline = "o" if self.is_original_timeline else "x"
+            symbols = _DOOR_SYMBOLS[self.doors[0].state] + _DOOR_SYMBOLS[self.doors[1].state] + timeline
+            return render_tiles([symbols], _TILE_CODES, tile_atlas(_TILE_SPECS))
 
         obs = self._get_obs()
-        print(f"Normal obs: {obs[0]}")
-        print(f"Time travel obs: {obs[1]}")
-
-        print("#" * 20)
\ No newline at end of file
+        frame = "\n".join(["-" * 30, f"t = {self.t}", f"In original timeline: {self.is_original_timeline}",
+                           f"State: door0: {self.doors[0].state.name}, door1: {self.doors[1].state.name}",
+                           f"Normal obs: {obs[0]}", f"Time travel obs: {obs[1]}", "#" * 20]) + "\n"
+        if self.render_mode == "ansi":
+            return frame
+        print(frame, end="")
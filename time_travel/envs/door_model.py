@@ -0,0 +1,204 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from time_travel.envs.door import *
+from time_travel.agents.door_agent import DoorAgent
+
+NUM_JOINT_ACTIONS = len(Action) * len(Action)
+
+
+@dataclass
+class DoorModel:
+    """Explicit tabular model of DoorEnv, laid out like MazeModel.
+
+    Joint actions are indexed as normal_action * len(Action) + time_travel_action. In the original
+    timeline the time travel action is None, so all time travel actions share the same outcome.
+    DoorEnv is deterministic after reset, so every (state, joint action) has one successor, -1
+    where the step ends the episode. obs_idx holds the DoorAgent observation index of each agent.
+    """
+    states: list[DoorEnvState]
+    observations: list[tuple[Observation, Observation | None]]
+    next_state: np.ndarray
+    reward: np.ndarray
+    time_travels: np.ndarray
+    invalid_action: np.ndarray
+    obs_idx: np.ndarray
+    is_original_timeline: np.ndarray
+    initial_states: np.ndarray
+    initial_probs: np.ndarray
+
+    @property
+    def num_states(self):
+        return len(self.states)
+
+
+@dataclass
+class DoorOutcome:
+    """One trajectory of a deterministic policy and its probability."""
+    probability: float
+    joint_actions: list[tuple[Action, Action | None]]
+    total_reward: float
+    time_traveled: bool
+    invalid_action: bool
+
+
+def compile_door_model():
+    """Enumerates the DoorEnv states reachable from reset() and tabulates their transitions."""
+    env = DoorEnv()
+    agent = DoorAgent(env)
+
+    initial_states = []
+    for reward_door in range(2):
+        env.reset()
+        env.set_state((reward_door, *env.get_state()[1:]))
+        initial_states.append(env.get_state())
+
+    state_ids = {state: i for i, state in enumerate(initial_states)}
+    states = list(initial_states)
+    rows = []
+
+    i = 0
+    while i < len(states):
+        state = states[i]
+        row = np.empty((NUM_JOINT_ACTIONS, 4))
+        original_timeline = state[2]
+        time_travel_actions = [None] if original_timeline else list(Action)
+
+        for normal_action in Action:
+            for time_travel_action in time_travel_actions:
+                env.set_state(state)
+                _, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
+                time_traveled = original_timeline and not env.is_original_timeline
+
+                next_state_id = -1
+                if not (terminated or truncated):
+                    next_state = env.get_state()
+                    if next_state not in state_ids:
+                        state_ids[next_state] = len(states)
+                        states.append(next_state)
+                    next_state_id = state_ids[next_state]
+
+                cols = slice(normal_action.value * len(Action), (normal_action.value + 1) * len(Action)) \
+                    if time_travel_action is None else normal_action.value * len(Action) + time_travel_action.value
+                row[cols] = (next_state_id, reward, time_traveled, info["invalid_action"])
+        rows.append(row)
+        i += 1
+
+    table = np.stack(rows)
+    observations = []
+    obs_idx = np.empty((len(states), len(AgentType)), dtype=np.int64)
+    for i, state in enumerate(states):
+        env.set_state(state)
+        obs = env._get_obs()
+        observations.append(obs)
+        obs_idx[i] = [agent.obs_to_idx(o) for o in obs]
+
+    return DoorModel(
+        states=states,
+        observations=observations,
+        next_state=table[..., 0].astype(np.int64),
+        reward=table[..., 1],
+        time_travels=table[..., 2].astype(bool),
+        invalid_action=table[..., 3].astype(bool),
+        obs_idx=obs_idx,
+        is_original_timeline=np.array([state[2] for state in states]),
+        initial_states=np.arange(len(initial_states)),
+        initial_probs=np.full(len(initial_states), 1 / len(initial_states)),
+    )
+
+
+def _sweep(model: DoorModel, joint_actions: np.ndarray | None = None):
+    """State values by repeated backups until they stop changing.
+
+    Every step either advances the clock or starts the second timeline, which never time
+    travels again, so the transition graph is acyclic and this takes one pass per step of the
+    longest episode.
+    """
+    if joint_actions is None:
+        rows, cols = slice(None), slice(None)
+    else:
+        rows, cols = np.arange(model.num_states), joint_actions
+    next_state = model.next_state[rows, cols]
+    reward = model.reward[rows, cols]
+    ends = next_state < 0
+    next_state = np.where(ends, 0, next_state)
+
+    values = np.zeros(model.num_states)
+    for _ in range(model.num_states):
+        q = reward + np.where(ends, 0, values[next_state])
+        new_values = q.max(axis=1) if joint_actions is None else q
+        if np.array_equal(new_values, values):
+            break
+        values = new_values
+    return values
+
+
+def value_iteration(model: DoorModel):
+    """Optimal values per state when a single controller picks the joint action with full
+    knowledge of the state, an upper bound for any observation-based policy.
+    """
+    return _sweep(model)
+
+
+def optimal_joint_actions(model: DoorModel):
+    """A joint action index per state that attains value_iteration."""
+    values = value_iteration(model)
+    q = model.reward + np.where(model.next_state < 0, 0, values[np.maximum(model.next_state, 0)])
+    return np.argmax(q, axis=1)
+
+
+def evaluate_policy(model: DoorModel, joint_actions: np.ndarray):
+    """Values per state of a policy given as a joint action index per state."""
+    return _sweep(model, joint_actions)
+
+
+def q_values_to_joint_actions(model: DoorModel, q_values: np.ndarray):
+    """Joint actions of the greedy policy of a DoorAgent Q-table, as played by the evaluator."""
+    greedy_actions = np.argmax(q_values[model.obs_idx], axis=2)
+    return greedy_actions[:, 0] * len(Action) + np.where(model.is_original_timeline, 0, greedy_actions[:, 1])
+
+
+def policy_to_joint_actions(model: DoorModel, policy):
+    """Joint actions of an act(obs) callable returning an Action.
+
+    DoorAgent.act indexes observations with its own env's clock, so use q_values_to_joint_actions
+    for DoorAgents.
+    """
+    joint_actions = np.empty(model.num_states, dtype=np.int64)
+    for i, (normal_obs, time_travel_obs) in enumerate(model.observations):
+        time_travel_action = 0 if time_travel_obs is None else policy(time_travel_obs).value
+        joint_actions[i] = policy(normal_obs).value * len(Action) + time_travel_action
+    return joint_actions
+
+
+def expected_return(model: DoorModel, values: np.ndarray):
+    return float(model.initial_probs @ values[model.initial_states])
+
+
+def optimal_return(model: DoorModel):
+    return expected_return(model, value_iteration(model))
+
+
+def evaluate_q_values(model: DoorModel, q_values: np.ndarray):
+    """Exact expected eval reward of the greedy policy of a DoorAgent Q-table."""
+    return expected_return(model, evaluate_policy(model, q_values_to_joint_actions(model, q_values)))
+
+
+def policy_outcomes(model: DoorModel, joint_actions: np.ndarray):
+    """Every trajectory the policy plays from reset(), one per initial state."""
+    outcomes = []
+    for state, probability in zip(model.initial_states, model.initial_probs):
+        played = []
+        total_reward = 0.0
+        time_traveled = invalid_action = False
+        while state >= 0:
+            a = joint_actions[state]
+            time_travel_action = None if model.is_original_timeline[state] else Action(a % len(Action))
+            played.append((Action(a // len(Action)), time_travel_action))
+            total_reward += float(model.reward[state, a])
+            time_traveled |= model.time_travels[state, a]
+            invalid_action |= model.invalid_action[state, a]
+            state = model.next_state[state, a]
+        outcomes.append(DoorOutcome(float(probability), played, total_reward, bool(time_traveled), bool(invalid_action)))
+    return outcomes
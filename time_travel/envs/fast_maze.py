@@ -0,0 +1,215 @@
+import random
+
+import numpy as np
+
+from time_travel.envs.maze import *
+from time_travel.envs.batched_maze import CELL_STRIDES, NO_ACTION, TRAP_STRIDE, X_STRIDE, Y_STRIDE, check_default_size
+
+# width of the padded grid, cell (x, y) lives at flat index (x+1) * PADDED_SIZE + (y+1)
+PADDED_SIZE = GRID_SIZE + 2
+
+# flat offsets of the cells MazeEnv._get_obs reads: center, left, right, down, up
+CENTER, LEFT, RIGHT, DOWN, UP = 0, -PADDED_SIZE, PADDED_SIZE, -1, 1
+
+# flat offset per Action value, 0 for actions that do not move or place walls
+ACTION_OFFSETS = (LEFT, RIGHT, UP, DOWN, LEFT, RIGHT, UP, DOWN, 0, 0)
+
+S_CENTER, S_LEFT, S_RIGHT, S_DOWN, S_UP = (int(s) for s in CELL_STRIDES)
+
+_GOAL, _TRAP, _WALL, _EMPTY = (c.value for c in CellState)
+_DOWN, _DOWN_WALL, _TIME_TRAVEL, _DO_NOTHING = (Action.DOWN.value, Action.DOWN_WALL.value,
+                                                Action.TIME_TRAVEL.value, Action.DO_NOTHING.value)
+
+
+def to_flat(x: int, y: int):
+    return (x + 1) * PADDED_SIZE + (y + 1)
+
+
+def from_flat(cell: int):
+    return cell // PADDED_SIZE - 1, cell % PADDED_SIZE - 1
+
+
+GOAL_CELL = to_flat(GRID_SIZE-1, GRID_SIZE-1)
+NORMAL_START_CELL = to_flat(0, 0)
+TIME_TRAVEL_START_CELL = to_flat(GRID_SIZE-1, GRID_SIZE-1)
+TRAP_BELOW_CELL = to_flat(GRID_SIZE-2, GRID_SIZE-1)
+TRAP_ABOVE_CELL = to_flat(GRID_SIZE-1, GRID_SIZE-2)
+
+# position part of the observation index for every flat cell
+_POSITION_IDX = [0] * (PADDED_SIZE * PADDED_SIZE)
+for _x in range(GRID_SIZE):
+    for _y in range(GRID_SIZE):
+        _POSITION_IDX[to_flat(_x, _y)] = _x * X_STRIDE + _y * Y_STRIDE
+
+
+def _make_initial_grid():
+    grid = bytearray([_WALL]) * (PADDED_SIZE * PADDED_SIZE)
+    for x in range(GRID_SIZE):
+        for y in range(GRID_SIZE):
+            if not (1 <= x <= 3 and 1 <= y <= 3):
+                grid[to_flat(x, y)] = _EMPTY
+    grid[GOAL_CELL] = _GOAL
+    return bytes(grid)
+
+
+_INITIAL_GRID = _make_initial_grid()
+
+
+class FastMazeEnv(MazeEnv):
+    """Integer-coded MazeEnv backed by a flat padded uint8 grid.
+
+    Takes joint actions as plain Action values (None or NO_ACTION for a missing time travel action)
+    and returns observations as a tuple of observation indices, identical to Observation.to_idx,
+    with (None, None) observations mapped to truncated_obs_idx. Uses the same random draws as
+    MazeEnv, so both envs follow the same trajectories under the same seed. Only the default
+    grid_size and visibility are supported.
+    """
+
+    def __init__(self, trap_position_observed=True, grid_size=GRID_SIZE, visibility=VISIBILITY, render_mode=None):
+        check_default_size("FastMazeEnv", grid_size, visibility)
+        super().__init__(trap_position_observed, grid_size=grid_size, visibility=visibility, render_mode=render_mode)
+        self.truncated_obs_idx = int(np.prod(self.observation_space.nvec))
+        self._truncated_obs = (self.truncated_obs_idx, self.truncated_obs_idx)
+
+    @property
+    def normal_agent_pos(self):
+        return from_flat(self.normal_cell)
+
+    @property
+    def time_travel_agent_pos(self):
+        return from_flat(self.time_travel_cell)
+
+    def reset(self, is_original_timeline=True, seed=None, options=None):
+        self.t = 0
+
+        if is_original_timeline:
+            self.grid = bytearray(_INITIAL_GRID)
+            self.trap_is_below = random.randint(0, 1) == 0
+            self.grid[TRAP_BELOW_CELL if self.trap_is_below else TRAP_ABOVE_CELL] = _TRAP
+            trap_obs = ObservedTrapPosition.LOWER_PATH if self.trap_is_below else ObservedTrapPosition.UPPER_PATH
+            self._trap_obs_idx = trap_obs.value * TRAP_STRIDE if self.trap_position_observed else 0
+
+        self.is_original_timeline = is_original_timeline
+        self.normal_cell = NORMAL_START_CELL
+        self.time_travel_cell = TIME_TRAVEL_START_CELL
+
+        # indexed by AgentType value
+        self.has_seen_trap = [False, False]
+
+        return self._get_obs()
+
+    def get_state(self) -> MazeEnvState:
+        # the flat grid already is in packed grid order, so states are interchangeable with MazeEnv
+        return (bytes(self.grid), from_flat(self.normal_cell), from_flat(self.time_travel_cell), self.t,
+                self.is_original_timeline, self.trap_is_below, tuple(self.has_seen_trap))
+
+    def set_state(self, state: MazeEnvState):
+        grid, normal_pos, time_travel_pos, self.t, self.is_original_timeline, self.trap_is_below, has_seen_trap = state
+        self.grid = bytearray(grid)
+        self.normal_cell = to_flat(*normal_pos)
+        self.time_travel_cell = to_flat(*time_travel_pos)
+        self.has_seen_trap = list(has_seen_trap)
+        trap_obs = ObservedTrapPosition.LOWER_PATH if self.trap_is_below else ObservedTrapPosition.UPPER_PATH
+        self._trap_obs_idx = trap_obs.value * TRAP_STRIDE if self.trap_position_observed else 0
+
+    def step(self, joint_action: tuple[int, int | None]):
+        normal_action, time_travel_action = joint_action
+        if time_travel_action is None:
+            time_travel_action = NO_ACTION
+
+        grid = self.grid
+        reward = 0
+        info = {"t": self.t, "invalid_action": False}
+
+        if self.normal_cell == GOAL_CELL:
+            normal_valid = (normal_action == _DO_NOTHING or
+                            normal_action == _TIME_TRAVEL and self.is_original_timeline)
+        else:
+            normal_valid = normal_action <= _DOWN_WALL or normal_action == _DO_NOTHING
+        if not normal_valid or time_travel_action == _TIME_TRAVEL:
+            reward += BAD_ACTION_R
+            info["invalid_action"] = True
+
+        self.t += 1
+        reward += TIME_R
+
+        if self.t >= MAX_EPISODE_LEN:
+            return self._truncated_obs, reward, False, True, info
+
+        # normal agent move or place wall
+        if normal_action <= _DOWN:
+            proposed = self.normal_cell + ACTION_OFFSETS[normal_action]
+            if grid[proposed] != _WALL:
+                self.normal_cell = proposed
+        elif normal_action <= _DOWN_WALL:
+            proposed = self.normal_cell + ACTION_OFFSETS[normal_action]
+            if grid[proposed] == _EMPTY:
+                grid[proposed] = _WALL
+
+        if self.normal_cell == GOAL_CELL:
+            if not self.is_original_timeline:
+                return self._get_obs(), reward + GOAL_R, True, False, info
+            elif normal_action == _TIME_TRAVEL:
+                reward += -1 * TIME_R * self.t  # undo time rewards
+                reward -= GOAL_R  # undo goal reward
+                return self.reset(is_original_timeline=False), reward, False, False, info
+            else:
+                return self._get_obs(), 0, True, False, info
+
+        if not self.is_original_timeline:
+            # time travel agent move
+            if 0 <= time_travel_action <= _DOWN:
+                proposed = self.time_travel_cell + ACTION_OFFSETS[time_travel_action]
+                if grid[proposed] != _WALL:
+                    self.time_travel_cell = proposed
+
+            # check closeness
+            distance = self.normal_cell - self.time_travel_cell
+            if distance in (0, LEFT, RIGHT, DOWN, UP):
+                return self._truncated_obs, reward + AGENTS_CLOSE_R, True, False, info
+
+            # time travel agent place wall
+            if _DOWN < time_travel_action <= _DOWN_WALL:
+                proposed = self.time_travel_cell + ACTION_OFFSETS[time_travel_action]
+                if grid[proposed] == _EMPTY:
+                    grid[proposed] = _WALL
+
+        cell = grid[self.normal_cell]
+        if cell == _GOAL:
+            reward += GOAL_R
+        elif cell == _TRAP:
+            return self._get_obs(), reward + TRAP_R, True, False, info
+
+        return self._get_obs(), reward, False, False, info
+
+    def _get_obs(self):
+        return (self._get_agent_obs(self.normal_cell, AgentType.NORMAL.value),
+                self._get_agent_obs(self.time_travel_cell, AgentType.TIME_TRAVELING.value))
+
+    def _get_agent_obs(self, cell: int, agent_type: int):
+        grid = self.grid
+        left, right, down, up = grid[cell + LEFT], grid[cell + RIGHT], grid[cell + DOWN], grid[cell + UP]
+        if _TRAP in (left, right, down, up):
+            self.has_seen_trap[agent_type] = True
+
+        idx = (_POSITION_IDX[cell] + grid[cell] * S_CENTER + left * S_LEFT + right * S_RIGHT +
+               down * S_DOWN + up * S_UP + agent_type)
+        if self.has_seen_trap[agent_type]:
+            idx += self._trap_obs_idx
+        return idx
+
+    def _symbol_rows(self):
+        symbols = {_EMPTY: ".", _WALL: "#", _GOAL: "G", _TRAP: "T"}
+        rows = []
+        for y in reversed(range(GRID_SIZE)):
+            row = []
+            for x in range(GRID_SIZE):
+                cell = to_flat(x, y)
+                display = symbols[self.grid[cell]]
+                if self.normal_cell == cell:
+                    display = "n"
+                elif self.time_travel_cell == cell and not self.is_original_timeline:
+                    display = "t"
+                row.append(display)
+            rows.append("".join(row))
+        return rows
@@ -6,8 +6,11 @@ import random
 import gymnasium as gym
 from gymnasium import spaces
 
+from time_travel.envs.rendering import RENDER_MODES, render_tiles, symbol_codes, tile_atlas
+
 GRID_SIZE = 5
-VISIBILITY = 2
+# manhattan radius of the cells each agent observes around itself
+VISIBILITY = 1
 
 MAX_EPISODE_LEN = 100
 
@@ -44,16 +47,33 @@ class ObservedTrapPosition(Enum):
     LOWER_PATH = 1
     UPPER_PATH = 2
 
+# CellState by value, for decoding packed grids
+_CELL_STATES = tuple(CellState)
+
+_CELL_SYMBOLS = {CellState.EMPTY: ".", CellState.WALL: "#", CellState.GOAL: "G", CellState.TRAP: "T"}
+
+# (background, agent disk) per symbol of the rgb_array frames, n and t are the agents
+_TILE_COLORS = {".": ((230, 230, 230), None), "#": ((60, 60, 60), None), "G": ((90, 190, 90), None),
+                "T": ((200, 70, 70), None), "n": ((230, 230, 230), (50, 90, 210)),
+                "t": ((230, 230, 230), (230, 150, 40))}
+_TILE_SPECS = tuple(_TILE_COLORS.values())
+_TILE_CODES = symbol_codes("".join(_TILE_COLORS))
+
+# (packed grid, normal agent pos, time travel agent pos, t, is original timeline, trap is below,
+#  has seen trap per AgentType value), see MazeEnv.get_state
+MazeEnvState = tuple[bytes, tuple[int, int], tuple[int, int], int, bool, bool, tuple[bool, bool]]
+
 @dataclass
 class Observation:
     position: tuple[int, int]
     cells: list[CellState]
     agent_type: AgentType
 
-    def to_idx(self):
-        return self.position[0] * (GRID_SIZE * len(CellState) ** 5 * len(AgentType)) + \
-               self.position[1] * (len(CellState) ** 5 * len(AgentType)) + \
-               sum([self.cells[i].value * (len(CellState) ** (4-i) * len(AgentType)) for i in range(5)]) + \
+    def to_idx(self, grid_size: int = GRID_SIZE):
+        num_cells = len(self.cells)
+        return self.position[0] * (grid_size * len(CellState) ** num_cells * len(AgentType)) + \
+               self.position[1] * (len(CellState) ** num_cells * len(AgentType)) + \
+               sum([self.cells[i].value * (len(CellState) ** (num_cells-1-i) * len(AgentType)) for i in range(num_cells)]) + \
                self.agent_type.value
     
     def to_array(self):
@@ -63,58 +83,94 @@ class Observation:
 class ObservationWithTrapPos(Observation):
     observed_trap_position: ObservedTrapPosition
 
-    def to_idx(self):
-        return self.observed_trap_position.value * (GRID_SIZE * GRID_SIZE * len(CellState) ** 5 * len(AgentType)) + \
-        super().to_idx()
+    def to_idx(self, grid_size: int = GRID_SIZE):
+        return self.observed_trap_position.value * (grid_size * grid_size * len(CellState) ** len(self.cells) * len(AgentType)) + \
+        super().to_idx(grid_size)
+
+
+def visible_offsets(visibility: int):
+    """(dx, dy) of the cells within manhattan distance visibility, nearest first.
+    For visibility 1 these are center, left, right, down, up.
+    """
+    offsets = [(dx, dy) for dx in range(-visibility, visibility + 1) for dy in range(-visibility, visibility + 1)
+               if abs(dx) + abs(dy) <= visibility]
+    return sorted(offsets, key=lambda d: (abs(d[0]) + abs(d[1]), abs(d[1]), d[1], d[0]))
 
 
 class MazeEnv(gym.Env):
     """A class for the maze environment.
     """
+
+    metadata = {"render_modes": RENDER_MODES, "render_fps": 4}
     
-    def __init__(self, trap_position_observed=True):
+    def __init__(self, trap_position_observed=True, grid_size=GRID_SIZE, visibility=VISIBILITY, render_mode=None):
         super().__init__()
+        if render_mode is not None and render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode {render_mode}, expected one of {RENDER_MODES}")
+        self.render_mode = render_mode
 
         self.trap_position_observed = trap_position_observed
+        self.grid_size = grid_size
+        self.visibility = visibility
+        self.visible_offsets = visible_offsets(visibility)
+        # grid keys including the outer wall in packed grid order, (x, y) at (x+1) * (grid_size+2) + (y+1)
+        self._grid_keys = [(x, y) for x in range(-1, grid_size + 1) for y in range(-1, grid_size + 1)]
 
         self.action_space = spaces.Discrete(len(Action))
         
+        num_cells = len(self.visible_offsets)
         if self.trap_position_observed:
-            self.observation_space = spaces.MultiDiscrete([len(ObservedTrapPosition)] + [GRID_SIZE, GRID_SIZE] + [len(CellState) for _ in range(5)] + [len(AgentType)])
+            self.observation_space = spaces.MultiDiscrete([len(ObservedTrapPosition)] + [grid_size, grid_size] + [len(CellState) for _ in range(num_cells)] + [len(AgentType)])
         else:
-            self.observation_space = spaces.MultiDiscrete([GRID_SIZE, GRID_SIZE] + [len(CellState) for _ in range(5)] + [len(AgentType)])
+            self.observation_space = spaces.MultiDiscrete([grid_size, grid_size] + [len(CellState) for _ in range(num_cells)] + [len(AgentType)])
 
     def reset(self, is_original_timeline=True, seed=None, options=None):
         self.t = 0
 
+        size = self.grid_size
         if is_original_timeline:
-            self.grid = {(i, j): CellState.EMPTY for i in range(GRID_SIZE) for j in range(GRID_SIZE)}
-            for i in range(1, 4):
-                for j in range(1, 4):
+            self.grid = {(i, j): CellState.EMPTY for i in range(size) for j in range(size)}
+            for i in range(1, size - 1):
+                for j in range(1, size - 1):
                     self.grid[(i, j)] = CellState.WALL
 
-            for i in range(-1, GRID_SIZE + 1):
+            for i in range(-1, size + 1):
                 self.grid[(-1, i)] = CellState.WALL
-                self.grid[(GRID_SIZE, i)] = CellState.WALL
+                self.grid[(size, i)] = CellState.WALL
                 self.grid[(i, -1)] = CellState.WALL
-                self.grid[(i, GRID_SIZE)] = CellState.WALL
+                self.grid[(i, size)] = CellState.WALL
 
-            self.grid[(GRID_SIZE-1, GRID_SIZE-1)] = CellState.GOAL
+            self.grid[(size-1, size-1)] = CellState.GOAL
 
             self.trap_is_below = random.randint(0, 1) == 0
             if self.trap_is_below:
-                self.grid[(GRID_SIZE-2, GRID_SIZE-1)] = CellState.TRAP
+                self.grid[(size-2, size-1)] = CellState.TRAP
             else:
-                self.grid[(GRID_SIZE-1, GRID_SIZE-2)] = CellState.TRAP
+                self.grid[(size-1, size-2)] = CellState.TRAP
         
         self.is_original_timeline = is_original_timeline
         self.normal_agent_pos = (0, 0)
-        self.time_travel_agent_pos = (GRID_SIZE-1, GRID_SIZE-1)
+        self.time_travel_agent_pos = (size-1, size-1)
 
         self.has_seen_trap = {AgentType.NORMAL: False, AgentType.TIME_TRAVELING: False}
 
         return self._get_obs()
     
+    def get_state(self) -> MazeEnvState:
+        """Returns a hashable snapshot of the env that set_state() restores.
+        The random module state is not part of it.
+        """
+        # _value_ skips the Enum.value descriptor, which dominates the cost here
+        grid = bytes([self.grid[key]._value_ for key in self._grid_keys])
+        return (grid, self.normal_agent_pos, self.time_travel_agent_pos, self.t, self.is_original_timeline,
+                self.trap_is_below, (self.has_seen_trap[AgentType.NORMAL], self.has_seen_trap[AgentType.TIME_TRAVELING]))
+
+    def set_state(self, state: MazeEnvState):
+        (grid, self.normal_agent_pos, self.time_travel_agent_pos, self.t, self.is_original_timeline,
+         self.trap_is_below, has_seen_trap) = state
+        self.grid = dict(zip(self._grid_keys, [_CELL_STATES[value] for value in grid]))
+        self.has_seen_trap = {AgentType.NORMAL: has_seen_trap[0], AgentType.TIME_TRAVELING: has_seen_trap[1]}
+
     def action_to_dx_dy(self, action: Action):
         match action:
             case Action.LEFT | Action.LEFT_WALL:
@@ -133,7 +189,7 @@ class MazeEnv(gym.Env):
         reward = 0
         terminated = False
         truncated = False
-        info = {"t": self.t}
+        info = {"t": self.t, "invalid_action": False}
 
         if (not self._check_valid_action(normal_action, AgentType.NORMAL) or
             not self._check_valid_action(time_travel_action, AgentType.TIME_TRAVELING)):
@@ -142,6 +198,7 @@ class MazeEnv(gym.Env):
             # print(time_travel_action, self._check_valid_action(time_travel_action, AgentType.TIME_TRAVELING))
             # truncated = True
             reward += BAD_ACTION_R
+            info["invalid_action"] = True
 
         self.t += 1
         reward += TIME_R
@@ -166,7 +223,7 @@ class MazeEnv(gym.Env):
             if self.grid[proposed_wall_pos] == CellState.EMPTY:
                 self.grid[proposed_wall_pos] = CellState.WALL
 
-        if self.normal_agent_pos == (GRID_SIZE-1, GRID_SIZE-1):
+        if self.normal_agent_pos == (self.grid_size-1, self.grid_size-1):
             if not self.is_original_timeline:
                 terminated = True
                 reward += GOAL_R
@@ -220,8 +277,9 @@ class MazeEnv(gym.Env):
                                    [AgentType.NORMAL, AgentType.TIME_TRAVELING]):
             x, y = pos
             cells = [self.grid[(x, y)]]
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                cells.append(self.grid[(x + dx, y + dy)])
+            for dx, dy in self.visible_offsets[1:]:
+                # cells beyond the outer wall only exist when the agent sees further than one cell
+                cells.append(self.grid.get((x + dx, y + dy), CellState.WALL))
                 if cells[-1] == CellState.TRAP:
                     self.has_seen_trap[agent_type] = True
 
@@ -237,7 +295,7 @@ class MazeEnv(gym.Env):
     def _check_valid_action(self, action: Action, agent_type: AgentType):
         if agent_type == AgentType.NORMAL:
             valid_actions = {Action.DO_NOTHING}
-            if self.normal_agent_pos == (GRID_SIZE-1, GRID_SIZE-1):
+            if self.normal_agent_pos == (self.grid_size-1, self.grid_size-1):
                 if self.is_original_timeline:
                     valid_actions |= {Action.TIME_TRAVEL}
             else:
@@ -246,26 +304,32 @@ class MazeEnv(gym.Env):
         elif agent_type == AgentType.TIME_TRAVELING:
             return action != Action.TIME_TRAVEL
     
-    def render(self):
-        print("-" * 30)
-        print(f"t = {self.t}")
-        print(f"In original timeline: {self.is_original_timeline}")
-        
-        for y in reversed(range(GRID_SIZE)):
-            for x in range(GRID_SIZE):
-                display = " "
-                match self.grid[(x, y)]:
-                    case CellState.EMPTY:
-                        display = "."
-                    case CellState.WALL:
-                        display = "#"
-                    case CellState.GOAL:
-                        display = "G"
-                    case CellState.TRAP:
-                        display = "T"
+    def _symbol_rows(self):
+        """One string of cell symbols per row of the grid, top row first."""
+        rows = []
+        for y in reversed(range(self.grid_size)):
+            row = []
+            for x in range(self.grid_size):
+                display = _CELL_SYMBOLS[self.grid[(x, y)]]
                 if self.normal_agent_pos == (x, y):
                     display = "n"
                 elif self.time_travel_agent_pos == (x, y) and not self.is_original_timeline:
                     display = "t"
-                print(display, end=" ")
-            print()
\ No newline at end of file
+                row.append(display)
+            rows.append("".join(row))
+        return rows
+
+    def render(self):
+        """Prints the frame for render_mode None or "human", returns it as a string for "ansi"
+        and as an RGB uint8 array, one tile per cell, for "rgb_array".
+        """
+        rows = self._symbol_rows()
+        if self.render_mode == "rgb_array":
+            return render_tiles(rows, _TILE_CODES, tile_atlas(_TILE_SPECS))
+
+        # built in one piece, a print per cell dominates the cost of rendering every step
+        frame = "\n".join(["-" * 30, f"t = {self.t}", f"In original timeline: {self.is_original_timeline}",
+                           *(" ".join(row) for row in rows)]) + "\n"
+        if self.render_mode == "ansi":
+            return frame
+        print(frame, end="")
@@ -0,0 +1,214 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from time_travel.envs.maze import *
+from time_travel.envs.fast_maze import PADDED_SIZE, TRAP_STRIDE, FastMazeEnv
+
+NUM_JOINT_ACTIONS = len(Action) * len(Action)
+
+# a state is (grid bytes, normal cell, time travel cell, is original timeline, trap is below, has seen trap)
+# t is left out, the solvers below handle it
+MazeState = tuple[bytes, int, int, bool, bool, tuple[bool, bool]]
+
+
+@dataclass
+class MazeModel:
+    """Explicit tabular model of MazeEnv.
+
+    Joint actions are indexed as normal_action * len(Action) + time_travel_action. In the original
+    timeline the time travel action is None, so all time travel actions share the same outcome.
+    MazeEnv is deterministic after reset, so transitions are stored sparsely as one successor per
+    (state, joint action), with -1 where the step ends the episode. A step from state s at clock t
+    earns reward[s, a] + reward_per_t[s, a] * t, or truncation_reward[s, a] on the last step.
+    """
+    states: list[MazeState]
+    next_state: np.ndarray
+    reward: np.ndarray
+    reward_per_t: np.ndarray
+    resets_clock: np.ndarray
+    truncation_reward: np.ndarray
+    obs_idx: np.ndarray
+    is_original_timeline: np.ndarray
+    initial_states: np.ndarray
+    initial_probs: np.ndarray
+
+    @property
+    def num_states(self):
+        return len(self.states)
+
+
+def _get_state(env: FastMazeEnv) -> MazeState:
+    return (_canonical_grid(env), env.normal_cell, env.time_travel_cell, env.is_original_timeline,
+            env.trap_is_below, tuple(env.has_seen_trap))
+
+
+def _set_state(env: FastMazeEnv, state: MazeState):
+    grid, env.normal_cell, env.time_travel_cell, env.is_original_timeline, env.trap_is_below, has_seen_trap = state
+    env.grid = bytearray(grid)
+    env.has_seen_trap = list(has_seen_trap)
+    trap_obs = ObservedTrapPosition.LOWER_PATH if env.trap_is_below else ObservedTrapPosition.UPPER_PATH
+    env._trap_obs_idx = trap_obs.value * TRAP_STRIDE if env.trap_position_observed else 0
+    env.t = 0
+
+
+def _canonical_grid(env: FastMazeEnv):
+    """Turns every cell that neither agent can reach or see into a wall.
+
+    Such cells never affect the dynamics or observations, so merging them keeps the model small.
+    """
+    grid = env.grid
+    reachable = {env.normal_cell, env.time_travel_cell}
+    frontier = list(reachable)
+    while frontier:
+        cell = frontier.pop()
+        for offset in (-PADDED_SIZE, PADDED_SIZE, -1, 1):
+            neighbor = cell + offset
+            if neighbor not in reachable and grid[neighbor] != CellState.WALL.value:
+                reachable.add(neighbor)
+                frontier.append(neighbor)
+
+    visible = reachable | {cell + offset for cell in reachable for offset in (-PADDED_SIZE, PADDED_SIZE, -1, 1)}
+    canonical = bytearray([CellState.WALL.value]) * len(grid)
+    for cell in visible:
+        canonical[cell] = grid[cell]
+    return bytes(canonical)
+
+
+def compile_maze_model(trap_position_observed: bool = True, grid_size: int = GRID_SIZE, visibility: int = VISIBILITY):
+    """Enumerates the MazeEnv states reachable from reset() and tabulates their transitions.
+    Runs on FastMazeEnv, so only the default grid_size and visibility are supported.
+    """
+    env = FastMazeEnv(trap_position_observed=trap_position_observed, grid_size=grid_size, visibility=visibility)
+
+    initial_states = []
+    for trap_is_below in [True, False]:
+        env.reset()
+        while env.trap_is_below != trap_is_below:
+            env.reset()
+        initial_states.append(_get_state(env))
+
+    state_ids = {state: i for i, state in enumerate(initial_states)}
+    states = list(initial_states)
+    rows = []
+
+    # states are appended as they are found, so this loop is a breadth first search
+    i = 0
+    while i < len(states):
+        state = states[i]
+        row = np.empty((NUM_JOINT_ACTIONS, 5))
+        original_timeline = state[3]
+        time_travel_actions = [None] if original_timeline else range(len(Action))
+
+        for normal_action in range(len(Action)):
+            for time_travel_action in time_travel_actions:
+                _set_state(env, state)
+                valid = (env._check_valid_action(Action(normal_action), AgentType.NORMAL) and
+                         time_travel_action != Action.TIME_TRAVEL.value)
+                truncation_reward = TIME_R + (0 if valid else BAD_ACTION_R)
+
+                _, reward, terminated, truncated, _ = env.step((normal_action, time_travel_action))
+                time_traveled = original_timeline and not env.is_original_timeline
+
+                next_state_id = -1
+                if not (terminated or truncated):
+                    next_state = _get_state(env)
+                    if next_state not in state_ids:
+                        state_ids[next_state] = len(states)
+                        states.append(next_state)
+                    next_state_id = state_ids[next_state]
+
+                cols = slice(normal_action * len(Action), (normal_action + 1) * len(Action)) \
+                    if time_travel_action is None else normal_action * len(Action) + time_travel_action
+                # time travel undoes the time rewards of every step so far, so its reward grows with t
+                row[cols] = (next_state_id, reward, -TIME_R * time_traveled,
+                             time_traveled, truncation_reward)
+        rows.append(row)
+        i += 1
+
+    table = np.stack(rows)
+    obs_idx = np.empty((len(states), len(AgentType)), dtype=np.int64)
+    for i, state in enumerate(states):
+        _set_state(env, state)
+        obs_idx[i] = env._get_obs()
+
+    return MazeModel(
+        states=states,
+        next_state=table[..., 0].astype(np.int64),
+        reward=table[..., 1],
+        reward_per_t=table[..., 2],
+        resets_clock=table[..., 3].astype(bool),
+        truncation_reward=table[..., 4],
+        obs_idx=obs_idx,
+        is_original_timeline=np.array([state[3] for state in states]),
+        initial_states=np.arange(len(initial_states)),
+        initial_probs=np.full(len(initial_states), 1 / len(initial_states)),
+    )
+
+
+def _backward_sweep(model: MazeModel, joint_actions: np.ndarray | None = None):
+    """Computes state values for every clock value t from the last step back to the first.
+
+    Takes the best joint action in every state, or the given joint action per state. Time travel
+    restarts the clock in the second timeline, which never time travels again, so a second sweep
+    sees the final t = 0 values of every state a time travel can lead to.
+    """
+    if joint_actions is None:
+        rows, cols = slice(None), slice(None)
+    else:
+        rows, cols = np.arange(model.num_states), joint_actions
+    next_state = model.next_state[rows, cols]
+    reward = model.reward[rows, cols]
+    truncation_reward = model.truncation_reward[rows, cols]
+    ends = next_state < 0
+    next_state = np.where(ends, 0, next_state)
+
+    # time travel steps are rare, so they are patched in after the gather for the common case
+    resets = np.nonzero(model.resets_clock[rows, cols])
+    reset_next_state = next_state[resets]
+    reset_reward_per_t = model.reward_per_t[rows, cols][resets]
+
+    select = (lambda q: q.max(axis=1)) if joint_actions is None else (lambda q: q)
+    values = np.zeros((MAX_EPISODE_LEN + 1, model.num_states))
+    for _ in range(2 if len(reset_next_state) else 1):
+        for t in reversed(range(MAX_EPISODE_LEN)):
+            if t + 1 >= MAX_EPISODE_LEN:
+                q = truncation_reward
+            else:
+                q = values[t + 1][next_state]
+                q[resets] = values[0][reset_next_state] + reset_reward_per_t * t
+                q[ends] = 0
+                q += reward
+            values[t] = select(q)
+    return values[:MAX_EPISODE_LEN]
+
+
+def value_iteration(model: MazeModel):
+    """Optimal values of shape (MAX_EPISODE_LEN, S) when a single controller picks the joint action
+    with full knowledge of the state, an upper bound for any observation-based policy.
+    """
+    return _backward_sweep(model)
+
+
+def evaluate_policy(model: MazeModel, joint_actions: np.ndarray):
+    """Values of shape (MAX_EPISODE_LEN, S) of a policy given as a joint action index per state."""
+    return _backward_sweep(model, joint_actions)
+
+
+def q_values_to_joint_actions(model: MazeModel, q_values: np.ndarray):
+    """Joint actions of the greedy policy of a MazeAgent Q-table, as played by eval() in run_maze.py."""
+    greedy_actions = np.argmax(q_values[model.obs_idx], axis=2)
+    return greedy_actions[:, 0] * len(Action) + np.where(model.is_original_timeline, 0, greedy_actions[:, 1])
+
+
+def expected_return(model: MazeModel, values: np.ndarray):
+    return float(model.initial_probs @ values[0, model.initial_states])
+
+
+def optimal_return(model: MazeModel):
+    return expected_return(model, value_iteration(model))
+
+
+def evaluate_q_values(model: MazeModel, q_values: np.ndarray):
+    """Exact expected eval reward of the greedy policy of a MazeAgent Q-table."""
+    return expected_return(model, evaluate_policy(model, q_values_to_joint_actions(model, q_values)))
@@ -0,0 +1,122 @@
+import random
+
+import gymnasium as gym
+import numpy as np
+
+from time_travel.envs.maze import *
+
+
+class PredictPolicy:
+    """Replay policy built from anything with an SB3 style predict(obs, deterministic=True), e.g. model.policy.
+
+    Pass the policy rather than the model: the model holds its envs and cannot be pickled into workers.
+    Every call is a forward pass, distill_policy() turns the policy into a table lookup instead.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+
+    def __call__(self, obs: np.ndarray):
+        action, _ = self.policy.predict(obs, deterministic=True)
+        return int(action)
+
+
+class TablePolicy:
+    """Replay policy that looks the action up in a table with one entry per observation, see distill_policy().
+
+    Observation arrays are indexed in row-major order of nvec, like np.ravel_multi_index.
+    """
+
+    def __init__(self, actions: np.ndarray, nvec: np.ndarray):
+        self.actions = actions
+        self.strides = np.cumprod(np.concatenate([np.asarray(nvec, dtype=np.int64)[1:], [1]])[::-1])[::-1]
+
+    def __call__(self, obs: np.ndarray):
+        return int(self.actions[obs @ self.strides])
+
+
+def distill_policy(policy, nvec: np.ndarray, batch_size: int = 8192):
+    """Evaluates policy.predict(obs, deterministic=True) on every observation of a MultiDiscrete space with
+    these nvec, in batches, and returns the greedy actions as a TablePolicy.
+
+    Recurrent policies are queried with their initial state, which is what PredictPolicy does
+    on every call, so the table replays exactly what PredictPolicy would.
+    """
+    nvec = np.asarray(nvec, dtype=np.int64)
+    num_obs = int(np.prod(nvec))
+    actions = np.empty(num_obs, dtype=np.int8)
+    for start in range(0, num_obs, batch_size):
+        obs = np.stack(np.unravel_index(np.arange(start, min(start + batch_size, num_obs)), nvec), axis=1)
+        batch_actions, _ = policy.predict(obs, deterministic=True)
+        actions[start:start + len(obs)] = batch_actions
+    return TablePolicy(actions, nvec)
+
+
+class MazeWrapper(gym.Wrapper):
+    """Single agent view of MazeEnv for SB3, controlling whichever agent is active.
+
+    Observations are int64 arrays laid out like env.observation_space. In the second timeline
+    the normal agent repeats its actions from the original timeline while it sees what it saw
+    then, and otherwise acts with replay_policy, a picklable callable from an observation array
+    to an Action value (DO_NOTHING when it is None). The wrapper holds no reference to the
+    model being trained, so it can run inside SubprocVecEnv; update the policy in the workers
+    with vec_env.env_method("set_replay_policy", policy).
+    """
+
+    def __init__(self, env: MazeEnv, replay_policy=None, render_steps: bool = False):
+        super().__init__(env)
+        self.replay_policy = replay_policy
+        self.render_steps = render_steps
+        # (normal obs, normal action) per t of the original timeline
+        self.rollout = []
+
+        # what the original script returned for (None, None), walls all around at (0, 0)
+        nvec = env.observation_space.nvec
+        self.truncated_obs = np.zeros(len(nvec), dtype=np.int64)
+        cells_start = 3 if env.trap_position_observed else 2
+        self.truncated_obs[cells_start:-1] = CellState.WALL.value
+
+    def set_replay_policy(self, replay_policy):
+        self.replay_policy = replay_policy
+
+    def obs_to_array(self, obs):
+        if obs is None:
+            return self.truncated_obs
+        array = obs.to_array()
+        if self.env.trap_position_observed:
+            array.insert(0, obs.observed_trap_position.value)
+        return np.array(array, dtype=np.int64)
+
+    def reset(self, seed=None, options=None):
+        # MazeEnv draws the trap position from the random module
+        if seed is not None:
+            random.seed(seed)
+        self.rollout = []
+        obs = self.env.reset(is_original_timeline=True)
+        self.normal_obs = self.obs_to_array(obs[0])
+        return self.normal_obs, {}
+
+    def step(self, action):
+        action = Action(int(action))
+        if self.render_steps:
+            self.env.render()
+            print(action)
+
+        if self.env.is_original_timeline:
+            normal_action = action
+            time_travel_action = None
+            self.rollout.append((self.normal_obs, normal_action))
+        else:
+            t = self.env.t
+            if t < len(self.rollout) and np.array_equal(self.normal_obs, self.rollout[t][0]):
+                normal_action = self.rollout[t][1]
+            elif self.replay_policy is not None:
+                normal_action = Action(self.replay_policy(self.normal_obs))
+            else:
+                normal_action = Action.DO_NOTHING
+            time_travel_action = action
+
+        obs, reward, terminated, truncated, info = self.env.step((normal_action, time_travel_action))
+        self.normal_obs = self.obs_to_array(obs[0])
+        active_obs = self.normal_obs if self.env.is_original_timeline else self.obs_to_array(obs[1])
+        return active_obs, float(reward), terminated, truncated, info
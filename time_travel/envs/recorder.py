@@ -0,0 +1,88 @@
+import os
+
+import gymnasium as gym
+import numpy as np
+
+TXT = "txt"
+NPZ = "npz"
+GIF = "gif"
+FORMATS = {"ansi": (TXT,), "rgb_array": (NPZ, GIF)}
+
+
+class EpisodeRecorder(gym.Wrapper):
+    """Keeps the rendered frames of an episode in memory and writes them in one go when it ends.
+
+    The env has to be created with render_mode "ansi", recorded as a text log with the action and
+    reward under every frame, or "rgb_array", recorded as an .npz of the (T, H, W, 3) frames or,
+    with fmt GIF, as a GIF (needs Pillow). Episode i goes to out_dir/episode_<i>.<fmt>, only every
+    record_every-th episode is rendered at all. Other attributes are read from the env, so the
+    tabular rollouts, which read env.t and env.is_original_timeline, can drive the recorder too.
+    """
+
+    def __init__(self, env: gym.Env, out_dir: str, fmt: str | None = None, record_every: int = 1):
+        super().__init__(env)
+        if env.render_mode not in FORMATS:
+            raise ValueError(f"Recording needs render mode {' or '.join(FORMATS)}, the env renders {env.render_mode}")
+        fmt = fmt or FORMATS[env.render_mode][0]
+        if fmt not in FORMATS[env.render_mode]:
+            raise ValueError(f"Render mode {env.render_mode} records to {FORMATS[env.render_mode]}, not {fmt}")
+
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.record_every = record_every
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.episode_idx = -1
+        self.frames = []
+        self.paths = []
+
+    def __getattr__(self, name):
+        # only called for attributes the wrapper itself lacks, private ones stay private
+        if name.startswith("_") or "env" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.env, name)
+
+    @property
+    def recording(self):
+        return self.episode_idx % self.record_every == 0
+
+    def reset(self, **kwargs):
+        # an episode cut short by a reset is still written
+        self._write()
+        result = self.env.reset(**kwargs)
+        self.episode_idx += 1
+        if self.recording:
+            self.frames.append(self.env.render())
+        return result
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        if self.recording:
+            frame = self.env.render()
+            if self.fmt == TXT:
+                self.frames[-1] += f"action: {action}, reward: {reward}\n"
+            self.frames.append(frame)
+        if terminated or truncated:
+            self._write()
+        return obs, reward, terminated, truncated, info
+
+    def close(self):
+        self._write()
+        super().close()
+
+    def _write(self):
+        if not self.frames:
+            return
+        path = os.path.join(self.out_dir, f"episode_{self.episode_idx:06d}.{self.fmt}")
+        if self.fmt == TXT:
+            with open(path, "w") as f:
+                f.write("".join(self.frames))
+        elif self.fmt == NPZ:
+            np.savez_compressed(path, frames=np.stack(self.frames))
+        else:
+            from PIL import Image
+            images = [Image.fromarray(frame) for frame in self.frames]
+            duration = 1000 // self.metadata.get("render_fps", 4)
+            images[0].save(path, save_all=True, append_images=images[1:], duration=duration, loop=0)
+        self.paths.append(path)
+        self.frames = []
@@ -0,0 +1,42 @@
+import functools
+
+import numpy as np
+
+TILE_SIZE = 16
+RENDER_MODES = ["human", "ansi", "rgb_array"]
+
+# (background color, color of a disk in the middle or None) per tile
+TileSpec = tuple[tuple[int, int, int], tuple[int, int, int] | None]
+
+
+@functools.lru_cache(maxsize=None)
+def tile_atlas(tiles: tuple[TileSpec, ...], tile_size: int = TILE_SIZE):
+    """(len(tiles), tile_size, tile_size, 3) uint8 array of the tiles, built once per spec."""
+    center = (tile_size - 1) / 2
+    yy, xx = np.mgrid[:tile_size, :tile_size]
+    disk = (yy - center) ** 2 + (xx - center) ** 2 <= (0.35 * tile_size) ** 2
+
+    atlas = np.empty((len(tiles), tile_size, tile_size, 3), dtype=np.uint8)
+    for tile, (background, foreground) in zip(atlas, tiles):
+        tile[:] = background
+        if foreground is not None:
+            tile[disk] = foreground
+        # a darker outline keeps neighbouring tiles of the same color apart
+        tile[[0, -1], :] = tile[:, [0, -1]] = np.array(background) * 3 // 4
+    atlas.flags.writeable = False
+    return atlas
+
+
+def symbol_codes(symbols: str):
+    """256 entry lookup table from the ASCII code of a tile symbol to its index in symbols."""
+    codes = np.zeros(256, dtype=np.intp)
+    codes[np.frombuffer(symbols.encode(), dtype=np.uint8)] = np.arange(len(symbols))
+    return codes
+
+
+def render_tiles(rows: list[str], codes: np.ndarray, atlas: np.ndarray):
+    """RGB frame of a grid of tile symbols, one string per row from the top."""
+    grid = codes[np.frombuffer("".join(rows).encode(), dtype=np.uint8)].reshape(len(rows), -1)
+    height, width = grid.shape
+    tile_size = atlas.shape[1]
+    return atlas[grid].transpose(0, 2, 1, 3, 4).reshape(height * tile_size, width * tile_size, 3)
@@ -0,0 +1,255 @@
+import json
+import os
+import re
+
+import numpy as np
+
+MANIFEST = "log.json"
+INDEX = "index"
+
+# fixed width columns, one .npy file per column and segment so every column can be memory-mapped
+COLUMNS = {
+    "obs_idx": np.int64,
+    "action": np.int8,
+    "reward": np.float64,
+    "next_obs_idx": np.int64,
+    "t": np.int16,
+    "is_original_timeline": bool,
+    "episode": np.int64,
+}
+
+_SEGMENT_FILE = re.compile(rf"({'|'.join([*COLUMNS, INDEX])})_(\d+)\.npy")
+
+
+def _segment_path(path: str, name: str, segment: int):
+    return os.path.join(path, f"{name}_{segment:05d}.npy")
+
+
+def _read_manifest(path: str):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def _segment_ids(manifest: dict):
+    # the files of a segment are numbered by its id, logs without ids number them by position
+    return [segment.get("id", i) for i, segment in enumerate(manifest["segments"])]
+
+
+class EpisodeLogWriter:
+    """Appends episodes to a directory of column segments, see EpisodeLog for reading them back.
+
+    Transitions are buffered in preallocated columns and written as a new segment once the next
+    episode would not fit into chunk_size transitions. Next to the columns each segment has an
+    index of (episode id, start, length) rows, start counting over the whole log. log.json lists
+    the segments and is replaced after each segment has been written, so a crash loses at most
+    the buffered episodes and never leaves a half written segment in the log. Segment files are
+    never rewritten, truncate() writes a shortened segment under a new id.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 1 << 18, append: bool = False):
+        self.path = path
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+
+        if append and os.path.exists(os.path.join(path, MANIFEST)):
+            self.manifest = _read_manifest(path)
+        else:
+            self.manifest = {"columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+                             "segments": [], "num_transitions": 0, "num_episodes": 0}
+            self._write_manifest()
+        self._remove_stale_segments()
+
+        self.buffer = {name: np.empty(chunk_size, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+        # (episode id, start, length) of the buffered episodes
+        self.episodes = []
+
+    def add_episode(self, episode: int, obs_idx, actions, rewards, next_obs_idx, is_original_timeline, t):
+        length = len(obs_idx)
+        if length > self.chunk_size:
+            raise ValueError(f"Episode of length {length} does not fit in segments of {self.chunk_size} transitions")
+        if self.size + length > self.chunk_size:
+            self.flush()
+
+        end = self.size + length
+        for name, values in [("obs_idx", obs_idx), ("action", actions), ("reward", rewards),
+                             ("next_obs_idx", next_obs_idx), ("t", t),
+                             ("is_original_timeline", is_original_timeline), ("episode", episode)]:
+            self.buffer[name][self.size:end] = values
+        self.episodes.append((episode, self.manifest["num_transitions"] + self.size, length))
+        self.size = end
+
+    def flush(self):
+        """Writes the buffered episodes as a new segment."""
+        if self.size == 0:
+            return
+        segment = self._next_segment_id()
+        for name, column in self.buffer.items():
+            np.save(_segment_path(self.path, name, segment), column[:self.size])
+        np.save(_segment_path(self.path, INDEX, segment), np.array(self.episodes, dtype=np.int64))
+
+        self.manifest["segments"].append({"id": segment, "num_transitions": self.size,
+                                          "num_episodes": len(self.episodes)})
+        self.manifest["num_transitions"] += self.size
+        self.manifest["num_episodes"] += len(self.episodes)
+        self._write_manifest()
+        self.size = 0
+        self.episodes = []
+
+    def truncate(self, episode: int):
+        """Drops the logged episodes with ids from episode on, e.g. the ones played after the
+        checkpoint a run resumes from. Buffered episodes are written first.
+
+        Raises ValueError if the log stops before episode - 1, the episodes in between were
+        played but never written and resuming would leave a gap in the log.
+        """
+        self.flush()
+        segments = self.manifest["segments"]
+        while segments:
+            segment = _segment_ids(self.manifest)[-1]
+            index = np.load(_segment_path(self.path, INDEX, segment))
+            keep = int(np.count_nonzero(index[:, 0] < episode))
+            if keep == len(index):
+                if index[-1, 0] < episode - 1:
+                    raise ValueError(f"{self.path} ends with episode {index[-1, 0]}, "
+                                     f"episodes up to {episode - 1} are missing")
+                break
+
+            segments.pop()
+            self.manifest["num_transitions"] -= int(index[:, 2].sum())
+            self.manifest["num_episodes"] -= len(index)
+            if keep > 0:
+                # episodes are stored in id order, the kept ones are a prefix of the segment,
+                # which is copied to a new id so the listed files stay intact until the manifest is replaced
+                num_transitions = int(index[:keep, 2].sum())
+                new_segment = self._next_segment_id(segment)
+                for name in COLUMNS:
+                    column = np.load(_segment_path(self.path, name, segment), mmap_mode="r")
+                    np.save(_segment_path(self.path, name, new_segment), column[:num_transitions])
+                np.save(_segment_path(self.path, INDEX, new_segment), index[:keep])
+                segments.append({"id": new_segment, "num_transitions": num_transitions, "num_episodes": keep})
+                self.manifest["num_transitions"] += num_transitions
+                self.manifest["num_episodes"] += keep
+        else:
+            if episode > 0:
+                raise ValueError(f"{self.path} is empty, episodes up to {episode - 1} are missing")
+        self._write_manifest()
+        self._remove_stale_segments()
+
+    def close(self):
+        self.flush()
+
+    def _write_manifest(self):
+        tmp_path = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+    def _next_segment_id(self, *dropped: int):
+        return max([*_segment_ids(self.manifest), *dropped], default=-1) + 1
+
+    def _remove_stale_segments(self):
+        # segments of an overwritten log, written after the manifest was last replaced or dropped by truncate
+        segments = set(_segment_ids(self.manifest))
+        for name in os.listdir(self.path):
+            match = _SEGMENT_FILE.fullmatch(name)
+            if match and int(match.group(2)) not in segments:
+                os.remove(os.path.join(self.path, name))
+
+
+class EpisodeLog:
+    """Read-only view of a log written by EpisodeLogWriter.
+
+    Every column segment is opened with np.memmap, so opening a log reads only its manifest and
+    episode index, and indexing reads only the pages it touches. log[i:j] and log[positions]
+    return dicts of column arrays like ReplayBuffer samples, over transitions counted across
+    all segments. iter_segments() hands out the memory-mapped columns without copying them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        manifest = _read_manifest(path)
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in manifest["columns"].items()}
+        segment_ids = _segment_ids(manifest)
+        self.segments = [{name: np.load(_segment_path(path, name, segment), mmap_mode="r") for name in self.dtypes}
+                         for segment in segment_ids]
+        lengths = [segment["num_transitions"] for segment in manifest["segments"]]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+
+        index = [np.load(_segment_path(path, INDEX, segment)) for segment in segment_ids]
+        index = np.concatenate(index) if index else np.zeros((0, 3), dtype=np.int64)
+        self.episode_ids, self.episode_starts, self.episode_lengths = index.T
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    @property
+    def num_episodes(self):
+        return len(self.episode_ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self._slice(start, stop)
+            key = np.arange(start, stop, step)
+        positions = np.asarray(key, dtype=np.int64)
+        positions = np.where(positions < 0, positions + len(self), positions)
+        if positions.ndim == 0:
+            return {name: column[0] for name, column in self._take(positions[None]).items()}
+        return self._take(positions)
+
+    def _slice(self, start: int, stop: int, columns=None):
+        columns = columns or self.dtypes
+        first = np.searchsorted(self.offsets, start, side="right") - 1
+        last = np.searchsorted(self.offsets, stop, side="left")
+        parts = []
+        for segment in range(max(first, 0), min(last, len(self.segments))):
+            offset = self.offsets[segment]
+            lo, hi = max(start - offset, 0), min(stop, self.offsets[segment + 1]) - offset
+            parts.append({name: self.segments[segment][name][lo:hi] for name in columns})
+        if not parts:
+            return {name: np.zeros(0, dtype=self.dtypes[name]) for name in columns}
+        return {name: np.concatenate([part[name] for part in parts]) for name in columns}
+
+    def _take(self, positions: np.ndarray, columns=None):
+        columns = columns or self.dtypes
+        if len(positions) and (positions.min() < 0 or positions.max() >= len(self)):
+            raise IndexError(f"Transition index out of range for a log of {len(self)} transitions")
+        segment_of = np.searchsorted(self.offsets, positions, side="right") - 1
+        out = {name: np.empty(len(positions), dtype=self.dtypes[name]) for name in columns}
+        for segment in np.unique(segment_of):
+            mask = segment_of == segment
+            local = positions[mask] - self.offsets[segment]
+            for name in columns:
+                out[name][mask] = self.segments[segment][name][local]
+        return out
+
+    def column(self, name: str, start: int = 0, stop: int | None = None):
+        """One column over a range of transitions, read into memory."""
+        return self._slice(start, len(self) if stop is None else stop, columns=[name])[name]
+
+    def iter_segments(self, columns=None):
+        """Yields the memory-mapped columns of each segment."""
+        for segment in self.segments:
+            yield {name: segment[name] for name in columns or self.dtypes}
+
+    def iter_batches(self, batch_size: int = 1 << 16, columns=None):
+        for start in range(0, len(self), batch_size):
+            yield self._slice(start, min(start + batch_size, len(self)), columns=columns)
+
+    def episode(self, i: int):
+        """The transitions of the i-th logged episode, in logging order."""
+        start = int(self.episode_starts[i])
+        return self._slice(start, start + int(self.episode_lengths[i]))
+
+    def find_episode(self, episode: int):
+        """The transitions of the episode logged with this id."""
+        i = int(np.searchsorted(self.episode_ids, episode))
+        if i == self.num_episodes or self.episode_ids[i] != episode:
+            raise KeyError(f"Episode {episode} is not in the log")
+        return self.episode(i)
+
+    def iter_episodes(self):
+        for i in range(self.num_episodes):
+            yield self.episode(i)
@@ -0,0 +1,192 @@
+import multiprocessing as mp
+import random
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from time_travel.envs.batched_maze import NO_ACTION, BatchedMazeEnv
+from time_travel.envs.door import DoorEnv
+from time_travel.envs.maze import GRID_SIZE, VISIBILITY, MazeEnv
+from time_travel.agents.door_agent import DoorAgent
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.agents.q_table import HashedQTable, copy_q_table
+
+@dataclass
+class EvalResult:
+    mean_reward: float
+    std_reward: float
+    success_rate: float
+    time_travel_rate: float
+    num_episodes: int
+
+    @staticmethod
+    def from_episodes(rewards, successes, time_travels):
+        return EvalResult(
+            mean_reward=float(np.mean(rewards)),
+            std_reward=float(np.std(rewards)),
+            success_rate=float(np.mean(successes)),
+            time_travel_rate=float(np.mean(time_travels)),
+            num_episodes=len(rewards),
+        )
+
+    def __str__(self):
+        return (f"mean {self.mean_reward:.2f}, std {self.std_reward:.2f}, success {self.success_rate:.2f}, "
+                f"time travel {self.time_travel_rate:.2f} over {self.num_episodes} episodes")
+
+
+def evaluate(env_fn, policy, num_episodes: int = 100, num_workers: int = 0, seed: int | None = None):
+    """Plays num_episodes greedy episodes on fresh envs from env_fn, the way eval() in the training scripts does.
+
+    policy is either a Q-table of the matching tabular agent or an act(obs) callable returning an
+    Action for a single agent observation. DoorAgent indexes observations with its own env's
+    clock, so pass its Q-table rather than its act method. Q-tables on a default size MazeEnv are
+    evaluated on a BatchedMazeEnv with all episodes in one batch. Everything else runs episode by
+    episode, split across num_workers processes when num_workers > 0 (env_fn and policy must
+    then be picklable).
+    An episode counts as a success when the normal agent ends it on the goal (maze) or with a
+    positive total reward (door).
+    """
+    return _evaluate(env_fn, policy, num_episodes, num_workers, seed, _batched_trap_position_observed(env_fn))
+
+
+def _batched_trap_position_observed(env_fn):
+    """trap_position_observed of the envs from env_fn if they are default size MazeEnvs, None otherwise."""
+    env = env_fn()
+    if isinstance(env, MazeEnv) and (env.grid_size, env.visibility) == (GRID_SIZE, VISIBILITY):
+        return env.trap_position_observed
+    return None
+
+
+def _evaluate(env_fn, policy, num_episodes: int, num_workers: int, seed: int | None,
+              trap_position_observed: bool | None):
+    """evaluate() with the batched path decided by _batched_trap_position_observed(env_fn)."""
+    if trap_position_observed is not None and isinstance(policy, (np.ndarray, HashedQTable)):
+        return _evaluate_maze_batched(policy, trap_position_observed, num_episodes, seed)
+
+    if num_workers <= 0:
+        return EvalResult.from_episodes(*_play_episodes(env_fn, policy, num_episodes, seed))
+
+    chunks = [(env_fn, policy, len(chunk), None if seed is None else seed + i)
+              for i, chunk in enumerate(np.array_split(np.arange(num_episodes), num_workers)) if len(chunk)]
+    with mp.Pool(len(chunks)) as pool:
+        results = pool.starmap(_play_episodes, chunks)
+    return EvalResult.from_episodes(*(np.concatenate(columns) for columns in zip(*results)))
+
+
+class AsyncEvaluator:
+    """Scores Q-table snapshots with evaluate() in background workers while training continues.
+
+    submit() copies the Q-table and returns straight away, blocking only while max_pending
+    evaluations are unfinished. poll() returns the finished (episode_idx, EvalResult) pairs in
+    submission order, tagged with the episode of their snapshot. Workers are processes, so
+    env_fn must be picklable, or threads with threads=True. With num_workers=0 submit()
+    evaluates in the calling thread.
+    """
+
+    def __init__(self, env_fn, num_episodes: int = 100, num_workers: int = 1, threads: bool = False,
+                 max_pending: int = 4):
+        self.env_fn = env_fn
+        self.num_episodes = num_episodes
+        # decided once here rather than by building an env on every submit
+        self.trap_position_observed = _batched_trap_position_observed(env_fn)
+        self.max_pending = max_pending
+        self.pool = None
+        if num_workers > 0:
+            self.pool = ThreadPool(num_workers) if threads else mp.Pool(num_workers)
+        # (episode_idx, AsyncResult or EvalResult)
+        self.pending = deque()
+
+    def submit(self, episode_idx: int, q_values: np.ndarray | HashedQTable):
+        if self.pool is None:
+            self.pending.append((episode_idx, _evaluate(self.env_fn, q_values, self.num_episodes, 0, None,
+                                                        self.trap_position_observed)))
+            return
+        while len(self.pending) >= self.max_pending and not self.pending[0][1].ready():
+            self.pending[0][1].wait()
+        result = self.pool.apply_async(_evaluate, (self.env_fn, copy_q_table(q_values), self.num_episodes, 0, None,
+                                                   self.trap_position_observed))
+        self.pending.append((episode_idx, result))
+
+    def poll(self):
+        finished = []
+        while self.pending:
+            episode_idx, result = self.pending[0]
+            if self.pool is not None:
+                if not result.ready():
+                    break
+                result = result.get()
+            finished.append((episode_idx, result))
+            self.pending.popleft()
+        return finished
+
+    def close(self):
+        """Waits for the pending evaluations, returns their results and stops the workers."""
+        for _, result in self.pending:
+            if self.pool is not None:
+                result.wait()
+        finished = self.poll()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+        return finished
+
+
+def _evaluate_maze_batched(q_values: np.ndarray, trap_position_observed: bool, num_episodes: int, seed: int | None):
+    env = BatchedMazeEnv(num_episodes, trap_position_observed=trap_position_observed, seed=seed)
+    obs = env.reset()
+    rewards = np.zeros(num_episodes)
+    successes = np.zeros(num_episodes, dtype=bool)
+    time_travels = np.zeros(num_episodes, dtype=bool)
+    running = np.ones(num_episodes, dtype=bool)
+
+    while running.any():
+        greedy_actions = np.argmax(q_values[obs], axis=2)
+        greedy_actions[env.is_original_timeline, 1] = NO_ACTION
+        obs, reward, terminated, truncated, info = env.step(greedy_actions)
+
+        rewards[running] += reward[running]
+        time_travels |= running & info["time_traveled"]
+        successes |= running & info["reached_goal"]
+        running &= ~(terminated | truncated)
+
+    return EvalResult.from_episodes(rewards, successes, time_travels)
+
+
+def _play_episodes(env_fn, policy, num_episodes: int, seed: int | None):
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    env = env_fn()
+    if isinstance(policy, (np.ndarray, HashedQTable)):
+        agent = DoorAgent(env) if isinstance(env, DoorEnv) else MazeAgent(env, sparse=True)
+        agent.q_values = policy
+        policy = agent.act
+
+    rewards = np.zeros(num_episodes)
+    successes = np.zeros(num_episodes, dtype=bool)
+    time_travels = np.zeros(num_episodes, dtype=bool)
+
+    for i in range(num_episodes):
+        obs = env.reset()
+        env_running = True
+
+        while env_running:
+            normal_action = policy(obs[0])
+            time_travel_action = None if env.is_original_timeline else policy(obs[1])
+
+            was_original_timeline = env.is_original_timeline
+            obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
+            env_running = not (terminated or truncated)
+
+            rewards[i] += reward
+            time_travels[i] |= was_original_timeline and not env.is_original_timeline
+
+        if isinstance(env, DoorEnv):
+            successes[i] = rewards[i] > 0
+        else:
+            successes[i] = terminated and env.normal_agent_pos == (env.grid_size-1, env.grid_size-1)
+
+    return rewards, successes, time_travels
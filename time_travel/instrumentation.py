@@ -0,0 +1,135 @@
+import cProfile
+import json
+import time
+from contextlib import nullcontext
+
+_NULL_TIMER = nullcontext()
+
+
+class _Timer:
+    """A reusable context manager that accumulates call counts and wall time."""
+    __slots__ = ("calls", "total", "_start")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.total += time.perf_counter() - self._start
+        self.calls += 1
+
+
+class NullInstrumentation:
+    """Instrumentation that records nothing, so a disabled training loop only pays for no-op calls."""
+
+    enabled = False
+
+    def timer(self, name: str):
+        return _NULL_TIMER
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def start_episode(self, episode_idx: int):
+        pass
+
+    def end_episode(self, episode_idx: int, length: int):
+        pass
+
+    def close(self):
+        pass
+
+
+class Instrumentation(NullInstrumentation):
+    """Timers and counters for the phases of a training loop.
+
+    Every summary_every episodes a summary of the window since the last one (per-phase calls and
+    time, counters and episode lengths) is appended as one JSON line to path. When profile_window
+    is (start, stop), cProfile runs from the start of episode start to the end of episode stop - 1
+    and its stats are written to profile_path.
+    """
+
+    enabled = True
+
+    def __init__(self, path: str | None = None, summary_every: int = 1000,
+                 profile_window: tuple[int, int] | None = None, profile_path: str = "train.prof"):
+        self.path = path
+        self.summary_every = summary_every
+        self.profile_window = profile_window
+        self.profile_path = profile_path
+        self.profiler = None
+
+        self.timers = {}
+        self.counters = {}
+        self.episode_lengths = []
+        self.start_time = time.perf_counter()
+        self.file = open(path, "a") if path is not None else None
+
+    def timer(self, name: str):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = _Timer()
+        return timer
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def start_episode(self, episode_idx: int):
+        if self.profile_window is not None and episode_idx == self.profile_window[0]:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def end_episode(self, episode_idx: int, length: int):
+        self.episode_lengths.append(length)
+
+        if self.profiler is not None and episode_idx == self.profile_window[1] - 1:
+            self._stop_profiler()
+
+        if (episode_idx + 1) % self.summary_every == 0:
+            self.write_summary(episode_idx)
+
+    def summary(self, episode_idx: int):
+        lengths = self.episode_lengths
+        return {
+            "episode_idx": episode_idx,
+            "elapsed_s": time.perf_counter() - self.start_time,
+            "phases": {name: {"calls": timer.calls, "total_s": timer.total,
+                              "mean_us": 1e6 * timer.total / timer.calls if timer.calls else 0.0}
+                       for name, timer in self.timers.items()},
+            "counters": dict(self.counters),
+            "episodes": len(lengths),
+            "episode_length": {"mean": sum(lengths) / len(lengths), "max": max(lengths)} if lengths else None,
+        }
+
+    def write_summary(self, episode_idx: int):
+        """Writes the summary of the current window and starts a new one."""
+        if self.file is not None:
+            self.file.write(json.dumps(self.summary(episode_idx)) + "\n")
+            self.file.flush()
+        self.timers = {}
+        self.counters = {}
+        self.episode_lengths = []
+
+    def _stop_profiler(self):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.profile_path)
+        self.profiler = None
+
+    def close(self):
+        if self.profiler is not None:
+            self._stop_profiler()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def make_instrumentation(path: str | None = None, summary_every: int = 1000,
+                         profile_window: tuple[int, int] | None = None, profile_path: str = "train.prof"):
+    """Returns Instrumentation when there is somewhere to write to, NullInstrumentation otherwise."""
+    if path is None and profile_window is None:
+        return NullInstrumentation()
+    return Instrumentation(path, summary_every=summary_every, profile_window=profile_window, profile_path=profile_path)
@@ -0,0 +1,95 @@
+import json
+from collections import deque
+
+import numpy as np
+
+
+class MetricsSink:
+    """Appends metric records to a JSON lines file and keeps only running aggregates in memory.
+
+    Every record is {"kind": ..., "episode_idx": ..., name: value, ...}. Lines are buffered and
+    written every flush_every records, so a crashed run loses at most that many. For every
+    numeric (kind, name) the sink tracks an exponential moving average and the mean of the last
+    window values.
+    """
+
+    def __init__(self, path: str, append: bool = False, flush_every: int = 1000, ema_alpha: float = 0.01,
+                 window: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self.ema_alpha = ema_alpha
+        self.window = window
+
+        # append when resuming a run, start a new file otherwise
+        self.file = open(path, "a" if append else "w")
+        self.lines = []
+        self.emas = {}
+        self.windows = {}
+
+    def log(self, kind: str, episode_idx: int, **values):
+        self.lines.append(json.dumps({"kind": kind, "episode_idx": episode_idx, **values}))
+        for name, value in values.items():
+            if not isinstance(value, (int, float)):
+                continue
+            key = (kind, name)
+            if key not in self.emas:
+                self.emas[key] = value
+                self.windows[key] = deque(maxlen=self.window)
+            else:
+                self.emas[key] += self.ema_alpha * (value - self.emas[key])
+            self.windows[key].append(value)
+
+        if len(self.lines) >= self.flush_every:
+            self.flush()
+
+    def ema(self, kind: str, name: str):
+        return self.emas[(kind, name)]
+
+    def window_mean(self, kind: str, name: str):
+        return sum(self.windows[(kind, name)]) / len(self.windows[(kind, name)])
+
+    def flush(self):
+        if self.lines:
+            self.file.write("\n".join(self.lines) + "\n")
+            self.file.flush()
+            self.lines = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_metrics(path: str, kind: str):
+    """Returns name -> array of the records of one kind, sorted by episode_idx.
+
+    A resumed run appends to the file of the run it resumes, so when several records share an
+    episode_idx the last one written wins.
+    """
+    records = {}
+    with open(path) as f:
+        for line in f:
+            # a crash can leave the last line half written
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.pop("kind") == kind:
+                records[record["episode_idx"]] = record
+
+    rows = [records[episode_idx] for episode_idx in sorted(records)]
+    names = dict.fromkeys(name for row in rows for name in row)
+    return {name: np.array([row.get(name, np.nan) for row in rows]) for name in names}
+
+
+def plot_metrics(path: str, out_path: str = "eval_rew.png", kind: str = "eval", name: str = "mean_reward"):
+    """Plots one metric against episode_idx from a metrics file, at any point during or after a run."""
+    import matplotlib.pyplot as plt
+
+    metrics = read_metrics(path, kind)
+    fig, ax = plt.subplots()
+    ax.set_xlabel("Episode")
+    ax.set_ylabel("Evaluation reward" if (kind, name) == ("eval", "mean_reward") else name)
+    if metrics:
+        ax.plot(metrics["episode_idx"], metrics[name])
+    fig.savefig(out_path)
+    plt.close(fig)
@@ -0,0 +1,205 @@
+import multiprocessing as mp
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from time_travel.agents.exploration import ExplorationPolicy
+from time_travel.rollout import concatenate_episodes, play_episode
+
+SYNC = "sync"
+ASYNC = "async"
+
+# epsilon schedules
+SQRT_DECAY = "sqrt"
+LINEAR_DECAY = "linear"
+DECAYS = (SQRT_DECAY, LINEAR_DECAY)
+
+
+class SharedQTable:
+    """A Q-table in a multiprocessing.shared_memory block.
+
+    Pickling sends only the block name, so worker processes attach to the same memory.
+    """
+
+    def __init__(self, shape: tuple[int, int], dtype=np.float64, name: str | None = None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)) * self.dtype.itemsize)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.values = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def __getstate__(self):
+        return self.shape, self.dtype, self.shm.name
+
+    def __setstate__(self, state):
+        shape, dtype, name = state
+        self.__init__(shape, dtype, name=name)
+
+    def close(self):
+        del self.values
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def epsilon_schedule(episode_idx: int, max_episodes: int, max_epsilon: float = 0.8, decay: str = SQRT_DECAY):
+    """Epsilon decaying from max_epsilon to 0 over max_episodes, the sqrt decay of run_maze.py by default."""
+    if decay == SQRT_DECAY:
+        return max_epsilon * (1 - np.sqrt(episode_idx / max_episodes))
+    if decay == LINEAR_DECAY:
+        return max_epsilon * (1 - episode_idx / max_episodes)
+    raise ValueError(f"Unknown decay {decay}, expected one of {DECAYS}")
+
+
+def _make_worker_agent(env_fn, agent_cls, lr, q_table: SharedQTable, seed: np.random.SeedSequence):
+    # the envs draw from the random module, the agent explores with its own stream
+    random.seed(int(seed.generate_state(1)[0]))
+    env = env_fn()
+    agent = agent_cls(env, lr=lr, exploration=ExplorationPolicy(env.action_space.n, seed=seed))
+    agent.q_values = q_table.values
+    return env, agent
+
+
+def _async_worker(env_fn, agent_cls, lr, q_table, locks, counter, max_episodes, max_epsilon, seed):
+    """Claims episode indices from the shared counter and applies its own updates under striped locks."""
+    env, agent = _make_worker_agent(env_fn, agent_cls, lr, q_table, seed)
+
+    while True:
+        with counter.get_lock():
+            episode_idx = counter.value
+            if episode_idx >= max_episodes:
+                break
+            counter.value += 1
+
+        episode = play_episode(env, agent, epsilon=epsilon_schedule(episode_idx, max_episodes, max_epsilon))
+
+        # each Q-table row belongs to one lock stripe, so updates to different stripes run concurrently
+        stripes = episode.obs_idx % len(locks)
+        for stripe in np.unique(stripes):
+            mask = stripes == stripe
+            with locks[stripe]:
+                agent.update_batch(episode.obs_idx[mask], episode.actions[mask],
+                                   episode.rewards[mask], episode.next_obs_idx[mask])
+
+    q_table.close()
+
+
+def _sync_worker(env_fn, agent_cls, lr, q_table, tasks, results, worker_id, seed):
+    """Plays the requested episodes against a Q-table that does not change during a round and sends them back."""
+    env, agent = _make_worker_agent(env_fn, agent_cls, lr, q_table, seed)
+
+    while (task := tasks.get()) is not None:
+        epsilons = task
+        episodes = [play_episode(env, agent, epsilon=epsilon) for epsilon in epsilons]
+        results.put((worker_id, concatenate_episodes(episodes), [e.total_reward for e in episodes]))
+
+    q_table.close()
+
+
+class ParallelTrainer:
+    """Trains a tabular agent with worker processes that share one Q-table.
+
+    In SYNC mode every round gives each worker episodes_per_round episodes to play against the
+    same Q-table, and this process applies all their transitions at the end of the round, in
+    worker order. In ASYNC mode workers play episodes as fast as they can and apply their own
+    updates under num_locks striped locks, without waiting for each other.
+    """
+
+    def __init__(self, env_fn, agent_cls, num_workers: int, mode: str = SYNC, lr: float = 1e-2,
+                 episodes_per_round: int = 1, num_locks: int = 64, seed: int = 0):
+        if mode not in (SYNC, ASYNC):
+            raise ValueError(f"Unknown mode {mode}, expected {SYNC} or {ASYNC}")
+
+        self.env_fn = env_fn
+        self.agent_cls = agent_cls
+        self.num_workers = num_workers
+        self.mode = mode
+        self.lr = lr
+        self.episodes_per_round = episodes_per_round
+        self.num_locks = num_locks
+        self.seed = seed
+
+        # the agent in this process holds the shared Q-table, so it can be evaluated or saved as usual
+        self.agent = agent_cls(env_fn(), lr=lr)
+        self.q_table = SharedQTable(self.agent.q_values.shape)
+        self.q_table.values[:] = self.agent.q_values
+        self.agent.q_values = self.q_table.values
+
+    def train(self, max_episodes: int, max_epsilon: float = 0.8, eval_every: int = 0, eval_fn=None):
+        """Runs max_episodes episodes across the workers.
+
+        eval_fn is called with the agent every eval_every episodes. Returns the list of
+        (episode_idx, eval result) pairs and the training throughput in episodes/sec.
+        """
+        start = time.perf_counter()
+        if self.mode == SYNC:
+            eval_results = self._train_sync(max_episodes, max_epsilon, eval_every, eval_fn)
+        else:
+            eval_results = self._train_async(max_episodes, max_epsilon, eval_every, eval_fn)
+        return eval_results, max_episodes / (time.perf_counter() - start)
+
+    def _train_sync(self, max_episodes, max_epsilon, eval_every, eval_fn):
+        tasks = [mp.Queue() for _ in range(self.num_workers)]
+        results = mp.Queue()
+        seeds = np.random.SeedSequence(self.seed).spawn(self.num_workers)
+        workers = [mp.Process(target=_sync_worker, args=(self.env_fn, self.agent_cls, self.lr, self.q_table,
+                                                         tasks[i], results, i, seeds[i]))
+                   for i in range(self.num_workers)]
+        for worker in workers:
+            worker.start()
+
+        eval_results = []
+        episode_idx = 0
+        while episode_idx < max_episodes:
+            round_size = min(self.num_workers * self.episodes_per_round, max_episodes - episode_idx)
+            epsilons = [epsilon_schedule(i, max_episodes, max_epsilon) for i in range(episode_idx, episode_idx + round_size)]
+            assignments = [epsilons[i::self.num_workers] for i in range(self.num_workers)]
+            for queue, assignment in zip(tasks, assignments):
+                if assignment:
+                    queue.put(assignment)
+
+            round_results = sorted(results.get() for assignment in assignments if assignment)
+            for _, episodes, _ in round_results:
+                self.agent.update_batch(episodes.obs_idx, episodes.actions, episodes.rewards, episodes.next_obs_idx)
+
+            if eval_fn is not None and eval_every and (episode_idx + round_size - 1) // eval_every > (episode_idx - 1) // eval_every:
+                eval_results.append((episode_idx, eval_fn(self.agent)))
+            episode_idx += round_size
+
+        for queue in tasks:
+            queue.put(None)
+        for worker in workers:
+            worker.join()
+        return eval_results
+
+    def _train_async(self, max_episodes, max_epsilon, eval_every, eval_fn):
+        counter = mp.Value("q", 0)
+        locks = [mp.Lock() for _ in range(self.num_locks)]
+        seeds = np.random.SeedSequence(self.seed).spawn(self.num_workers)
+        workers = [mp.Process(target=_async_worker, args=(self.env_fn, self.agent_cls, self.lr, self.q_table, locks,
+                                                          counter, max_episodes, max_epsilon, seeds[i]))
+                   for i in range(self.num_workers)]
+        for worker in workers:
+            worker.start()
+
+        eval_results = []
+        next_eval = 0
+        while any(worker.is_alive() for worker in workers):
+            if eval_fn is not None and eval_every and counter.value >= next_eval:
+                eval_results.append((counter.value, eval_fn(self.agent)))
+                next_eval += eval_every
+            time.sleep(0.01)
+
+        for worker in workers:
+            worker.join()
+        return eval_results
+
+    def close(self):
+        self.agent.q_values = self.agent.q_values.copy()
+        self.q_table.close()
+        self.q_table.unlink()
@@ -0,0 +1,82 @@
+from collections import deque
+
+import numpy as np
+
+
+class ReplayBuffer:
+    """A fixed capacity ring buffer of transitions stored in preallocated NumPy columns.
+
+    Transitions are added one episode at a time. Once the buffer is full the oldest transitions are
+    overwritten, and episodes that lost any of their transitions can no longer be sampled whole.
+    """
+
+    COLUMNS = {
+        "obs_idx": np.int64,
+        "action": np.int8,
+        "reward": np.float64,
+        "next_obs_idx": np.int64,
+        "done": bool,
+        "is_original_timeline": bool,
+        "t": np.int16,
+        "episode": np.int64,
+    }
+
+    def __init__(self, capacity: int, seed: int | None = None):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.rng = np.random.default_rng(seed)
+
+        self.size = 0
+        self.pos = 0
+        self.num_episodes = 0
+        # (episode id, start position, length) of every episode still fully in the buffer
+        self.episodes = deque()
+
+    def __len__(self):
+        return self.size
+
+    def add_episode(self, obs_idx, actions, rewards, next_obs_idx, is_original_timeline, t):
+        length = len(obs_idx)
+        if length > self.capacity:
+            raise ValueError(f"Episode of length {length} does not fit in a buffer of capacity {self.capacity}")
+
+        positions = (self.pos + np.arange(length)) % self.capacity
+        done = np.zeros(length, dtype=bool)
+        done[-1] = True
+        for name, values in [("obs_idx", obs_idx), ("action", actions), ("reward", rewards),
+                             ("next_obs_idx", next_obs_idx), ("done", done),
+                             ("is_original_timeline", is_original_timeline), ("t", t),
+                             ("episode", self.num_episodes)]:
+            self.columns[name][positions] = values
+
+        # drop episodes that were partly overwritten
+        while self.episodes and self.size + length > self.capacity:
+            _, _, old_length = self.episodes.popleft()
+            self.size -= old_length
+
+        self.episodes.append((self.num_episodes, self.pos, length))
+        self.num_episodes += 1
+        self.pos = (self.pos + length) % self.capacity
+        self.size += length
+
+    def _get(self, positions: np.ndarray):
+        return {name: column[positions] for name, column in self.columns.items()}
+
+    def _episode_positions(self, episode: tuple[int, int, int]):
+        _, start, length = episode
+        return (start + np.arange(length)) % self.capacity
+
+    def sample(self, batch_size: int):
+        """Samples transitions uniformly from the complete episodes in the buffer."""
+        start = (self.pos - self.size) % self.capacity
+        return self._get((start + self.rng.integers(self.size, size=batch_size)) % self.capacity)
+
+    def sample_episodes(self, num_episodes: int):
+        """Samples whole episodes uniformly, returned as a list of column dicts."""
+        idx = self.rng.integers(len(self.episodes), size=num_episodes)
+        return [self._get(self._episode_positions(self.episodes[i])) for i in idx]
+
+    def last_episodes(self, num_episodes: int):
+        num_episodes = min(num_episodes, len(self.episodes))
+        return [self._get(self._episode_positions(self.episodes[i]))
+                for i in range(len(self.episodes) - num_episodes, len(self.episodes))]
@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from time_travel.envs.door import DoorEnv
+from time_travel.envs.maze import MazeEnv
+from time_travel.agents.door_agent import DoorAgent
+from time_travel.agents.maze_agent import MazeAgent
+
+@dataclass
+class Episode:
+    """The transitions of one episode as index arrays, from the primary agent's point of view."""
+    obs_idx: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    next_obs_idx: np.ndarray
+    is_original_timeline: np.ndarray
+    t: np.ndarray
+
+    @property
+    def total_reward(self):
+        return float(np.sum(self.rewards))
+
+    def __len__(self):
+        return len(self.obs_idx)
+
+
+def play_maze_episode(env: MazeEnv, agent: MazeAgent, epsilon: float = 0, deterministic: bool = False):
+    """Plays one episode the way run_maze.py does, replaying the normal agent's first timeline in the second."""
+    obs = env.reset()
+    env_running = True
+    rollout = []
+
+    while env_running:
+        if env.is_original_timeline:
+            normal_action = agent.act(obs[0], epsilon=epsilon, deterministic=deterministic)
+            time_travel_action = None
+            primary_agent_action = normal_action
+            prev_obs = obs[0]
+        else:
+            if obs[0] == rollout[env.t][0]:
+                normal_action = rollout[env.t][1]
+            else:
+                normal_action = agent.act(obs[0], deterministic=True)
+            time_travel_action = agent.act(obs[1], epsilon=epsilon, deterministic=deterministic)
+            primary_agent_action = time_travel_action
+            prev_obs = obs[1]
+
+        is_original_timeline = env.is_original_timeline
+        obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
+        env_running = not (terminated or truncated)
+
+        curr_obs = obs[0] if env.is_original_timeline else obs[1]
+        rollout.append((prev_obs, primary_agent_action, reward, curr_obs, is_original_timeline, info["t"]))
+
+    return _to_episode(agent, rollout)
+
+
+def play_door_episode(env: DoorEnv, agent: DoorAgent, epsilon: float = 0, deterministic: bool = False,
+                      live_indices: bool = False):
+    """Plays one episode the way run_door.py does.
+
+    DoorAgent indexes observations with its env's clock. Like run_door.py, the episode's
+    observations are indexed once it has ended, unless live_indices is set, which indexes each
+    one at the step it was seen, the way act() sees it. Logs for offline training need the latter.
+    """
+    obs = env.reset()
+    env_running = True
+    rollout = []
+
+    while env_running:
+        if env.is_original_timeline:
+            normal_action = agent.act(obs[0], epsilon=epsilon, deterministic=deterministic)
+            time_travel_action = None
+            primary_agent_action = normal_action
+            prev_obs = obs[0]
+        else:
+            normal_action = agent.act(obs[0], deterministic=True)
+            time_travel_action = agent.act(obs[1], epsilon=epsilon, deterministic=deterministic)
+            primary_agent_action = time_travel_action
+            prev_obs = obs[1]
+
+        if live_indices:
+            prev_obs = agent.obs_to_idx(prev_obs)
+        is_original_timeline = env.is_original_timeline
+        obs, reward, terminated, truncated, info = env.step((normal_action, time_travel_action))
+        env_running = not (terminated or truncated)
+
+        curr_obs = obs[0] if env.is_original_timeline else obs[1]
+        if live_indices:
+            curr_obs = agent.obs_to_idx(curr_obs)
+        rollout.append((prev_obs, primary_agent_action, reward, curr_obs, is_original_timeline, info["t"]))
+
+    return _to_episode(agent, rollout, indexed=live_indices)
+
+
+def play_episode(env: MazeEnv | DoorEnv, agent: MazeAgent | DoorAgent, epsilon: float = 0, deterministic: bool = False):
+    # unwrapped, so a recorded env plays like the env it records
+    if isinstance(env.unwrapped, DoorEnv):
+        return play_door_episode(env, agent, epsilon=epsilon, deterministic=deterministic)
+    return play_maze_episode(env, agent, epsilon=epsilon, deterministic=deterministic)
+
+
+def _to_episode(agent: MazeAgent | DoorAgent, rollout: list, indexed: bool = False):
+    to_idx = int if indexed else agent.obs_to_idx
+    return Episode(
+        obs_idx=np.array([to_idx(step[0]) for step in rollout]),
+        actions=np.array([step[1].value for step in rollout]),
+        rewards=np.array([step[2] for step in rollout], dtype=np.float64),
+        next_obs_idx=np.array([to_idx(step[3]) for step in rollout]),
+        is_original_timeline=np.array([step[4] for step in rollout]),
+        t=np.array([step[5] for step in rollout]),
+    )
+
+
+def concatenate_episodes(episodes: list[Episode]):
+    return Episode(*(np.concatenate([getattr(e, name) for e in episodes])
+                     for name in ["obs_idx", "actions", "rewards", "next_obs_idx", "is_original_timeline", "t"]))
@@ -0,0 +1,257 @@
+import functools
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import multiprocessing as mp
+from dataclasses import dataclass
+
+import numpy as np
+
+from time_travel.envs import DOOR, ENVS, MAZE
+from time_travel.envs.door import DoorEnv
+from time_travel.envs.maze import GRID_SIZE, VISIBILITY, MazeEnv
+from time_travel.agents.door_agent import DoorAgent
+from time_travel.agents.maze_agent import MazeAgent
+from time_travel.agents.planning import PLANNING_LR, PrioritizedSweeping
+from time_travel.evaluator import evaluate
+from time_travel.metrics import MetricsSink, read_metrics
+from time_travel.parallel_trainer import SQRT_DECAY, epsilon_schedule
+from time_travel.rollout import play_episode
+
+# the parameters a sweep can vary, with the values run_maze.py and run_door.py hard-code
+ENV_PARAMS = {MAZE: {"trap_position_observed": True, "grid_size": GRID_SIZE, "visibility": VISIBILITY}, DOOR: {}}
+AGENT_PARAMS = {MAZE: {"lr": 1e-2, "backup": "one_step", "n_steps": 10, "trace_decay": 0.9,
+                       "planning_steps": 0, "planning_lr": PLANNING_LR},
+                DOOR: {"lr": 1e-2}}
+SCHEDULE_PARAMS = {"max_epsilon": 0.8, "decay": SQRT_DECAY}
+
+# a run's eval file ends with this record once the run has finished
+DONE = "done"
+
+
+@dataclass
+class Uniform:
+    low: float
+    high: float
+
+    def sample(self, rng: random.Random):
+        return rng.uniform(self.low, self.high)
+
+
+@dataclass
+class LogUniform:
+    low: float
+    high: float
+
+    def sample(self, rng: random.Random):
+        return math.exp(rng.uniform(math.log(self.low), math.log(self.high)))
+
+
+def grid_configs(space: dict[str, list]):
+    """Every combination of the listed values."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_configs(space: dict[str, list | Uniform | LogUniform], num_samples: int, seed: int = 0):
+    """num_samples configs with each value drawn from its list or distribution.
+
+    The same seed draws the same configs, which is what lets a random sweep resume.
+    """
+    rng = random.Random(seed)
+    return [{name: values.sample(rng) if isinstance(values, (Uniform, LogUniform)) else rng.choice(values)
+             for name, values in space.items()} for _ in range(num_samples)]
+
+
+def full_config(env_name: str, config: dict):
+    """config with the defaults of every parameter it does not set, rejects unknown parameters."""
+    defaults = {**ENV_PARAMS[env_name], **AGENT_PARAMS[env_name], **SCHEDULE_PARAMS}
+    unknown = set(config) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown {env_name} parameters {sorted(unknown)}, expected some of {sorted(defaults)}")
+    return {**defaults, **config}
+
+
+def run_id(env_name: str, config: dict, seed: int, episodes: int, eval_every: int):
+    key = json.dumps({"env": env_name, "config": config, "seed": seed, "episodes": episodes, "eval_every": eval_every},
+                     sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+# (env name, trap_position_observed) -> (model, evaluate_q_values), filled by run_sweep() before
+# the pool starts and handed to every worker, the maze model takes about a minute to compile
+_exact_models = {}
+
+
+def _exact_model_key(env_name: str, config: dict):
+    """The key of the exact model a full config is evaluated on, None where there is none."""
+    if env_name == DOOR or (config["grid_size"], config["visibility"]) == (GRID_SIZE, VISIBILITY):
+        return env_name, config.get("trap_position_observed", True)
+    return None
+
+
+def _exact_model(env_name: str, trap_position_observed: bool = True):
+    key = (env_name, trap_position_observed)
+    if key not in _exact_models:
+        if env_name == DOOR:
+            from time_travel.envs.door_model import compile_door_model, evaluate_q_values
+            _exact_models[key] = compile_door_model(), evaluate_q_values
+        else:
+            from time_travel.envs.maze_model import compile_maze_model, evaluate_q_values
+            _exact_models[key] = compile_maze_model(trap_position_observed=trap_position_observed), evaluate_q_values
+    return _exact_models[key]
+
+
+def _init_worker(exact_models: dict):
+    _exact_models.update(exact_models)
+
+
+def _make_eval_fn(env_name: str, config: dict, env_fn, seed: int):
+    """Exact eval where a tabular model of the env exists, a seeded 100 episode eval otherwise."""
+    key = _exact_model_key(env_name, config)
+    if key is not None:
+        model, evaluate_q_values = _exact_model(*key)
+        return lambda q_values: evaluate_q_values(model, q_values)
+    return lambda q_values: evaluate(env_fn, q_values, seed=seed).mean_reward
+
+
+def train_run(env_name: str, config: dict, seed: int, episodes: int, eval_every: int, path: str):
+    """Trains one agent the way the training scripts do and streams its eval curve to path."""
+    config = full_config(env_name, config)
+    random.seed(seed)
+    np.random.seed(seed)
+
+    env_kwargs = {name: config[name] for name in ENV_PARAMS[env_name]}
+    env_fn = functools.partial(MazeEnv if env_name == MAZE else DoorEnv, **env_kwargs)
+    env = env_fn()
+    if env_name == MAZE:
+        planning = (PrioritizedSweeping(env.action_space.n, config["planning_steps"], lr=config["planning_lr"])
+                    if config["planning_steps"] > 0 else None)
+        agent = MazeAgent(env, lr=config["lr"], backup=config["backup"], n_steps=config["n_steps"],
+                          trace_decay=config["trace_decay"], planning=planning)
+        update = agent.update_episode
+    else:
+        agent = DoorAgent(env, lr=config["lr"])
+        update = agent.update_batch
+    eval_fn = _make_eval_fn(env_name, config, env_fn, seed)
+
+    # evals are rare, write each one as it comes so the curve can be watched during the sweep
+    metrics = MetricsSink(path, flush_every=1)
+    for episode_idx in range(episodes):
+        epsilon = epsilon_schedule(episode_idx, episodes, config["max_epsilon"], config["decay"])
+        episode = play_episode(env, agent, epsilon=epsilon)
+        update(episode.obs_idx, episode.actions, episode.rewards, episode.next_obs_idx)
+        if (episode_idx + 1) % eval_every == 0 or episode_idx + 1 == episodes:
+            metrics.log("eval", episode_idx, mean_reward=float(eval_fn(agent.q_values)))
+    metrics.log(DONE, episodes - 1)
+    metrics.close()
+    return path
+
+
+def _train_run_star(args):
+    return train_run(*args)
+
+
+def is_finished(path: str):
+    return os.path.exists(path) and bool(read_metrics(path, DONE))
+
+
+def run_sweep(out_dir: str, env_name: str, configs: list[dict], seeds: list[int], episodes: int,
+              eval_every: int = 100, num_workers: int | None = None):
+    """Trains every config with every seed on a process pool, skipping runs finished before.
+
+    Each run streams its eval curve to out_dir/runs/<run id>.jsonl, and out_dir/sweep.json lists
+    the runs. A sweep that was interrupted picks up where it stopped when called again with the
+    same arguments, runs that had not finished start over. Sweeps with other configs or seeds
+    can share out_dir, their runs are merged into sweep.json by run id, as long as env, episodes
+    and eval_every match, which summarize_sweep() compares runs over.
+    """
+    if env_name not in ENVS:
+        raise ValueError(f"Unknown env {env_name}, expected one of {ENVS}")
+    os.makedirs(os.path.join(out_dir, "runs"), exist_ok=True)
+
+    sweep = {"env": env_name, "episodes": episodes, "eval_every": eval_every}
+    sweep_path = os.path.join(out_dir, "sweep.json")
+    merged = {}
+    if os.path.exists(sweep_path):
+        with open(sweep_path) as f:
+            existing = json.load(f)
+        if {name: existing[name] for name in sweep} != sweep:
+            raise ValueError(f"{out_dir} holds a sweep of {', '.join(f'{n}={existing[n]}' for n in sweep)}, "
+                             f"not {', '.join(f'{n}={v}' for n, v in sweep.items())}")
+        merged = {run["run_id"]: run for run in existing["runs"]}
+
+    runs = []
+    for config in configs:
+        full_config(env_name, config)
+        for seed in seeds:
+            run = run_id(env_name, config, seed, episodes, eval_every)
+            # relative to out_dir, so the sweep can be moved
+            runs.append({"run_id": run, "config": config, "seed": seed, "path": os.path.join("runs", f"{run}.jsonl")})
+    merged.update((run["run_id"], run) for run in runs)
+    with open(sweep_path, "w") as f:
+        json.dump({**sweep, "runs": list(merged.values())}, f, indent=1)
+
+    paths = [os.path.join(out_dir, run["path"]) for run in runs]
+    pending = [(env_name, run["config"], run["seed"], episodes, eval_every, path)
+               for run, path in zip(runs, paths) if not is_finished(path)]
+    print(f"{len(runs) - len(pending)} of {len(runs)} runs already finished")
+    if pending:
+        # compiled here once rather than in every worker
+        keys = {_exact_model_key(env_name, full_config(env_name, config)) for _, config, *_ in pending} - {None}
+        exact_models = {key: _exact_model(*key) for key in keys}
+        num_workers = min(num_workers or os.cpu_count(), len(pending))
+        with mp.Pool(num_workers, initializer=_init_worker, initargs=(exact_models,)) as pool:
+            for i, path in enumerate(pool.imap_unordered(_train_run_star, pending), 1):
+                print(f"[{i}/{len(pending)}] finished {path}")
+    return runs
+
+
+def summarize_sweep(out_dir: str, final_fraction: float = 0.1):
+    """One row per config over its finished seeds, ranked by final and then area-under-curve reward.
+
+    The final reward is the mean eval over the last final_fraction of a run's episodes, the area
+    under the curve the trapezoid mean of the eval over the whole run.
+    """
+    with open(os.path.join(out_dir, "sweep.json")) as f:
+        sweep = json.load(f)
+
+    by_config = {}
+    for run in sweep["runs"]:
+        path = os.path.join(out_dir, run["path"])
+        if not is_finished(path):
+            continue
+        curve = read_metrics(path, "eval")
+        episodes, rewards = curve["episode_idx"], curve["mean_reward"]
+        final = rewards[episodes >= episodes[-1] - final_fraction * sweep["episodes"]].mean()
+        # np.trapz is gone from recent numpy and np.trapezoid missing from older ones
+        auc = (np.sum((rewards[1:] + rewards[:-1]) / 2 * np.diff(episodes)) / (episodes[-1] - episodes[0])
+               if len(episodes) > 1 else rewards[0])
+        by_config.setdefault(json.dumps(run["config"], sort_keys=True), []).append((final, auc))
+
+    rows = []
+    for config, results in by_config.items():
+        finals, aucs = np.array(results).T
+        rows.append({"config": json.loads(config), "seeds": len(results),
+                     "final_mean": float(finals.mean()), "final_std": float(finals.std()),
+                     "auc_mean": float(aucs.mean()), "auc_std": float(aucs.std())})
+    rows.sort(key=lambda row: (row["final_mean"], row["auc_mean"]), reverse=True)
+    return rows
+
+
+def _format_value(value):
+    return f"{value:.3g}" if isinstance(value, float) else str(value)
+
+
+def format_summary(rows: list[dict]):
+    """The rows of summarize_sweep() as an aligned text table."""
+    names = list(dict.fromkeys(name for row in rows for name in row["config"]))
+    header = ["rank", *names, "seeds", "final", "auc"]
+    lines = [[str(rank), *(_format_value(row["config"].get(name, "")) for name in names), str(row["seeds"]),
+              f"{row['final_mean']:.2f} ± {row['final_std']:.2f}", f"{row['auc_mean']:.2f} ± {row['auc_std']:.2f}"]
+             for rank, row in enumerate(rows, 1)]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *lines)]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in [header, *lines])